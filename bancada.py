@@ -0,0 +1,517 @@
+"""Bancada de testes sem interface: geradores de carga, traces, benchmarks e varreduras de parâmetros."""
+import random
+import time
+import json
+import itertools
+import os
+import sys
+
+from sistema_arquivos import (ALLOCATION_METHODS, POINTERS_PER_BLOCK, PROFILED_FS_METHODS, GroupedFileSystem,
+                              create_file_system)
+
+# Nomes públicos da bancada (o que 'from bancada import *' traz para o projetinho)
+__all__ = [
+    'WORKLOADS', 'generate_workload', 'save_trace', 'load_trace', 'replay_trace', 'run_benchmark', 'format_results',
+    'SWEEP_FIELDS', 'sweep_configs', 'sweep_key', 'run_sweep_config', 'load_sweep_results', 'run_sweep',
+    'aggregate_sweep', 'format_sweep', 'measure_startup', 'format_startup', 'run_contention_benchmark',
+    'format_contention',
+]
+
+
+# Geradores de carga da bancada de testes (ver generate_workload)
+WORKLOADS = ('uniform', 'heavy_tailed', 'churn', 'append')
+
+
+# --- Bancada de testes (sem interface) ---
+
+
+def _percentile(sorted_values, q):
+    """Valor no quantil 'q' (0 a 1) de uma lista já ordenada (0.0 se vazia)."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def generate_workload(kind, num_ops, num_blocks, seed=0, method='contiguous', max_size=64):
+    """
+    Gera um trace reproduzível de operações ('create', nome, tamanho, método) / ('delete', nome).
+    kind: 'uniform' (tamanhos uniformes), 'heavy_tailed' (tamanhos de Pareto, poucos arquivos
+    enormes), 'churn' (enche o disco até ~70% e depois alterna criações e deleções) ou 'append'
+    (logs: poucos arquivos que crescem aos poucos com ('extend', nome, blocos) e às vezes são
+    rotacionados com ('truncate', nome, 1) ou apagados).
+    A sequência depende só de 'seed', não do método, para comparar métodos com a mesma carga.
+    """
+    if kind not in WORKLOADS:
+        raise ValueError(f"Carga desconhecida: {kind}")
+    if kind == 'append':
+        return _append_workload(num_ops, num_blocks, seed, method, max_size)
+    rnd = random.Random(seed)
+    ops = []
+    live = []      # Arquivos que devem existir neste ponto do trace
+    sizes = {}
+    used = 0       # Blocos que os arquivos vivos devem ocupar
+    target = 0.7 if kind == 'churn' else 0.9
+
+    for i in range(num_ops):
+        if kind == 'churn':
+            delete = used >= target * num_blocks and rnd.random() < 0.5
+        else:
+            delete = rnd.random() < 0.3 or used >= target * num_blocks
+        if delete and live:
+            file_name = live.pop(rnd.randrange(len(live)))
+            used -= sizes.pop(file_name)
+            ops.append(('delete', file_name))
+        else:
+            if kind == 'heavy_tailed':
+                file_size = min(max_size, int(rnd.paretovariate(1.2)))
+            else:
+                file_size = rnd.randint(1, max_size)
+            file_name = f"f{i}"
+            live.append(file_name)
+            sizes[file_name] = file_size
+            used += file_size
+            ops.append(('create', file_name, file_size, method))
+    return ops
+
+
+def _append_workload(num_ops, num_blocks, seed, method, max_size):
+    """Carga 'append' de generate_workload."""
+    rnd = random.Random(seed)
+    ops = []
+    live = []
+    sizes = {}
+    used = 0
+    chunk = max(1, max_size // 8) # Tamanho máximo de cada acréscimo
+    for i in range(num_ops):
+        roll = rnd.random()
+        if not live or (roll < 0.02 and used < 0.8 * num_blocks):
+            file_name = f"log{i}"
+            live.append(file_name)
+            sizes[file_name] = 1
+            used += 1
+            ops.append(('create', file_name, 1, method))
+        elif used >= 0.8 * num_blocks or roll < 0.04:
+            # Rotação: o maior log volta a um bloco, ou um log qualquer é apagado
+            if rnd.random() < 0.7:
+                file_name = max(live, key=sizes.get)
+                used -= sizes[file_name] - 1
+                sizes[file_name] = 1
+                ops.append(('truncate', file_name, 1))
+            else:
+                file_name = live.pop(rnd.randrange(len(live)))
+                used -= sizes.pop(file_name)
+                ops.append(('delete', file_name))
+        else:
+            file_name = live[rnd.randrange(len(live))]
+            count = rnd.randint(1, chunk)
+            sizes[file_name] += count
+            used += count
+            ops.append(('extend', file_name, count))
+    return ops
+
+
+def save_trace(ops, path):
+    """
+    Grava um trace em texto: uma operação por linha ('create nome tamanho método' / 'delete nome'
+    / 'extend nome blocos' / 'truncate nome tamanho').
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        for op in ops:
+            f.write(" ".join(str(field) for field in op) + "\n")
+
+
+def load_trace(path, method='contiguous'):
+    """Lê um trace gravado por save_trace (linhas vazias e começadas por # são ignoradas)."""
+    ops = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            if fields[0] == 'create':
+                ops.append(('create', fields[1], int(fields[2]), fields[3] if len(fields) > 3 else method))
+            elif fields[0] == 'delete':
+                ops.append(('delete', fields[1]))
+            elif fields[0] in ('extend', 'truncate'):
+                ops.append((fields[0], fields[1], int(fields[2])))
+            else:
+                raise ValueError(f"Linha de trace inválida: {line.strip()}")
+    return ops
+
+
+def replay_trace(fs, ops, method=None, check_every=None):
+    """
+    Reproduz um trace no FileSystem medindo a latência de cada operação.
+    Se 'method' for dado, substitui o método de alocação das criações do trace.
+    Com check_every, roda FileSystem.check() a cada tantas operações e no fim (fora da
+    medição) e levanta RuntimeError na primeira inconsistência.
+    """
+    latencies = []
+    failures = 0
+    checking = 0.0
+    clock = time.perf_counter
+    started = clock()
+    for i, op in enumerate(ops):
+        t0 = clock()
+        if op[0] == 'create':
+            success, _ = fs.allocate(method or op[3], op[1], op[2])
+        elif op[0] == 'delete':
+            success, _ = fs.delete_file(op[1])
+        elif op[0] == 'extend':
+            success, _ = fs.extend(op[1], op[2])
+        else:
+            success, _ = fs.truncate(op[1], op[2])
+        latencies.append(clock() - t0)
+        if not success:
+            failures += 1
+        if check_every and ((i + 1) % check_every == 0 or i + 1 == len(ops)):
+            t0 = clock()
+            _raise_if_inconsistent(fs, f"operação {i + 1} ({op[0]} {op[1]})")
+            checking += clock() - t0
+    elapsed = clock() - started - checking
+    latencies.sort()
+    return {
+        'ops': len(ops),
+        'failures': failures,
+        'seconds': elapsed,
+        'ops_per_sec': len(ops) / elapsed if elapsed else 0.0,
+        'p50_us': _percentile(latencies, 0.50) * 1e6,
+        'p99_us': _percentile(latencies, 0.99) * 1e6,
+        'used_blocks': fs.num_blocks - fs.get_free_blocks_count(),
+        'fragmentation': fs.external_fragmentation(),
+        'check_seconds': checking,
+    }
+
+
+def _raise_if_inconsistent(fs, where):
+    """Roda fs.check() e levanta RuntimeError com um resumo se o disco estiver inconsistente."""
+    report = fs.check()
+    if report['ok']:
+        return
+    problems = report['errors'][:5]
+    if report['leaks']:
+        problems.append(f"{len(report['leaks'])} blocos perdidos")
+    if report['cross_links']:
+        problems.append(f"{len(report['cross_links'])} blocos com referência cruzada")
+    if report['cycles']:
+        problems.append(f"ciclos na FAT: {report['cycles'][:5]}")
+    raise RuntimeError(f"Disco inconsistente após {where}: " + "; ".join(problems))
+
+
+def run_benchmark(blocks, ops, engine='python', policy='first_fit', methods=ALLOCATION_METHODS,
+                  workload='churn', seed=0, max_size=64, trace=None, track_memory=False, io_model=None,
+                  index_mode='direct', pointers_per_block=POINTERS_PER_BLOCK, check_every=None, profiler=None):
+    """
+    Roda o mesmo trace (gerado ou lido de arquivo) para cada método de alocação, num
+    FileSystem novo a cada vez, e devolve uma linha de resultados por método.
+    track_memory mede o pico de memória com tracemalloc, o que deixa as operações mais lentas.
+    Com um IOCostModel em io_model, no fim simula a leitura de todos os arquivos que sobraram.
+    index_mode e pointers_per_block escolhem o formato do índice da alocação indexada.
+    check_every roda a verificação de consistência durante o replay (ver replay_trace).
+    Com um Profiler em 'profiler', mede os métodos de PROFILED_FS_METHODS de cada FileSystem.
+    """
+    if track_memory:
+        import tracemalloc
+    results = []
+    for method in methods:
+        trace_ops = trace if trace is not None else generate_workload(workload, ops, blocks, seed, method, max_size)
+        if track_memory:
+            tracemalloc.start()
+        fs = create_file_system(blocks, engine, policy)
+        fs.set_index_mode(index_mode, pointers_per_block)
+        if profiler is not None:
+            profiler.watch(fs, PROFILED_FS_METHODS)
+        result = replay_trace(fs, trace_ops, method, check_every)
+        if profiler is not None:
+            profiler.unwatch(fs)
+        result['index_entries'] = sum(len(entries) for entries in fs.index_table.values())
+        result['peak_memory_kb'] = None
+        if track_memory:
+            result['peak_memory_kb'] = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+        result['read_ms_per_file'] = result['read_mb_per_sec'] = result['read_seeks'] = None
+        if io_model is not None:
+            io_model.reset()
+            reads = io_model.read_all(fs)['total']
+            if reads is not None:
+                result.update(read_ms_per_file=reads['ms_per_file'], read_mb_per_sec=reads['mb_per_sec'],
+                              read_seeks=reads['seeks'])
+        result.update(method=method, engine=engine, policy=policy, workload=workload if trace is None else 'trace',
+                      blocks=blocks, seed=seed, index_mode=index_mode)
+        results.append(result)
+    return results
+
+
+def format_results(results):
+    """Monta a tabela de resultados da bancada em texto."""
+    reads = any(r.get('read_ms_per_file') is not None for r in results)
+    header = (f"{'método':<11} {'ops/s':>10} {'p50 (us)':>9} {'p99 (us)':>9} {'pico (KB)':>10} {'frag.':>6} "
+              f"{'falhas':>7} {'inodes':>8}")
+    if reads:
+        header += f" {'leitura (ms)':>12} {'MB/s':>8}"
+    lines = [header]
+    for r in results:
+        memory = f"{r['peak_memory_kb']:.0f}" if r['peak_memory_kb'] is not None else "-"
+        line = (f"{r['method']:<11} {r['ops_per_sec']:>10.0f} {r['p50_us']:>9.1f} {r['p99_us']:>9.1f} "
+                f"{memory:>10} {r['fragmentation']:>6.3f} {r['failures']:>7} {r.get('index_entries', 0):>8}")
+        if reads and r.get('read_ms_per_file') is not None:
+            line += f" {r['read_ms_per_file']:>12.2f} {r['read_mb_per_sec']:>8.2f}"
+        elif reads:
+            line += f" {'-':>12} {'-':>8}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+# --- Varredura de parâmetros em vários processos ---
+
+
+# Campos que identificam uma configuração da varredura (e a chave para retomá-la)
+SWEEP_FIELDS = ('engine', 'policy', 'blocks', 'workload', 'seed', 'method', 'index_mode', 'ops', 'max_size')
+
+
+def sweep_configs(engines=('python',), policies=('first_fit',), blocks=(100_000,), workloads=('churn',),
+                  seeds=(0,), methods=ALLOCATION_METHODS, index_modes=('direct',), ops=10_000, max_size=64):
+    """
+    Produto cartesiano dos parâmetros: uma configuração (dict com SWEEP_FIELDS) por simulação.
+    index_modes só se multiplica com o método 'indexed'; combinações impossíveis (motor
+    'numpy' com política 'buddy') ficam de fora.
+    """
+    configs = []
+    for engine, policy, num_blocks, workload, seed, method in itertools.product(
+            engines, policies, blocks, workloads, seeds, methods):
+        if engine == 'numpy' and policy == 'buddy':
+            continue
+        for index_mode in (index_modes if method == 'indexed' else ('direct',)):
+            configs.append({
+                'engine': engine, 'policy': policy, 'blocks': num_blocks, 'workload': workload,
+                'seed': seed, 'method': method, 'index_mode': index_mode, 'ops': ops, 'max_size': max_size,
+            })
+    return configs
+
+
+def sweep_key(config):
+    """Chave estável de uma configuração, usada para saber o que já rodou."""
+    return json.dumps([config[field] for field in SWEEP_FIELDS])
+
+
+def run_sweep_config(config):
+    """Roda uma configuração da varredura (num processo do pool); retorna a linha de resultado."""
+    result, = run_benchmark(config['blocks'], config['ops'], config['engine'], config['policy'],
+                            [config['method']], config['workload'], config['seed'], config['max_size'],
+                            index_mode=config['index_mode'])
+    result.update(config)
+    return result
+
+
+def load_sweep_results(path):
+    """Lê os resultados já gravados por run_sweep (uma linha JSON por configuração)."""
+    results = []
+    if not os.path.exists(path):
+        return results
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                results.append(json.loads(line))
+            except ValueError: # Última linha cortada por uma interrupção: a configuração roda de novo
+                break
+    return results
+
+
+def run_sweep(configs, results_path=None, workers=None, progress=None):
+    """
+    Roda as configurações em paralelo, num ProcessPoolExecutor com 'workers' processos
+    (None = um por núcleo; 1 = no próprio processo). Cada resultado é acrescentado a
+    'results_path' (JSON por linha) assim que chega; rodar de novo com o mesmo arquivo
+    retoma a varredura, pulando o que já terminou. progress(feitos, total, resultado) é
+    chamado a cada configuração. Retorna os resultados na ordem de 'configs'.
+    """
+    done = {}
+    if results_path is not None:
+        for result in load_sweep_results(results_path):
+            done[sweep_key(result)] = result
+    pending = [config for config in configs if sweep_key(config) not in done]
+    total, finished = len(configs), len(configs) - len(pending)
+
+    out = None
+    if results_path is not None: # Regrava o que valeu, descartando uma linha cortada no fim
+        out = open(results_path, 'w', encoding='utf-8')
+        for result in done.values():
+            out.write(json.dumps(result) + "\n")
+        out.flush()
+    try:
+        if workers == 1:
+            outcomes = map(run_sweep_config, pending)
+            executor = None
+        else:
+            from concurrent.futures import ProcessPoolExecutor, as_completed # Só as varreduras precisam
+            executor = ProcessPoolExecutor(max_workers=workers)
+            outcomes = (future.result() for future in
+                        as_completed([executor.submit(run_sweep_config, config) for config in pending]))
+        try:
+            for result in outcomes:
+                done[sweep_key(result)] = result
+                finished += 1
+                if out is not None:
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+                if progress is not None:
+                    progress(finished, total, result)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+    finally:
+        if out is not None:
+            out.close()
+    return [done[sweep_key(config)] for config in configs]
+
+
+def aggregate_sweep(results, group_by=('policy', 'method')):
+    """
+    Junta os resultados da varredura numa tabela: uma linha por combinação dos campos
+    'group_by', com a média das métricas sobre as demais (sementes, tamanhos...).
+    """
+    groups = {}
+    for result in results:
+        groups.setdefault(tuple(result[field] for field in group_by), []).append(result)
+    rows = []
+    for key in sorted(groups, key=lambda key: [str(value) for value in key]):
+        members = groups[key]
+        row = dict(zip(group_by, key))
+        row['runs'] = len(members)
+        for metric in ('ops_per_sec', 'p50_us', 'p99_us', 'fragmentation', 'failures'):
+            row[metric] = sum(r[metric] for r in members) / len(members)
+        rows.append(row)
+    return rows
+
+
+def format_sweep(rows, group_by=('policy', 'method')):
+    """Monta a tabela de aggregate_sweep em texto."""
+    widths = [max([len(field)] + [len(str(row[field])) for row in rows]) for field in group_by]
+    header = " ".join(f"{field:<{width}}" for field, width in zip(group_by, widths))
+    header += f" {'runs':>5} {'ops/s':>10} {'p50 (us)':>9} {'p99 (us)':>9} {'frag.':>6} {'falhas':>8}"
+    lines = [header]
+    for row in rows:
+        line = " ".join(f"{str(row[field]):<{width}}" for field, width in zip(group_by, widths))
+        line += (f" {row['runs']:>5} {row['ops_per_sec']:>10.0f} {row['p50_us']:>9.1f} {row['p99_us']:>9.1f} "
+                 f"{row['fragmentation']:>6.3f} {row['failures']:>8.1f}")
+        lines.append(line)
+    return "\n".join(lines)
+
+
+# --- Tempo de partida ---
+
+
+def measure_startup(blocks=1_000_000, engine='python', module='sistema_arquivos', repeat=5):
+    """
+    Mede, num interpretador novo a cada vez (como um processo de run_sweep), quanto custa
+    importar 'module' e criar um disco de 'blocks' blocos com o motor 'engine'. Retorna as
+    medianas, em ms, da importação, da criação e do processo inteiro, e se o Tkinter e o
+    NumPy acabaram carregados.
+    """
+    script = (
+        "import json, sys, time\n"
+        "t0 = time.perf_counter()\n"
+        f"import {module} as simulador\n"
+        "t1 = time.perf_counter()\n"
+        f"simulador.create_file_system({blocks}, {engine!r})\n"
+        "t2 = time.perf_counter()\n"
+        "print(json.dumps([t1 - t0, t2 - t1, 'tkinter' in sys.modules, 'numpy' in sys.modules]))\n")
+    import subprocess
+    here = os.path.dirname(os.path.abspath(__file__))
+    imports, creates, totals = [], [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', script], cwd=here, capture_output=True, text=True, check=True).stdout
+        totals.append(time.perf_counter() - started)
+        import_s, create_s, tk_loaded, np_loaded = json.loads(out)
+        imports.append(import_s)
+        creates.append(create_s)
+    median = lambda values: sorted(values)[len(values) // 2] * 1e3
+    return {
+        'module': module, 'engine': engine, 'blocks': blocks,
+        'import_ms': median(imports), 'create_ms': median(creates), 'process_ms': median(totals),
+        'tkinter_loaded': tk_loaded, 'numpy_loaded': np_loaded,
+    }
+
+
+def format_startup(results):
+    """Monta a tabela de measure_startup em texto."""
+    lines = [f"{'módulo':<17} {'motor':<8} {'blocos':>10} {'import (ms)':>11} {'disco (ms)':>10} {'processo (ms)':>13} "
+             f"{'tkinter':>7} {'numpy':>6}"]
+    for r in results:
+        lines.append(f"{r['module']:<17} {r['engine']:<8} {r['blocks']:>10} {r['import_ms']:>11.1f} {r['create_ms']:>10.1f} "
+                     f"{r['process_ms']:>13.1f} {'sim' if r['tkinter_loaded'] else 'não':>7} "
+                     f"{'sim' if r['numpy_loaded'] else 'não':>6}")
+    return "\n".join(lines)
+
+
+# --- Disputa entre threads (grupos de alocação) ---
+
+
+def run_contention_benchmark(blocks=200_000, threads=(1, 2, 4, 8), groups=8, ops_per_thread=5_000, method='contiguous',
+                             engine='python', policy='first_fit', max_size=16, seed=0):
+    """
+    Várias threads criando e apagando arquivos ao mesmo tempo num GroupedFileSystem, cada
+    uma com sua carga 'churn' e seu grupo preferido (as threads se espalham pelos grupos).
+    Para cada número de threads, roda com um grupo só (um lock global) e com 'groups'
+    grupos, e mede a vazão total e a fração das aquisições de lock que encontraram o lock
+    ocupado. Com o GIL do CPython as threads não rodam Python em paralelo, então a vazão
+    não cresce com os núcleos; o que os grupos eliminam é a fila no lock.
+    """
+    import threading
+    results = []
+    for num_threads in threads:
+        for num_groups in sorted({1, groups}):
+            fs = GroupedFileSystem(blocks, num_groups, engine, policy)
+            traces = []
+            for t in range(num_threads):
+                ops = generate_workload('churn', ops_per_thread, blocks // num_threads, seed + t, method, max_size)
+                traces.append([(op[0], f"t{t}/{op[1]}") + op[2:] for op in ops]) # Nomes distintos por thread
+            failures = [0] * num_threads
+            barrier = threading.Barrier(num_threads + 1)
+
+            def client(t):
+                group = t * num_groups // num_threads
+                barrier.wait()
+                for op in traces[t]:
+                    if op[0] == 'create':
+                        success, _ = fs.allocate(op[3], op[1], op[2], group)
+                    elif op[0] == 'delete':
+                        success, _ = fs.delete_file(op[1])
+                    elif op[0] == 'extend':
+                        success, _ = fs.extend(op[1], op[2])
+                    else:
+                        success, _ = fs.truncate(op[1], op[2])
+                    if not success:
+                        failures[t] += 1
+
+            workers = [threading.Thread(target=client, args=(t,)) for t in range(num_threads)]
+            for worker in workers:
+                worker.start()
+            barrier.wait()
+            started = time.perf_counter()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+            stats = fs.lock_stats()
+            acquisitions = sum(a for a, _ in stats)
+            total_ops = num_threads * ops_per_thread
+            results.append({
+                'threads': num_threads, 'groups': num_groups, 'ops': total_ops, 'seconds': elapsed,
+                'ops_per_sec': total_ops / elapsed if elapsed else 0.0,
+                'contention': sum(c for _, c in stats) / acquisitions if acquisitions else 0.0,
+                'failures': sum(failures), 'consistent': fs.check()['ok'],
+            })
+    return results
+
+
+def format_contention(results):
+    """Monta a tabela de run_contention_benchmark em texto."""
+    lines = [f"{'threads':>7} {'grupos':>6} {'ops/s':>10} {'disputa':>8} {'falhas':>7} {'fsck':>5}"]
+    for r in results:
+        lines.append(f"{r['threads']:>7} {r['groups']:>6} {r['ops_per_sec']:>10.0f} {r['contention']:>8.1%} "
+                     f"{r['failures']:>7} {'ok' if r['consistent'] else 'ERRO':>5}")
+    return "\n".join(lines)
@@ -0,0 +1,1493 @@
+"""Interface gráfica (Tkinter) do simulador."""
+import tkinter as tk
+from tkinter import ttk, messagebox, simpledialog, filedialog
+import random
+import functools
+import queue
+import threading
+from bisect import bisect_left, bisect_right
+
+from sistema_arquivos import (PLACEMENT_POLICIES, ALLOCATION_METHODS, INDEX_MODES, PROFILED_FS_METHODS, Defragmenter,
+                              IOCostModel, Profiler, create_file_system, load_image, save_image)
+from bancada import load_trace, replay_trace
+
+
+# Constantes (Vcs realmente leem isso?)
+BLOCK_SIZE = 30  # Tamanho visual de cada bloco em pixels
+BLOCK_PADDING = 5    # Espaçamento entre os blocos
+GRID_COLS = 16       # Número de colunas no disco
+GRID_ROWS = 8        # Número de linhas no disco
+TOTAL_BLOCKS = GRID_COLS * GRID_ROWS
+MIN_CELL_SIZE = 14   # Tamanho mínimo (px) de uma célula quando o disco não cabe na grade fixa
+DEFRAG_SLICE = 0.02  # Segundos de desfragmentação por passo na interface (entre eles a janela responde)
+WORKER_POLL_MS = 20  # Intervalo (ms) com que a interface busca os resultados do worker do FileSystem
+TRACE_CHUNK = 500    # Operações de trace por tarefa do worker na interface (redesenha entre elas)
+PROFILE_REFRESH_MS = 1000 # Intervalo (ms) de atualização da aba Desempenho enquanto a instrumentação está ligada
+
+
+# Cores
+COLOR_FREE = "#d3d3d3"
+COLOR_USED = "#34495E" # Célula agregada (vários blocos) totalmente ocupada
+COLOR_INDEX_BLOCK = "#8E44AD" # Roxo para blocos de índice (Inode)
+
+
+# Métodos da App medidos pela aba Desempenho (ver Profiler)
+PROFILED_APP_METHODS = ('draw_disk_blocks', 'refresh_views', 'update_file_list', 'update_fat_view', 'update_inode_view',
+                        'update_stats_view')
+
+
+class SortedNameIndex:
+    """
+    Conjunto ordenado de nomes guardado em blocos (listas ordenadas de até 2 * LOAD nomes).
+    Inserir e remover custam O(log F + LOAD), em vez do O(F) de deslocar uma lista única;
+    a posição de um nome, as fatias por posição e a busca por prefixo saem por bisect. As
+    posições iniciais dos blocos são recalculadas só quando alguém precisa delas.
+    """
+    LOAD = 512
+
+    def __init__(self, names=()):
+        self.reset(names)
+
+
+    def reset(self, names):
+        """Substitui todos os nomes."""
+        names = sorted(set(names))
+        self._chunks = [names[i:i + self.LOAD] for i in range(0, len(names), self.LOAD)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._starts = None # Posição do primeiro nome de cada bloco (None = desatualizado)
+        self._len = len(names)
+
+
+    def __len__(self):
+        return self._len
+
+
+    def __contains__(self, name):
+        i = bisect_left(self._maxes, name)
+        if i == len(self._maxes):
+            return False
+        chunk = self._chunks[i]
+        return chunk[bisect_left(chunk, name)] == name
+
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield from chunk
+
+
+    def add(self, name):
+        """Insere 'name'; retorna False se já estava lá."""
+        if not self._chunks:
+            self._chunks.append([name])
+            self._maxes.append(name)
+        else:
+            i = min(bisect_left(self._maxes, name), len(self._maxes) - 1)
+            chunk = self._chunks[i]
+            j = bisect_left(chunk, name)
+            if j < len(chunk) and chunk[j] == name:
+                return False
+            chunk.insert(j, name)
+            self._maxes[i] = chunk[-1]
+            if len(chunk) > 2 * self.LOAD: # Bloco grande demais: divide ao meio
+                self._chunks[i:i + 1] = [chunk[:self.LOAD], chunk[self.LOAD:]]
+                self._maxes[i:i + 1] = [chunk[self.LOAD - 1], chunk[-1]]
+        self._len += 1
+        self._starts = None
+        return True
+
+
+    def discard(self, name):
+        """Remove 'name'; retorna False se não estava lá."""
+        i = bisect_left(self._maxes, name)
+        if i == len(self._maxes):
+            return False
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, name)
+        if chunk[j] != name:
+            return False
+        del chunk[j]
+        if chunk:
+            self._maxes[i] = chunk[-1]
+        else:
+            del self._chunks[i]
+            del self._maxes[i]
+        self._len -= 1
+        self._starts = None
+        return True
+
+
+    def _block_starts(self):
+        if self._starts is None:
+            self._starts = [0]
+            for chunk in self._chunks[:-1]:
+                self._starts.append(self._starts[-1] + len(chunk))
+        return self._starts
+
+
+    def index(self, name):
+        """Posição de 'name' na ordem, ou onde ele entraria."""
+        i = bisect_left(self._maxes, name)
+        if i == len(self._maxes):
+            return self._len
+        return self._block_starts()[i] + bisect_left(self._chunks[i], name)
+
+
+    def __getitem__(self, k):
+        if not 0 <= k < self._len:
+            raise IndexError(k)
+        starts = self._block_starts()
+        i = bisect_right(starts, k) - 1
+        return self._chunks[i][k - starts[i]]
+
+
+    def slice(self, start, stop):
+        """Os nomes nas posições [start, stop)."""
+        start, stop = max(0, start), min(stop, self._len)
+        if start >= stop:
+            return []
+        starts = self._block_starts()
+        i = bisect_right(starts, start) - 1
+        names = []
+        offset = start - starts[i]
+        while len(names) < stop - start:
+            names.extend(self._chunks[i][offset:offset + stop - start - len(names)])
+            i += 1
+            offset = 0
+        return names
+
+
+    def prefix_range(self, prefix):
+        """(início, fim) das posições dos nomes que começam com 'prefix'."""
+        if not prefix:
+            return 0, self._len
+        return self.index(prefix), self.index(prefix[:-1] + chr(ord(prefix[-1]) + 1))
+
+
+class VirtualListbox:
+    """
+    Listbox virtualizada: só os nomes visíveis existem no widget. Os nomes vêm de um
+    SortedNameIndex, filtrados por prefixo; a seleção é guardada pelo nome, então continua
+    valendo quando a janela rola ou a lista muda. Com 'prefix_var' (a StringVar da caixa de
+    busca), o prefixo acompanha a variável e as mudanças de prefixo passam por ela.
+    """
+    def __init__(self, listbox, scrollbar, names, on_select=None, page_size=20, prefix_var=None):
+        self.listbox = listbox
+        self.scrollbar = scrollbar
+        self.names = names
+        self.on_select = on_select
+        self.prefix_var = prefix_var
+        self.prefix = prefix_var.get() if prefix_var is not None else ''
+        self.offset = 0     # Índice, dentro dos nomes filtrados, do primeiro visível
+        self.page_size = page_size
+        self.visible = []   # Nomes hoje no widget
+        self.selected = None
+        scrollbar.configure(command=self.on_scroll)
+        listbox.bind('<<ListboxSelect>>', self.on_listbox_select)
+        listbox.bind("<MouseWheel>", self.on_wheel)
+        listbox.bind("<Button-4>", self.on_wheel)
+        listbox.bind("<Button-5>", self.on_wheel)
+        listbox.bind("<Configure>", self.on_resize)
+        if prefix_var is not None:
+            prefix_var.trace_add("write", lambda *args: self.set_prefix(prefix_var.get()))
+
+
+    def set_prefix(self, prefix):
+        """Mostra só os nomes que começam com 'prefix' (vazio = todos)."""
+        self.prefix = prefix
+        self.offset = 0
+        self.refresh()
+
+
+    def refresh(self):
+        """Reescreve as linhas visíveis, se mudaram, e reaplica a seleção."""
+        if self.selected is not None and self.selected not in self.names:
+            self.selected = None
+        lo, hi = self.names.prefix_range(self.prefix)
+        self.offset = max(0, min(self.offset, hi - lo - self.page_size))
+        visible = self.names.slice(lo + self.offset, min(hi, lo + self.offset + self.page_size))
+        if visible != self.visible:
+            self.visible = visible
+            self.listbox.delete(0, tk.END)
+            if visible:
+                self.listbox.insert(tk.END, *visible)
+        self.listbox.selection_clear(0, tk.END)
+        if self.selected in visible:
+            self.listbox.selection_set(visible.index(self.selected))
+        total = max(1, hi - lo)
+        self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.page_size) / total))
+
+
+    def select(self, name):
+        """Seleciona 'name' e rola a lista até ele (o filtro é limpo se o esconder)."""
+        self.selected = name
+        if not name.startswith(self.prefix):
+            if self.prefix_var is not None:
+                self.prefix_var.set('') # Limpa também a caixa de busca (ver set_prefix)
+            else:
+                self.prefix = ''
+        lo = self.names.prefix_range(self.prefix)[0]
+        position = self.names.index(name) - lo
+        if not self.offset <= position < self.offset + self.page_size:
+            self.offset = position - self.page_size // 2
+        self.refresh()
+
+
+    def first_match(self):
+        """Primeiro nome que passa pelo filtro, ou None."""
+        lo, hi = self.names.prefix_range(self.prefix)
+        return self.names[lo] if lo < hi else None
+
+
+    def on_listbox_select(self, event=None):
+        selection = self.listbox.curselection()
+        if not selection or selection[0] >= len(self.visible):
+            return
+        self.selected = self.visible[selection[0]]
+        if self.on_select is not None:
+            self.on_select()
+
+
+    def scroll_to(self, offset):
+        self.offset = max(0, offset)
+        self.refresh()
+
+
+    def on_scroll(self, *args):
+        if args[0] == 'moveto':
+            lo, hi = self.names.prefix_range(self.prefix)
+            self.scroll_to(int(float(args[1]) * (hi - lo)))
+        elif args[0] == 'scroll':
+            step = self.page_size if args[2] == 'pages' else 1
+            self.scroll_to(self.offset + int(args[1]) * step)
+
+
+    def on_wheel(self, event):
+        up = event.num == 4 or getattr(event, 'delta', 0) > 0
+        self.scroll_to(self.offset + (-3 if up else 3))
+        return "break"
+
+
+    def on_resize(self, event):
+        page_size = max(1, event.height // 18) # ~18 px por linha
+        if page_size != self.page_size:
+            self.page_size = page_size
+            self.refresh()
+
+
+class VirtualTable:
+    """
+    Treeview virtualizada: só as linhas visíveis existem no widget. As linhas vêm de uma
+    lista ordenada de chaves mais uma função chave -> (valores, tags), e a lista é
+    atualizada chave a chave (update_keys) em vez de ser reconstruída.
+    """
+    def __init__(self, tree, scrollbar, row_source, page_size=10):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.row_source = row_source
+        self.keys = []      # Chaves ordenadas de todas as linhas
+        self.offset = 0     # Índice da primeira linha visível
+        self.page_size = page_size
+        self.items = []     # Linhas materializadas no widget (uma por posição visível)
+        scrollbar.configure(command=self.on_scroll)
+        tree.bind("<MouseWheel>", self.on_wheel)
+        tree.bind("<Button-4>", self.on_wheel)
+        tree.bind("<Button-5>", self.on_wheel)
+        tree.bind("<Configure>", self.on_resize)
+
+
+    def set_keys(self, keys):
+        """Substitui todas as linhas."""
+        self.keys = sorted(keys)
+        self.refresh()
+
+
+    def update_keys(self, changes):
+        """Aplica mudanças {chave -> presente?}; só as posições visíveis afetadas são reescritas."""
+        first_dirty = None
+        for key, present in changes.items():
+            i = bisect_left(self.keys, key)
+            exists = i < len(self.keys) and self.keys[i] == key
+            if present and not exists:
+                self.keys.insert(i, key)
+            elif not present and exists:
+                del self.keys[i]
+            elif not exists:
+                continue
+            elif not self.offset <= i < self.offset + self.page_size:
+                continue # Só o valor mudou, e a linha não está visível
+            if present != exists and i < self.offset: # Linhas acima da janela deslocaram a janela inteira
+                i = self.offset
+            if first_dirty is None or i < first_dirty:
+                first_dirty = i
+        if first_dirty is not None and first_dirty < self.offset + self.page_size:
+            self.refresh(first_dirty)
+
+
+    def refresh(self, first=None):
+        """Reescreve as posições visíveis a partir da linha 'first' (None = todas)."""
+        offset = max(0, min(self.offset, len(self.keys) - self.page_size))
+        if offset != self.offset: # A janela se deslocou: todas as posições mudam
+            self.offset = offset
+            first = None
+        visible = self.keys[self.offset:self.offset + self.page_size]
+        while len(self.items) > len(visible):
+            self.tree.delete(self.items.pop())
+        while len(self.items) < len(visible):
+            self.items.append(self.tree.insert('', tk.END, values=()))
+            first = None
+        start = 0 if first is None else max(0, first - self.offset)
+        for slot in range(start, len(visible)):
+            values, tags = self.row_source(visible[slot])
+            self.tree.item(self.items[slot], values=values, tags=tags)
+        total = max(1, len(self.keys))
+        self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.page_size) / total))
+
+
+    def scroll_to(self, offset):
+        self.offset = max(0, offset)
+        self.refresh()
+
+
+    def on_scroll(self, *args):
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * len(self.keys)))
+        elif args[0] == 'scroll':
+            step = self.page_size if args[2] == 'pages' else 1
+            self.scroll_to(self.offset + int(args[1]) * step)
+
+
+    def on_wheel(self, event):
+        up = event.num == 4 or getattr(event, 'delta', 0) > 0
+        self.scroll_to(self.offset + (-3 if up else 3))
+        return "break"
+
+
+    def on_resize(self, event):
+        page_size = max(1, event.height // 20 - 1) # ~20 px por linha, menos o cabeçalho
+        if page_size != self.page_size:
+            self.page_size = page_size
+            self.refresh()
+
+
+class FileSystemWorker:
+    """
+    Thread que roda as operações do FileSystem fora da thread do Tk. As tarefas entram numa
+    fila e são executadas em ordem, segurando 'lock'; os resultados voltam por outra fila,
+    esvaziada por poll() na thread da interface (chamado com after()). Quem lê o FileSystem
+    fora do worker deve segurar 'lock'.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.pending = 0 # Tarefas enviadas cujo resultado ainda não foi entregue por poll()
+        self.thread = threading.Thread(target=self.run, name="fs-worker", daemon=True)
+        self.thread.start()
+
+
+    def submit(self, func, *args, on_done=None, on_error=None):
+        """Enfileira func(*args); poll() depois chama on_done(resultado) ou on_error(exceção)."""
+        self.pending += 1
+        self.jobs.put((func, args, on_done, on_error))
+
+
+    def run(self):
+        while True:
+            func, args, on_done, on_error = self.jobs.get()
+            try:
+                with self.lock:
+                    value = func(*args)
+            except Exception as e:
+                self.results.put((on_error, e, True))
+            else:
+                self.results.put((on_done, value, False))
+
+
+    def poll(self):
+        """Entrega os resultados prontos, na thread que chama. Uma exceção sem on_error é relançada."""
+        while True:
+            try:
+                callback, value, failed = self.results.get_nowait()
+            except queue.Empty:
+                return
+            self.pending -= 1
+            if callback is not None:
+                callback(value)
+            elif failed:
+                raise value
+
+
+class App:
+    """
+    Classe principal da aplicação Tkinter.
+    """
+    def __init__(self, root, engine='python', num_blocks=TOTAL_BLOCKS, image=None):
+        self.root = root
+        self.root.title("Simulador de Gerenciamento de Arquivos")
+        self.root.geometry("1300x700") # Janela maior
+       
+        self.fs = load_image(image) if image else create_file_system(num_blocks, engine)
+        self.fs_subscription = self.fs.subscribe(self.on_fs_event) # As visões se atualizam pelos eventos de mudança
+        self.pending_events = []
+        self.file_index = SortedNameIndex(self.fs.files) # Nomes em ordem, para a lista virtualizada
+        self.file_colors = {name: self.get_random_color() for name in self.fs.files} # Mapeia nome de arquivo para uma cor
+
+        # Visão do disco com zoom: cada célula representa 'blocks_per_cell' blocos (nível de detalhe)
+        # e só as linhas visíveis (a partir de 'view_row') têm itens no canvas
+        self.blocks_per_cell = None # None = escolhe o nível que mostra o disco inteiro
+        self.view_row = 0
+        self.view_layout = None     # (colunas, linhas visíveis, tamanho da célula, espaçamento) em px
+        # Itens persistentes do canvas, um por posição visível: só são recoloridos/reescalados
+        self.slot_items = []        # [(id do retângulo, id do rótulo)]
+        self.slot_styles = []       # Estilo já aplicado a cada posição
+        self.highlighted_file = None
+        self.defragmenter = None    # Desfragmentação em andamento (ver on_defragment)
+        self.io_model = IOCostModel() # Custo simulado de leitura mostrado para o arquivo selecionado
+        # As operações no FileSystem rodam no worker; os redesenhos pedidos enquanto isso são
+        # juntados num só quadro, agendado com after_idle (ver schedule_redraw)
+        self.worker = FileSystemWorker()
+        self.redraw_scheduled = False
+        self.redraw_full = False
+        self.redraw_highlight = None
+        # Instrumentação (aba Desempenho): desligada, não custa nada
+        self.profiler = Profiler()
+        self.profiler.watch(self.fs, PROFILED_FS_METHODS)
+        self.profiler.watch(self, PROFILED_APP_METHODS)
+
+
+        self.create_widgets()
+        self.update_file_list()
+        self.update_info_panels()
+        self.draw_disk_blocks()
+        self.root.after(WORKER_POLL_MS, self.poll_worker)
+
+
+    def get_random_color(self):
+        """Gera uma cor hexadecimal aleatória e legível."""
+        # ... (código existente) ...
+        r = random.randint(100, 250)
+        g = random.randint(100, 250)
+        b = random.randint(100, 250)
+        return f'#{r:02x}{g:02x}{b:02x}'
+
+
+    def create_widgets(self):
+        """Cria os componentes da UI."""
+       
+        # --- Frame de Controle (Esquerda) ---
+        control_frame = ttk.Frame(self.root, padding=10, width=300)
+        control_frame.pack(side=tk.LEFT, fill=tk.Y)
+        control_frame.pack_propagate(False) # Impede que o frame encolha
+       
+        ttk.Label(control_frame, text="Simulador de Alocação de Disco", font=("Arial", 16)).pack(pady=10)
+       
+        # --- Seção Criar Arquivo ---
+        create_frame = ttk.LabelFrame(control_frame, text="Criar Arquivo", padding=10)
+        create_frame.pack(fill=tk.X, pady=10)
+
+
+        # ... (código existente) ...
+        ttk.Label(create_frame, text="Nome:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=2)
+        self.entry_file_name = ttk.Entry(create_frame, width=20)
+        self.entry_file_name.grid(row=0, column=1, sticky=tk.W, padx=5, pady=2)
+
+
+        ttk.Label(create_frame, text="Tamanho (blocos):").grid(row=1, column=0, sticky=tk.W, padx=5, pady=2)
+        self.spin_file_size = ttk.Spinbox(create_frame, from_=1, to=self.fs.num_blocks, width=5)
+        self.spin_file_size.grid(row=1, column=1, sticky=tk.W, padx=5, pady=2)
+
+
+        ttk.Label(create_frame, text="Método:").grid(row=2, column=0, sticky=tk.W, padx=5, pady=2)
+        self.alloc_method = tk.StringVar(value="contiguous")
+        ttk.Radiobutton(create_frame, text="Contígua", variable=self.alloc_method, value="contiguous").grid(row=2, column=1, sticky=tk.W, padx=5)
+        ttk.Radiobutton(create_frame, text="Encadeada (FAT)", variable=self.alloc_method, value="linked").grid(row=3, column=1, sticky=tk.W, padx=5)
+        # Novo Radiobutton para Indexada
+        ttk.Radiobutton(create_frame, text="Indexada (Inode)", variable=self.alloc_method, value="indexed").grid(row=4, column=1, sticky=tk.W, padx=5)
+       
+        ttk.Label(create_frame, text="Política:").grid(row=5, column=0, sticky=tk.W, padx=5, pady=2)
+        self.placement_policy = tk.StringVar(value=PLACEMENT_POLICIES[self.fs.policy])
+        policy_box = ttk.Combobox(create_frame, textvariable=self.placement_policy, values=list(PLACEMENT_POLICIES.values()), state="readonly", width=12)
+        policy_box.grid(row=5, column=1, sticky=tk.W, padx=5, pady=2)
+        policy_box.bind("<<ComboboxSelected>>", self.on_policy_change)
+
+        ttk.Label(create_frame, text="Índice:").grid(row=6, column=0, sticky=tk.W, padx=5, pady=2)
+        self.index_mode = tk.StringVar(value=INDEX_MODES[self.fs.index_mode])
+        index_box = ttk.Combobox(create_frame, textvariable=self.index_mode, values=list(INDEX_MODES.values()), state="readonly", width=12)
+        index_box.grid(row=6, column=1, sticky=tk.W, padx=5, pady=2)
+        index_box.bind("<<ComboboxSelected>>", self.on_index_mode_change)
+       
+        ttk.Button(create_frame, text="Criar Arquivo", command=self.on_create_file).grid(row=7, column=0, columnspan=2, pady=10)
+        ttk.Button(create_frame, text="Criar Lote Aleatório...", command=self.on_random_batch).grid(row=8, column=0, columnspan=2)
+        ttk.Button(create_frame, text="Reproduzir Trace...", command=self.on_replay_trace).grid(row=9, column=0, columnspan=2, pady=(5, 0))
+
+
+        # --- Seção Imagem do Disco ---
+        image_frame = ttk.LabelFrame(control_frame, text="Imagem do Disco", padding=10)
+        image_frame.pack(fill=tk.X)
+        ttk.Button(image_frame, text="Salvar...", command=self.on_save_image).pack(side=tk.LEFT, expand=True)
+        ttk.Button(image_frame, text="Abrir...", command=self.on_open_image).pack(side=tk.LEFT, expand=True)
+
+
+        # --- Seção Gerenciar Arquivos ---
+        manage_frame = ttk.LabelFrame(control_frame, text="Arquivos no Disco", padding=10)
+        manage_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+       
+        search_frame = ttk.Frame(manage_frame)
+        search_frame.pack(fill=tk.X, side=tk.TOP, pady=(0, 5))
+        ttk.Label(search_frame, text="Buscar:").pack(side=tk.LEFT)
+        self.file_filter = tk.StringVar(value="")
+        search_entry = ttk.Entry(search_frame, textvariable=self.file_filter)
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
+        search_entry.bind("<Return>", self.on_search_enter)
+
+        list_frame = ttk.Frame(manage_frame)
+        list_frame.pack(fill=tk.BOTH, expand=True, side=tk.TOP)
+        self.file_listbox = tk.Listbox(list_frame, exportselection=False)
+        vsb_files = ttk.Scrollbar(list_frame, orient="vertical")
+        self.file_list = VirtualListbox(self.file_listbox, vsb_files, self.file_index, self.on_file_select,
+                                        prefix_var=self.file_filter)
+        vsb_files.pack(side=tk.RIGHT, fill=tk.Y)
+        self.file_listbox.pack(fill=tk.BOTH, expand=True)
+       
+        ttk.Button(manage_frame, text="Deletar Selecionado", command=self.on_delete_file).pack(pady=(10, 0))
+
+        resize_frame = ttk.Frame(manage_frame)
+        resize_frame.pack(pady=(10, 0))
+        self.spin_resize = ttk.Spinbox(resize_frame, from_=1, to=self.fs.num_blocks, width=5)
+        self.spin_resize.set(1)
+        self.spin_resize.pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(resize_frame, text="Estender", command=self.on_extend_file).pack(side=tk.LEFT)
+        ttk.Button(resize_frame, text="Truncar", command=self.on_truncate_file).pack(side=tk.LEFT)
+        ttk.Button(manage_frame, text="Desfragmentar", command=self.on_defragment).pack(pady=(10, 0))
+        ttk.Button(manage_frame, text="Verificar Disco", command=self.on_check).pack(pady=10)
+       
+        self.label_file_info = ttk.Label(manage_frame, text="Selecione um arquivo para ver detalhes", wraplength=280, justify=tk.LEFT)
+        self.label_file_info.pack(side=tk.BOTTOM, fill=tk.X)
+
+
+        # --- Frame do Disco (Meio) ---
+        disk_frame = ttk.Frame(self.root, padding=10)
+        disk_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        zoom_frame = ttk.Frame(disk_frame)
+        zoom_frame.pack(side=tk.TOP, fill=tk.X)
+        ttk.Button(zoom_frame, text="Zoom +", command=lambda: self.zoom_disk_view(0.5)).pack(side=tk.LEFT)
+        ttk.Button(zoom_frame, text="Zoom -", command=lambda: self.zoom_disk_view(2)).pack(side=tk.LEFT)
+        ttk.Button(zoom_frame, text="Disco Inteiro", command=self.fit_disk_view).pack(side=tk.LEFT)
+        self.label_zoom = ttk.Label(zoom_frame, text="")
+        self.label_zoom.pack(side=tk.LEFT, padx=10)
+
+        self.disk_scrollbar = ttk.Scrollbar(disk_frame, orient="vertical", command=self.on_disk_scroll)
+        self.disk_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.canvas = tk.Canvas(disk_frame, bg="#ffffff")
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+       
+        # Bind para redimensionar o canvas
+        self.canvas.bind("<Configure>", lambda e: self.schedule_redraw(self.get_selected_file()))
+        # Roda do mouse rola o disco; com Ctrl, muda o zoom
+        self.canvas.bind("<MouseWheel>", self.on_disk_wheel)
+        self.canvas.bind("<Button-4>", self.on_disk_wheel)
+        self.canvas.bind("<Button-5>", self.on_disk_wheel)
+
+
+        # --- Frame de Informações (Direita) ---
+        self.info_frame = ttk.Frame(self.root, padding=10, width=300)
+        self.info_frame.pack(side=tk.RIGHT, fill=tk.Y)
+        self.info_frame.pack_propagate(False)
+       
+        self.create_info_panel(self.info_frame)
+
+
+    def create_info_panel(self, parent):
+        """Cria o painel de abas com FAT, Inodes e Estatísticas."""
+        notebook = ttk.Notebook(parent)
+        notebook.pack(fill=tk.BOTH, expand=True)
+       
+        # --- Aba 1: Visualização da FAT ---
+        fat_tab = ttk.Frame(notebook)
+        notebook.add(fat_tab, text="Tabela FAT")
+       
+        fat_frame = ttk.Frame(fat_tab, padding=5)
+        fat_frame.pack(fill=tk.BOTH, expand=True)
+       
+        ttk.Label(fat_frame, text="Índice: Valor (Próx. Bloco)").pack()
+       
+        cols = ('Bloco', 'Valor')
+        self.fat_view = ttk.Treeview(fat_frame, columns=cols, show='headings', height=10)
+        for col in cols:
+            self.fat_view.heading(col, text=col)
+            self.fat_view.column(col, width=60, anchor=tk.CENTER)
+       
+        vsb_fat = ttk.Scrollbar(fat_frame, orient="vertical")
+        self.fat_table = VirtualTable(self.fat_view, vsb_fat, self.fat_row)
+        self.fat_view.tag_configure('eof', background='#FFC107') # Destaca EOF
+       
+        vsb_fat.pack(side=tk.RIGHT, fill=tk.Y)
+        self.fat_view.pack(fill=tk.BOTH, expand=True)
+       
+        # --- Aba 2: Tabela de Inodes ---
+        inode_tab = ttk.Frame(notebook)
+        notebook.add(inode_tab, text="Inodes")
+       
+        inode_frame = ttk.Frame(inode_tab, padding=5)
+        inode_frame.pack(fill=tk.BOTH, expand=True)
+       
+        ttk.Label(inode_frame, text="Bloco de Índice -> [Blocos de Dados]").pack()
+       
+        cols_inode = ('Índice', 'Blocos de Dados')
+        self.inode_view = ttk.Treeview(inode_frame, columns=cols_inode, show='headings', height=10)
+        self.inode_view.heading('Índice', text='Índice')
+        self.inode_view.column('Índice', width=50, anchor=tk.CENTER)
+        self.inode_view.heading('Blocos de Dados', text='Blocos de Dados')
+        self.inode_view.column('Blocos de Dados', width=150)
+       
+        vsb_inode = ttk.Scrollbar(inode_frame, orient="vertical")
+        self.inode_table = VirtualTable(self.inode_view, vsb_inode, self.inode_row)
+       
+        vsb_inode.pack(side=tk.RIGHT, fill=tk.Y)
+        self.inode_view.pack(fill=tk.BOTH, expand=True)
+
+
+        # --- Aba 3: Estatísticas ---
+        stats_tab = ttk.Frame(notebook)
+        notebook.add(stats_tab, text="Estatísticas")
+       
+        stats_frame = ttk.Frame(stats_tab, padding=20)
+        stats_frame.pack(fill=tk.BOTH, expand=True)
+       
+        self.label_total_space = ttk.Label(stats_frame, text="Espaço Total: ...", font=("Arial", 12))
+        self.label_total_space.pack(anchor=tk.W, pady=5)
+       
+        self.label_used_space = ttk.Label(stats_frame, text="Espaço Usado: ...", font=("Arial", 12))
+        self.label_used_space.pack(anchor=tk.W, pady=5)
+       
+        self.label_free_space = ttk.Label(stats_frame, text="Espaço Livre: ...", font=("Arial", 12))
+        self.label_free_space.pack(anchor=tk.W, pady=5)
+
+        self.label_fragmentation = ttk.Label(stats_frame, text="", font=("Arial", 12), justify=tk.LEFT)
+        self.label_fragmentation.pack(anchor=tk.W, pady=5)
+
+        self.label_locality = ttk.Label(stats_frame, text="", font=("Arial", 12), justify=tk.LEFT)
+        self.label_locality.pack(anchor=tk.W, pady=5)
+
+
+        # --- Aba 4: Desempenho (ver Profiler) ---
+        profile_tab = ttk.Frame(notebook)
+        notebook.add(profile_tab, text="Desempenho")
+
+        profile_frame = ttk.Frame(profile_tab, padding=5)
+        profile_frame.pack(fill=tk.BOTH, expand=True)
+
+        self.profiling = tk.BooleanVar(value=False)
+        ttk.Checkbutton(profile_frame, text="Medir chamadas", variable=self.profiling, command=self.on_profile_toggle).pack(anchor=tk.W)
+
+        buttons = ttk.Frame(profile_frame)
+        buttons.pack(side=tk.BOTTOM, fill=tk.X, pady=(5, 0))
+        ttk.Button(buttons, text="Atualizar", command=self.update_profile_view).pack(side=tk.LEFT)
+        ttk.Button(buttons, text="Zerar", command=self.on_profile_reset).pack(side=tk.LEFT)
+        ttk.Button(buttons, text="Exportar JSON...", command=self.on_profile_export).pack(side=tk.LEFT)
+
+        cols_profile = ('Método', 'Chamadas', 'Total (ms)', 'p50 (us)', 'p99 (us)')
+        self.profile_view = ttk.Treeview(profile_frame, columns=cols_profile, show='headings', height=10)
+        for col in cols_profile:
+            self.profile_view.heading(col, text=col)
+            self.profile_view.column(col, width=45, anchor=tk.E)
+        self.profile_view.column('Método', width=110, anchor=tk.W)
+        self.profile_view.pack(fill=tk.BOTH, expand=True)
+
+
+    def update_info_panels(self):
+        """Atualiza todas as abas de informação por inteiro (ver refresh_views)."""
+        self.update_fat_view()
+        self.update_inode_view()
+        self.update_stats_view()
+
+
+    def update_fat_view(self, changed=None):
+        """Atualiza a Tabela FAT: só as entradas alteradas, ou tudo se 'changed' for None."""
+        if changed is None:
+            self.fat_table.set_keys(i for i, _ in self.fs.fat_entries()) # Mostra apenas entradas não-livres
+        else:
+            self.fat_table.update_keys({i: self.fs.fat[i] != 0 for i in changed})
+
+
+    def fat_row(self, block):
+        val = int(self.fs.fat[block])
+        return (block, val), ('eof',) if val == -1 else ()
+
+
+    def update_inode_view(self, changed=None):
+        """Atualiza a Tabela de Inodes: só as entradas alteradas, ou tudo se 'changed' for None."""
+        if changed is None:
+            self.inode_table.set_keys(self.fs.index_table)
+        else:
+            self.inode_table.update_keys({i: i in self.fs.index_table for i in changed})
+
+
+    def inode_row(self, index_block):
+        data_str = ", ".join(map(str, self.fs.index_table[index_block]))
+        return (index_block, data_str), ()
+           
+    def update_profile_view(self):
+        """Mostra as medições do Profiler na aba Desempenho."""
+        self.profile_view.delete(*self.profile_view.get_children())
+        for label, row in self.profiler.stats().items():
+            self.profile_view.insert('', tk.END, values=(label.split('.', 1)[1], row['calls'], f"{row['total_ms']:.1f}",
+                                                         f"{row['p50_us']:.1f}", f"{row['p99_us']:.1f}"))
+
+
+    def on_profile_toggle(self):
+        """Callback de 'Medir chamadas': liga/desliga o Profiler."""
+        if self.profiling.get():
+            self.profiler.enable()
+            self.root.after(PROFILE_REFRESH_MS, self.profile_tick)
+        else:
+            self.profiler.disable()
+        self.update_profile_view()
+
+
+    def profile_tick(self):
+        """Atualiza a aba Desempenho periodicamente enquanto a instrumentação está ligada."""
+        if self.profiler.enabled:
+            self.update_profile_view()
+            self.root.after(PROFILE_REFRESH_MS, self.profile_tick)
+
+
+    def on_profile_reset(self):
+        self.profiler.reset()
+        self.update_profile_view()
+
+
+    def on_profile_export(self):
+        """Callback de 'Exportar JSON...': grava as medições (ver Profiler.export_json)."""
+        path = filedialog.asksaveasfilename(parent=self.root, defaultextension=".json",
+                                            filetypes=[("JSON", "*.json"), ("Todos", "*")])
+        if not path:
+            return
+        try:
+            self.profiler.export_json(path)
+        except OSError as e:
+            messagebox.showerror("Erro", f"Não foi possível gravar as medições: {e}")
+            return
+        messagebox.showinfo("Sucesso", f"Medições gravadas em {path}")
+
+
+    def update_stats_view(self):
+        """Atualiza as estatísticas do disco."""
+        total = self.fs.num_blocks
+        free = self.fs.get_free_blocks_count()
+        used = total - free
+       
+        self.label_total_space.config(text=f"Espaço Total: {total} blocos")
+        self.label_used_space.config(text=f"Espaço Usado: {used} blocos")
+        self.label_free_space.config(text=f"Espaço Livre: {free} blocos")
+
+        metrics = self.fs.metrics()
+        histogram = ", ".join(f"{1 << c}-{(2 << c) - 1}: {n}" if c else f"1: {n}"
+                              for c, n in enumerate(metrics['free_extent_histogram']) if n)
+        self.label_fragmentation.config(text=(
+            f"Maior Trecho Livre: {metrics['largest_free_extent']} blocos\n"
+            f"Fragmentação Externa: {metrics['external_fragmentation']:.1%}\n"
+            f"Trechos Livres por Tamanho: {histogram or '-'}"))
+        self.label_locality.config(text=(
+            f"Fragmentos por Arquivo (média): {metrics['avg_fragments']:.2f}\n"
+            f"Distância Média de Seek: {metrics['avg_seek_distance']:.2f} blocos"))
+
+
+    def on_create_file(self):
+        """Callback do botão 'Criar Arquivo'."""
+        # ... (código existente) ...
+        file_name = self.entry_file_name.get()
+        try:
+            file_size = int(self.spin_file_size.get())
+        except ValueError:
+            messagebox.showerror("Erro", "Tamanho do arquivo deve ser um número.")
+            return
+
+
+        if not file_name:
+            messagebox.showerror("Erro", "Nome do arquivo não pode ser vazio.")
+            return
+
+
+        method = self.alloc_method.get()
+        self.worker.submit(self.fs.allocate, method, file_name, file_size, on_done=self.on_file_created)
+
+
+    def on_file_created(self, result):
+        """Resultado (no worker) da alocação pedida por on_create_file."""
+        success, message = result
+        if success:
+            self.schedule_redraw(self.get_selected_file())
+            messagebox.showinfo("Sucesso", message)
+            self.entry_file_name.delete(0, tk.END) # Limpa o campo
+        else:
+            messagebox.showerror("Erro de Alocação", message)
+
+
+    def on_random_batch(self):
+        """Callback do botão 'Criar Lote Aleatório...': cria vários arquivos num único lote."""
+        count = simpledialog.askinteger("Lote Aleatório", "Quantos arquivos criar?", parent=self.root, minvalue=1)
+        if not count:
+            return
+        self.worker.submit(self.apply_random_batch, self.fs, count, on_done=self.on_batch_done)
+
+
+    def apply_random_batch(self, fs, count):
+        """Monta e aplica o lote aleatório (no worker, que segura o lock enquanto lê os nomes existentes)."""
+        max_size = max(1, min(8, fs.num_blocks // count))
+        ops = []
+        n = len(fs.files)
+        for _ in range(count):
+            file_name = f"lote_{n}"
+            while file_name in fs.files: # Evita colisão com nomes existentes
+                n += 1
+                file_name = f"lote_{n}"
+            n += 1
+            ops.append(('create', file_name, random.randint(1, max_size), random.choice(ALLOCATION_METHODS)))
+        return fs.apply_batch(ops)
+
+
+    def run_batch(self, ops):
+        """Aplica um lote no FileSystem (ver FileSystem.apply_batch), no worker, e redesenha uma única vez."""
+        self.worker.submit(self.fs.apply_batch, ops, on_done=self.on_batch_done)
+
+
+    def on_batch_done(self, result):
+        success, message = result
+        self.schedule_redraw(self.get_selected_file()) # Um lote desfeito também emite eventos
+        if success:
+            messagebox.showinfo("Sucesso", message)
+        else:
+            messagebox.showerror("Erro de Alocação", message)
+
+
+    def on_replay_trace(self):
+        """Callback do botão 'Reproduzir Trace...': reproduz um trace gravado (ver save_trace) no disco atual."""
+        path = filedialog.askopenfilename(parent=self.root, filetypes=[("Trace", "*.trace *.txt"), ("Todos", "*")])
+        if not path:
+            return
+        try:
+            ops = load_trace(path, self.alloc_method.get())
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Erro", f"Não foi possível ler o trace: {e}")
+            return
+        self.replay_chunk(self.fs, ops, 0, {'ops': 0, 'failures': 0, 'seconds': 0.0})
+
+
+    def replay_chunk(self, fs, ops, start, totals):
+        """Reproduz TRACE_CHUNK operações do trace no worker; a próxima fatia só vai depois do redesenho."""
+        if fs is not self.fs: # Outra imagem foi aberta no meio
+            return
+        if start >= len(ops):
+            messagebox.showinfo("Trace", f"{totals['ops']} operações em {totals['seconds']:.2f} s, "
+                                         f"{totals['failures']} falharam.")
+            return
+        def chunk_done(result):
+            for key in totals:
+                totals[key] += result[key]
+            self.schedule_redraw(self.highlighted_file)
+            self.root.after_idle(self.replay_chunk, fs, ops, start + TRACE_CHUNK, totals)
+        self.worker.submit(replay_trace, fs, ops[start:start + TRACE_CHUNK], on_done=chunk_done,
+                           on_error=lambda e: messagebox.showerror("Erro", str(e)))
+
+
+    def on_save_image(self):
+        """Callback do botão 'Salvar...': grava o disco numa imagem (ver save_image)."""
+        path = filedialog.asksaveasfilename(parent=self.root, defaultextension=".img",
+                                            filetypes=[("Imagem de disco", "*.img"), ("Todos", "*")])
+        if not path:
+            return
+        self.worker.submit(save_image, self.fs, path,
+                           on_done=lambda _: messagebox.showinfo("Sucesso", f"Imagem gravada em {path}"),
+                           on_error=lambda e: messagebox.showerror("Erro", f"Não foi possível gravar a imagem: {e}"))
+
+
+    def on_open_image(self):
+        """Callback do botão 'Abrir...': troca o disco atual pelo de uma imagem (ver load_image)."""
+        path = filedialog.askopenfilename(parent=self.root, filetypes=[("Imagem de disco", "*.img"), ("Todos", "*")])
+        if not path:
+            return
+        self.worker.submit(load_image, path, on_done=self.set_file_system,
+                           on_error=lambda e: messagebox.showerror("Erro", f"Não foi possível abrir a imagem: {e}"))
+
+
+    def set_file_system(self, fs):
+        """Troca o disco mostrado pela interface."""
+        with self.worker.lock: # Tarefas que ainda estão na fila rodam no disco antigo, sem avisar a interface
+            self.fs.unsubscribe(self.fs_subscription)
+            self.profiler.unwatch(self.fs)
+            self.fs = fs
+            self.profiler.watch(self.fs, PROFILED_FS_METHODS)
+            self.fs_subscription = self.fs.subscribe(self.on_fs_event)
+            self.pending_events = []
+            self.file_colors = {name: self.get_random_color() for name in self.fs.files}
+            self.spin_file_size.config(to=self.fs.num_blocks)
+            self.spin_resize.config(to=self.fs.num_blocks)
+            self.placement_policy.set(PLACEMENT_POLICIES[self.fs.policy])
+            self.index_mode.set(INDEX_MODES[self.fs.index_mode])
+            self.label_file_info.config(text="Selecione um arquivo para ver detalhes")
+            self.blocks_per_cell = None # Volta a mostrar o disco inteiro
+            self.view_row = 0
+            self.update_file_list()
+            self.update_info_panels()
+            self.draw_disk_blocks(dirty=None)
+
+
+    def on_policy_change(self, event=None):
+        """Callback do seletor de política de posicionamento."""
+        label = self.placement_policy.get()
+        for policy, policy_label in PLACEMENT_POLICIES.items():
+            if policy_label == label:
+                def rejected(e):
+                    messagebox.showerror("Erro", str(e))
+                    self.placement_policy.set(PLACEMENT_POLICIES[self.fs.policy])
+                self.worker.submit(self.fs.set_policy, policy, on_error=rejected)
+                break
+
+
+    def on_index_mode_change(self, event=None):
+        """Callback do seletor de formato do índice (alocação indexada)."""
+        label = self.index_mode.get()
+        for mode, mode_label in INDEX_MODES.items():
+            if mode_label == label:
+                self.worker.submit(self.fs.set_index_mode, mode)
+                break
+
+
+    def on_delete_file(self):
+        """Callback do botão 'Deletar Selecionado'."""
+        # ... (código existente) ...
+        file_name = self.get_selected_file()
+        if not file_name:
+            messagebox.showerror("Erro", "Selecione um arquivo para deletar.")
+            return
+
+
+        self.worker.submit(self.fs.delete_file, file_name, on_done=self.on_file_deleted)
+
+
+    def on_file_deleted(self, result):
+        """Resultado (no worker) da remoção pedida por on_delete_file."""
+        success, message = result
+        if success:
+            self.schedule_redraw(self.get_selected_file())
+            messagebox.showinfo("Sucesso", message)
+            self.label_file_info.config(text="Selecione um arquivo para ver detalhes")
+        else:
+            messagebox.showerror("Erro", message)
+
+
+    def on_extend_file(self):
+        """Callback do botão 'Estender': acrescenta ao arquivo selecionado o número de blocos indicado."""
+        self.resize_selected(self.fs.extend, "estender")
+
+
+    def on_truncate_file(self):
+        """Callback do botão 'Truncar': reduz o arquivo selecionado ao número de blocos indicado."""
+        self.resize_selected(self.fs.truncate, "truncar")
+
+
+    def resize_selected(self, operation, verb):
+        """Aplica extend/truncate do FileSystem ao arquivo selecionado, com a quantidade do Spinbox."""
+        file_name = self.get_selected_file()
+        if not file_name:
+            messagebox.showerror("Erro", f"Selecione um arquivo para {verb}.")
+            return
+        try:
+            count = int(self.spin_resize.get())
+        except ValueError:
+            messagebox.showerror("Erro", "A quantidade de blocos deve ser um número inteiro.")
+            return
+        def resized(result):
+            success, message = result
+            if success:
+                self.schedule_redraw(file_name)
+                self.on_file_select()
+            else:
+                messagebox.showerror("Erro", message)
+        self.worker.submit(operation, file_name, count, on_done=resized)
+
+
+    def on_fs_event(self, event):
+        """Ouvinte do FileSystem (chamado no worker): guarda o evento até o próximo refresh_views()."""
+        self.pending_events.append(event)
+
+
+    def poll_worker(self):
+        """Entrega os resultados do worker aos callbacks da interface e agenda a próxima busca."""
+        try:
+            self.worker.poll()
+        finally:
+            self.root.after(WORKER_POLL_MS, self.poll_worker)
+
+
+    def schedule_redraw(self, highlight_file=None, full=False):
+        """
+        Pede um redesenho das visões. Os pedidos até a janela ficar ociosa viram um só quadro;
+        vale o último destaque pedido, e 'full' confere todas as células visíveis.
+        """
+        self.redraw_highlight = highlight_file
+        self.redraw_full = self.redraw_full or full
+        if not self.redraw_scheduled:
+            self.redraw_scheduled = True
+            self.root.after_idle(self.redraw)
+
+
+    def redraw(self):
+        """Faz o redesenho agendado; se o worker está no meio de uma tarefa, tenta de novo depois."""
+        if not self.worker.lock.acquire(blocking=False):
+            self.root.after(WORKER_POLL_MS, self.redraw)
+            return
+        try:
+            self.redraw_scheduled = False
+            full, self.redraw_full = self.redraw_full, False
+            self.refresh_views(self.redraw_highlight, full)
+        finally:
+            self.worker.lock.release()
+
+
+    def refresh_views(self, highlight_file=None, full=False):
+        """Aplica os eventos pendentes às visões: só as linhas, entradas e células que mudaram."""
+        events, self.pending_events = self.pending_events, []
+        dirty, fat, inodes, files = set(), set(), set(), set()
+        for event in events:
+            dirty.update(event.claimed, event.freed, event.inodes_added, event.inodes_removed)
+            fat |= event.fat
+            inodes |= event.inodes_added | event.inodes_removed
+            files |= event.files_added | event.files_removed
+        for file_name in files: # Cor nova para quem foi criado, nenhuma para quem saiu
+            if file_name in self.fs.files:
+                self.file_colors.setdefault(file_name, self.get_random_color())
+            else:
+                self.file_colors.pop(file_name, None)
+        self.update_file_list(files)
+        self.update_fat_view(fat)
+        self.update_inode_view(inodes)
+        self.update_stats_view()
+        self.draw_disk_blocks(highlight_file, dirty=None if full else dirty)
+
+
+    def on_defragment(self):
+        """Callback do botão 'Desfragmentar': roda o Defragmenter em fatias, sem travar a janela."""
+        if self.defragmenter is not None: # Já em andamento (ou sendo criada no worker)
+            return
+        self.defragmenter = False
+        def failed(e):
+            self.defragmenter = None
+            raise e
+        # O Defragmenter mede o maior trecho livre ao ser criado: também lê o disco, então vai para o worker
+        self.worker.submit(Defragmenter, self.fs, on_done=self.defragment_started, on_error=failed)
+
+
+    def defragment_started(self, defrag):
+        self.defragmenter = defrag
+        self.defragment_tick()
+
+
+    def defragment_tick(self):
+        """Um passo da desfragmentação, no worker; defragment_done agenda o próximo até terminar."""
+        defrag = self.defragmenter
+        if defrag.fs is not self.fs: # Outra imagem foi aberta no meio
+            self.defragmenter = None
+            return
+        def failed(e):
+            if not isinstance(e, RuntimeError):
+                raise e
+            messagebox.showerror("Erro", str(e))
+            self.defragment_done(True)
+        self.worker.submit(functools.partial(defrag.step, time_limit=DEFRAG_SLICE), on_done=self.defragment_done,
+                           on_error=failed)
+
+
+    def defragment_done(self, done):
+        defrag = self.defragmenter
+        self.schedule_redraw(self.highlighted_file)
+        if not done:
+            self.root.after(1, self.defragment_tick)
+            return
+        self.defragmenter = None
+        if self.get_selected_file():
+            self.on_file_select() # Os blocos do arquivo selecionado podem ter mudado
+        report = defrag.report()
+        messagebox.showinfo("Desfragmentação", f"{report['moves']} movimentos de bloco. Maior trecho livre: "
+                                               f"{report['largest_before']} -> {report['largest_after']} blocos.")
+
+
+    def on_check(self):
+        """Callback do botão 'Verificar Disco': roda o fsck no worker (ver show_check_report)."""
+        self.worker.submit(self.fs.check, on_done=self.show_check_report)
+
+
+    def show_check_report(self, report):
+        """Mostra o resultado de FileSystem.check()."""
+        if report['ok']:
+            messagebox.showinfo("Verificação", "Nenhuma inconsistência encontrada.")
+            return
+        lines = list(report['errors'][:10])
+        if report['leaks']:
+            lines.append(f"Blocos perdidos (ocupados sem arquivo): {report['leaks'][:20]}")
+        for block, names in list(report['cross_links'].items())[:10]:
+            lines.append(f"Bloco {block} referenciado por: {', '.join(names)}")
+        if report['cycles']:
+            lines.append(f"Ciclos na FAT: {', '.join(report['cycles'][:10])}")
+        messagebox.showwarning("Verificação", "\n".join(lines))
+
+
+    def update_file_list(self, changed=None):
+        """Atualiza a lista de arquivos: só os nomes em 'changed', ou tudo se 'changed' for None."""
+        if changed is None:
+            self.file_index.reset(self.fs.files)
+        else:
+            for file_name in changed:
+                if file_name in self.fs.files:
+                    self.file_index.add(file_name)
+                else:
+                    self.file_index.discard(file_name)
+        self.file_list.refresh()
+
+
+    def get_selected_file(self):
+        """Retorna o nome do arquivo selecionado na lista, ou None."""
+        return self.file_list.selected
+
+
+    def on_search_enter(self, event=None):
+        """Enter na busca: seleciona o primeiro arquivo que começa com o texto digitado."""
+        file_name = self.file_list.first_match()
+        if file_name is not None:
+            self.file_list.select(file_name)
+            self.on_file_select()
+
+
+    def on_file_select(self, event=None):
+        """Mostra informações do arquivo quando selecionado na lista."""
+        # ... (código existente) ...
+        file_name = self.get_selected_file()
+        if not file_name:
+            return
+        if not self.worker.lock.acquire(blocking=False): # O worker está mexendo no disco: tenta depois
+            self.root.after(WORKER_POLL_MS, self.on_file_select)
+            return
+        try:
+            self.show_file_info(file_name)
+        finally:
+            self.worker.lock.release()
+
+
+    def show_file_info(self, file_name):
+        """Preenche o painel de detalhes do arquivo e o destaca no disco (com o lock do worker)."""
+        info = self.fs.files.get(file_name)
+        if not info:
+            return
+           
+        text = f"Arquivo: {file_name}\n"
+        text += f"Tamanho: {info['size']} blocos\n"
+        text += f"Método: {info['method']}\n"
+       
+        if info['method'] == 'contiguous':
+            text += f"Blocos: {list(info['blocks'])}"
+       
+        elif info['method'] == 'linked':
+            text += f"Início: Bloco {info['start']}\n"
+            chain = map(str, self.fs.file_blocks(file_name))
+            text += f"Cadeia: {' -> '.join(chain)} (EOF)"
+           
+        elif info['method'] == 'indexed' and info.get('index_mode', 'direct') != 'direct':
+            index_blocks, data_blocks = self.fs._index_layout(info)
+            text += f"Índice: {INDEX_MODES[info['index_mode']]} ({info['pointers_per_block']} ponteiros/bloco)\n"
+            text += f"Blocos de Índice: {index_blocks}\n"
+            text += f"Blocos de Dados: {data_blocks}"
+
+        elif info['method'] == 'indexed':
+            text += f"Bloco de Índice: {info['index_block']}\n"
+            text += f"Blocos de Dados: {list(info['data_blocks'])}"
+
+        fragments, hops, seek = self.fs.file_metrics[file_name]
+        text += f"\nFragmentos: {fragments}"
+        if hops:
+            text += f" | Seek médio: {seek / hops:.1f} blocos"
+        self.io_model.reset() # Leitura a frio, só deste arquivo
+        cost = self.io_model.read_file(self.fs, file_name)
+        text += f"\nLeitura simulada: {cost['ms']:.1f} ms ({cost['mb_per_sec']:.2f} MB/s, {cost['seeks']} seeks)"
+        self.io_model.reset()
+        cost = self.io_model.read_block(self.fs, file_name, info['size'] - 1)
+        text += f"\nAcesso ao último bloco: {cost['ms']:.1f} ms ({cost['depth']} leituras antes dele)"
+
+
+        self.label_file_info.config(text=text)
+        self.draw_disk_blocks(highlight_file=file_name) # Redesenha com destaque
+
+
+    def draw_disk_blocks(self, highlight_file=None, dirty=None):
+        """
+        Atualiza a visão do disco no canvas. Só as células visíveis têm itens, criados uma
+        vez e depois só recoloridos quando o dono/ocupação ou o destaque mudam. Com zoom
+        afastado, cada célula agrega vários blocos e é colorida pela ocupação, lida do
+        resumo de ocupação do FileSystem. 'dirty' restringe a conferência a esses blocos
+        (None confere todas as células visíveis; () não confere nenhuma).
+        """
+        canvas_width = self.canvas.winfo_width()
+        canvas_height = self.canvas.winfo_height()
+       
+        if canvas_width < 50 or canvas_height < 50: # Evita desenhar se o canvas for muito pequeno
+            return
+
+        if self.blocks_per_cell is None:
+            self.blocks_per_cell = self.fit_blocks_per_cell(canvas_width, canvas_height)
+        if self.layout_disk_view(canvas_width, canvas_height):
+            dirty = None # Posições recriadas: confere todas
+
+        if highlight_file != self.highlighted_file:
+            self.highlighted_file = highlight_file
+            dirty = None
+
+        cols, rows, _, _ = self.view_layout
+        first_cell = self.view_row * cols
+        if dirty is None:
+            slots = range(len(self.slot_items))
+        else:
+            zoom = self.blocks_per_cell
+            slots = {block // zoom - first_cell for block in dirty}
+            slots = [slot for slot in slots if 0 <= slot < len(self.slot_items)]
+
+        for slot in slots:
+            style = self.cell_style(first_cell + slot, highlight_file)
+            if self.slot_styles[slot] != style:
+                fill, outline, width, label = style
+                rect, text = self.slot_items[slot]
+                if fill is None: # Célula além do fim do disco
+                    self.canvas.itemconfigure(rect, state=tk.HIDDEN)
+                else:
+                    self.canvas.itemconfigure(rect, state=tk.NORMAL, fill=fill, outline=outline, width=width)
+                if self.slot_styles[slot] is None or self.slot_styles[slot][3] != label:
+                    self.canvas.itemconfigure(text, text=label or "")
+                self.slot_styles[slot] = style
+
+        self.update_disk_status()
+
+        # Setas de destaque (só com um bloco por célula): poucas, então são sempre redesenhadas
+        self.canvas.delete("arrow")
+        highlight_info = self.fs.files.get(highlight_file)
+        if highlight_info and self.blocks_per_cell == 1:
+            method = highlight_info['method']
+           
+            # Seta para método ENCADEADO
+            if method == 'linked':
+                for i in highlight_info['blocks']:
+                    next_block = self.fs.fat[i]
+                    if next_block != 0 and next_block != -1:
+                        self.draw_arrow(i, next_block)
+
+
+            # Setas para método INDEXADO: de cada bloco de índice para os blocos que ele aponta
+            # (no modo de extensões, só para o começo de cada extensão)
+            elif method == 'indexed':
+                extents = highlight_info.get('index_mode') == 'extent'
+                previous = None
+                for block, parent, is_index in self.fs._walk_index(highlight_info):
+                    if parent is not None and (is_index or not extents or block != previous + 1):
+                        self.draw_arrow(parent, block, color="#8E44AD")
+                    previous = block
+
+
+    def block_style(self, i, highlight_file):
+        """Retorna (preenchimento, cor do contorno, largura do contorno) do bloco 'i'."""
+        file_name = self.fs.blocks[i]
+        if not file_name:
+            return COLOR_FREE, "#666", 1
+        is_index_block = i in self.fs.index_table
+        color = COLOR_INDEX_BLOCK if is_index_block else self.file_colors.get(file_name, "#FF0000")
+        if file_name == highlight_file:
+            return color, "#0000FF", 3 # Azul para destaque
+        return color, "#666", 1
+
+
+    def cell_style(self, cell, highlight_file):
+        """Retorna (preenchimento, contorno, largura, rótulo) da célula; preenchimento None = fora do disco."""
+        zoom = self.blocks_per_cell
+        start = cell * zoom
+        if start >= self.fs.num_blocks:
+            return None, None, None, None
+        if zoom == 1:
+            return self.block_style(start, highlight_file) + (str(start),)
+        end = min(start + zoom, self.fs.num_blocks)
+        used = self.fs.used_blocks_in_range(start, end)
+        return _mix_color(COLOR_FREE, COLOR_USED, used / (end - start)), "#666", 1, ""
+
+
+    def num_cells(self):
+        """Número de células do disco no nível de detalhe atual."""
+        return -(-self.fs.num_blocks // self.blocks_per_cell)
+
+
+    def fit_blocks_per_cell(self, canvas_width, canvas_height):
+        """Menor nível de detalhe (potência de 2 blocos por célula) que mostra o disco inteiro."""
+        if self.fs.num_blocks <= GRID_COLS * GRID_ROWS:
+            return 1
+        pitch = MIN_CELL_SIZE + 1
+        capacity = max(1, ((canvas_width - 1) // pitch) * ((canvas_height - 1) // pitch))
+        zoom = 1
+        while -(-self.fs.num_blocks // zoom) > capacity:
+            zoom *= 2
+        return zoom
+
+
+    def compute_disk_layout(self, canvas_width, canvas_height):
+        """Retorna (colunas, linhas visíveis, tamanho da célula, espaçamento) para o nível de detalhe atual."""
+        num_cells = self.num_cells()
+        if num_cells <= GRID_COLS * GRID_ROWS: # Cabe na grade fixa original
+            cols = GRID_COLS
+            rows = -(-num_cells // cols)
+            pad = BLOCK_PADDING
+            cell_w = (canvas_width - (cols * pad)) / cols
+            cell_h = (canvas_height - (rows * pad)) / rows
+            return cols, rows, max(5, min(cell_w, cell_h)), pad # Garante um tamanho mínimo
+        pad = 1
+        cols = max(GRID_COLS, int((canvas_width - pad) // (MIN_CELL_SIZE + pad)))
+        rows = max(1, min(-(-num_cells // cols), int((canvas_height - pad) // (MIN_CELL_SIZE + pad))))
+        return cols, rows, MIN_CELL_SIZE, pad
+
+
+    def layout_disk_view(self, canvas_width, canvas_height):
+        """
+        Ajusta a grade de células ao canvas. Se só o tamanho das células muda, reescala os
+        itens existentes; se muda o número de posições visíveis, reposiciona/cria/apaga os itens.
+        Retorna True quando as posições foram refeitas (e precisam ser recoloridas).
+        """
+        cols, rows, cell_size, pad = self.compute_disk_layout(canvas_width, canvas_height)
+        self.view_row = max(0, min(self.view_row, -(-self.num_cells() // cols) - rows))
+
+        if self.view_layout and self.view_layout[:2] == (cols, rows):
+            old_size, old_pad = self.view_layout[2:]
+            if abs(cell_size - old_size) < 1e-3:
+                return False
+            # Mesmas posições: só reescala (o espaçamento acompanha a escala)
+            grid_w = cols * (old_size + old_pad) + old_pad
+            grid_h = rows * (old_size + old_pad) + old_pad
+            factor = max(5 / old_size, min(canvas_width / grid_w, canvas_height / grid_h))
+            self.canvas.scale("cell", 0, 0, factor, factor)
+            self.view_layout = (cols, rows, old_size * factor, old_pad * factor)
+            self.update_cell_labels()
+            return False
+
+        # Posições mudaram: reaproveita os itens existentes e cria/apaga só a diferença
+        self.view_layout = (cols, rows, cell_size, pad)
+        num_slots = cols * rows
+        while len(self.slot_items) > num_slots:
+            self.canvas.delete(*self.slot_items.pop())
+        for slot in range(num_slots):
+            x0 = (slot % cols) * (cell_size + pad) + pad
+            y0 = (slot // cols) * (cell_size + pad) + pad
+            if slot < len(self.slot_items):
+                rect, text = self.slot_items[slot]
+                self.canvas.coords(rect, x0, y0, x0 + cell_size, y0 + cell_size)
+                self.canvas.coords(text, x0 + cell_size/2, y0 + cell_size/2)
+            else:
+                rect = self.canvas.create_rectangle(x0, y0, x0 + cell_size, y0 + cell_size, fill=COLOR_FREE, outline="#666", tags="cell")
+                text = self.canvas.create_text(x0 + cell_size/2, y0 + cell_size/2, text="", fill="#333", tags=("cell", "cell_label"))
+                self.slot_items.append((rect, text))
+        self.slot_styles = [None] * num_slots
+        self.update_cell_labels()
+        return True
+
+
+    def update_cell_labels(self):
+        """Ajusta a fonte dos rótulos ao tamanho das células; esconde-os quando não caberiam."""
+        cell_size = self.view_layout[2]
+        if cell_size < MIN_CELL_SIZE or self.blocks_per_cell > 1:
+            self.canvas.itemconfigure("cell_label", state=tk.HIDDEN)
+        else:
+            self.canvas.itemconfigure("cell_label", state=tk.NORMAL, font=("Arial", max(5, int(cell_size / 3.5))))
+
+
+    def zoom_disk_view(self, factor):
+        """Aproxima (factor < 1) ou afasta (factor > 1) a visão, mantendo o primeiro bloco visível."""
+        if self.view_layout is None:
+            return
+        first_block = self.view_row * self.view_layout[0] * self.blocks_per_cell
+        max_zoom = 1 << max(0, (self.fs.num_blocks - 1).bit_length())
+        self.blocks_per_cell = max(1, min(int(self.blocks_per_cell * factor), max_zoom))
+        cols = self.compute_disk_layout(self.canvas.winfo_width(), self.canvas.winfo_height())[0]
+        self.view_row = first_block // self.blocks_per_cell // cols
+        self.refresh_disk_view()
+
+
+    def fit_disk_view(self):
+        """Volta ao nível de detalhe que mostra o disco inteiro."""
+        self.blocks_per_cell = self.fit_blocks_per_cell(self.canvas.winfo_width(), self.canvas.winfo_height())
+        self.view_row = 0
+        self.refresh_disk_view()
+
+
+    def refresh_disk_view(self):
+        """Redesenha a visão após mudar o nível de detalhe (as células passam a ser outras)."""
+        self.view_layout = None
+        self.schedule_redraw(self.highlighted_file, full=True)
+
+
+    def scroll_disk_view(self, rows):
+        """Desloca a visão do disco em 'rows' linhas de células."""
+        if self.view_layout is None:
+            return
+        self.view_row = max(0, self.view_row + rows)
+        self.schedule_redraw(self.highlighted_file, full=True)
+
+
+    def on_disk_scroll(self, *args):
+        """Callback da barra de rolagem do disco."""
+        if self.view_layout is None:
+            return
+        cols, rows, _, _ = self.view_layout
+        if args[0] == 'moveto':
+            self.view_row = int(float(args[1]) * -(-self.num_cells() // cols))
+            self.schedule_redraw(self.highlighted_file, full=True)
+        elif args[0] == 'scroll':
+            step = rows if args[2] == 'pages' else 1
+            self.scroll_disk_view(int(args[1]) * step)
+
+
+    def on_disk_wheel(self, event):
+        """Roda do mouse: rola o disco; com Ctrl pressionado, muda o zoom."""
+        up = event.num == 4 or getattr(event, 'delta', 0) > 0
+        if event.state & 0x4: # Ctrl
+            self.zoom_disk_view(0.5 if up else 2)
+        else:
+            self.scroll_disk_view(-3 if up else 3)
+
+
+    def update_disk_status(self):
+        """Atualiza a barra de rolagem e o texto com o nível de detalhe e o trecho visível."""
+        cols, rows, _, _ = self.view_layout
+        total_rows = -(-self.num_cells() // cols)
+        self.disk_scrollbar.set(self.view_row / total_rows, min(1.0, (self.view_row + rows) / total_rows))
+        first = self.view_row * cols * self.blocks_per_cell
+        last = min(self.fs.num_blocks, (self.view_row + rows) * cols * self.blocks_per_cell) - 1
+        self.label_zoom.config(text=f"1 célula = {self.blocks_per_cell} bloco(s) | blocos {first}-{last} de {self.fs.num_blocks}")
+
+
+    def block_center(self, block):
+        """Centro (x, y), em pixels, do bloco na visão atual, ou None se não estiver visível."""
+        cols, rows, cell_size, pad = self.view_layout
+        slot = block - self.view_row * cols
+        if not 0 <= slot < cols * rows:
+            return None
+        x = (slot % cols) * (cell_size + pad) + pad + cell_size / 2
+        y = (slot // cols) * (cell_size + pad) + pad + cell_size / 2
+        return x, y
+
+
+    def draw_arrow(self, block_from, block_to, color="#0000FF"):
+        """Desenha uma seta do centro do bloco_from para o centro do bloco_to (se ambos estiverem visíveis)."""
+        start = self.block_center(block_from)
+        end = self.block_center(block_to)
+        if start and end:
+            self.canvas.create_line(*start, *end, arrow=tk.LAST, fill=color, width=2, tags="arrow")
+
+
+def _mix_color(color_a, color_b, t):
+    """Interpola duas cores '#rrggbb' (t=0 -> color_a, t=1 -> color_b)."""
+    a = [int(color_a[i:i + 2], 16) for i in (1, 3, 5)]
+    b = [int(color_b[i:i + 2], 16) for i in (1, 3, 5)]
+    return '#' + ''.join(f'{round(x + (y - x) * t):02x}' for x, y in zip(a, b))
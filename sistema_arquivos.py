@@ -0,0 +1,3391 @@
+"""Núcleo headless do simulador: FileSystem e seus motores, imagens de disco, modelo de E/S e instrumentação."""
+import time
+import json
+import fnmatch
+import functools
+import heapq
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple, OrderedDict
+
+# Nomes públicos do núcleo (o que 'from sistema_arquivos import *' traz para o projetinho)
+__all__ = [
+    'SUMMARY_SHIFT', 'CHAIN_INDEX_STRIDE', 'FREE_GROUP_SHIFT', 'PLACEMENT_POLICIES', 'ALLOCATION_METHODS', 'INDEX_MODES',
+    'POINTERS_PER_BLOCK', 'ENGINES', 'IMAGE_MAGIC', 'IMAGE_HEADER', 'IMAGE_ALIGN', 'OutOfSpace',
+    'FreeExtentIndex', 'BuddyAllocator', 'BlockMap', 'NumpyBlockMap', 'ChangeEvent', 'Snapshot', 'ChainIndex',
+    'FileSystem', 'Defragmenter', 'NumpyFileSystem', 'MappedFileSystem', 'save_image', 'load_image',
+    'create_file_system', 'AllocationGroup', 'GroupedFileSystem', 'IOCostModel', 'PROFILED_FS_METHODS',
+    'LatencyHistogram', 'Profiler', 'format_profile',
+]
+
+np = None # NumPy é opcional e só é importado quando o motor 'numpy' é usado (ver _load_numpy)
+
+
+SUMMARY_SHIFT = 6    # O resumo de ocupação conta blocos usados em baldes de 2^6 = 64 blocos
+CHAIN_INDEX_STRIDE = 16 # Um marco a cada 16 elos no índice de cadeias da FAT (ver ChainIndex)
+FREE_GROUP_SHIFT = 6  # A árvore do first-fit resume o espaço livre em grupos de 2^6 = 64 blocos (ver FreeExtentIndex)
+
+
+# Políticas de posicionamento: {nome -> rótulo exibido na interface}
+PLACEMENT_POLICIES = {
+    'first_fit': "First-fit",
+    'next_fit': "Next-fit",
+    'best_fit': "Best-fit",
+    'worst_fit': "Worst-fit",
+    'buddy': "Buddy",
+}
+
+
+# Métodos de alocação aceitos por FileSystem.allocate()
+ALLOCATION_METHODS = ('contiguous', 'linked', 'indexed')
+
+
+# Formatos do índice na alocação indexada (ver FileSystem.set_index_mode): {nome -> rótulo}
+INDEX_MODES = {
+    'direct': "Direto",          # Um bloco de índice com a lista de todos os blocos de dados
+    'multilevel': "Multinível",  # Ponteiros diretos + indiretos simples, duplo e triplo (Unix)
+    'extent': "Extensões",       # Árvore de extensões (início, tamanho)
+}
+POINTERS_PER_BLOCK = 16 # Entradas que cabem num bloco de índice (modos 'multilevel' e 'extent')
+
+
+# Motores de simulação aceitos por create_file_system()
+ENGINES = ('python', 'compact', 'numpy')
+
+
+# Imagem de disco (ver save_image): cabeçalho com assinatura, número de blocos, blocos livres,
+# número de extensões livres, tamanho da seção de listas (em uint32) e tamanho dos metadados;
+# depois as seções, alinhadas a páginas
+IMAGE_MAGIC = b"SIMDISK2"
+IMAGE_HEADER = struct.Struct('<8sQQQQQ')
+IMAGE_ALIGN = 4096
+
+
+def _load_numpy():
+    """Importa o NumPy na primeira vez que ele é preciso; retorna False se não estiver instalado."""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+
+class OutOfSpace(str):
+    """
+    Mensagem de falha por falta de espaço livre. As operações continuam retornando
+    (False, mensagem); quem precisa distinguir esse caso (ex.: GroupedFileSystem, que
+    tenta outro grupo) testa isinstance(mensagem, OutOfSpace) em vez de comparar o texto.
+    """
+    __slots__ = ()
+
+
+class FreeExtentIndex:
+    """
+    Índice das extensões livres do disco, mantido a cada alocação/liberação.
+    Cada extensão é um par (início, tamanho) de blocos livres consecutivos.
+    """
+    def __init__(self, num_blocks, extents=None):
+        # 'extents': pares (início, tamanho) já ordenados e disjuntos; None = disco todo livre
+        if extents is None:
+            extents = [(0, num_blocks)] if num_blocks > 0 else []
+        self.starts = [start for start, _ in extents]          # Inícios das extensões, ordenados
+        self.lengths = dict(extents)                            # Mapeia: {inicio -> tamanho}
+        self.by_size = sorted((length, start) for start, length in extents) # Pares (tamanho, inicio), ordenados (best-fit / worst-fit)
+        # Quantas extensões há por classe de tamanho (potências de 2): classes[c] conta as de tamanho em [2^c, 2^(c+1))
+        self.classes = [0] * max(1, num_blocks.bit_length())
+        for start, length in extents:
+            self.classes[length.bit_length() - 1] += 1
+        # Árvore de segmentos de máximos sobre o endereço (first-fit / next-fit): o disco é dividido em
+        # grupos de 2^FREE_GROUP_SHIFT blocos, cada folha guarda o tamanho da maior extensão que começa
+        # no seu grupo e cada nó interno o máximo dos filhos; tree[1] é a raiz, as folhas vêm de 'leaves'.
+        # Só é montada na primeira busca first-fit; depois, add/remove só marcam os grupos alterados
+        # (dirty) e a próxima busca os atualiza de uma vez (ver _sync_tree)
+        groups = max(1, (num_blocks + (1 << FREE_GROUP_SHIFT) - 1) >> FREE_GROUP_SHIFT)
+        self.leaves = 1 << (groups - 1).bit_length()
+        self.tree = None
+        self.dirty = set()
+
+
+    def __len__(self):
+        return len(self.starts)
+
+
+    def _insert(self, start, length):
+        insort(self.starts, start)
+        self.lengths[start] = length
+        insort(self.by_size, (length, start))
+        self.classes[length.bit_length() - 1] += 1
+
+
+    def _discard(self, start):
+        del self.starts[bisect_left(self.starts, start)]
+        length = self.lengths.pop(start)
+        del self.by_size[bisect_left(self.by_size, (length, start))]
+        self.classes[length.bit_length() - 1] -= 1
+        return length
+
+
+    def _group_max(self, group):
+        """Tamanho da maior extensão que começa no grupo 'group' (0 se nenhuma)."""
+        starts, lengths = self.starts, self.lengths
+        first = group << FREE_GROUP_SHIFT
+        largest = 0
+        for k in range(bisect_left(starts, first), bisect_left(starts, first + (1 << FREE_GROUP_SHIFT))):
+            length = lengths[starts[k]]
+            if length > largest:
+                largest = length
+        return largest
+
+
+    def _sync_tree(self):
+        """Monta a árvore (na primeira vez) ou atualiza as folhas dos grupos marcados e os nós acima delas."""
+        leaves = self.leaves
+        if self.tree is None:
+            tree = self.tree = [0] * (2 * leaves)
+            for start in self.starts:
+                leaf = leaves + (start >> FREE_GROUP_SHIFT)
+                if self.lengths[start] > tree[leaf]:
+                    tree[leaf] = self.lengths[start]
+            for i in range(leaves - 1, 0, -1):
+                left, right = tree[2 * i], tree[2 * i + 1]
+                tree[i] = left if left > right else right
+            self.dirty.clear()
+            return
+        tree = self.tree
+        for group in self.dirty:
+            i = leaves + group
+            largest = self._group_max(group)
+            if tree[i] == largest:
+                continue
+            tree[i] = largest
+            i >>= 1
+            while i: # Sobe enquanto o máximo do nó mudar
+                left, right = tree[2 * i], tree[2 * i + 1]
+                largest = left if left > right else right
+                if tree[i] == largest:
+                    break
+                tree[i] = largest
+                i >>= 1
+        self.dirty.clear()
+
+
+    def add(self, start, length):
+        """Devolve ao índice os blocos [start, start+length), fundindo com as vizinhas."""
+        end = start + length
+        if end in self.lengths: # Funde com a extensão seguinte
+            end += self._discard(end)
+            if self.tree is not None:
+                self.dirty.add(start + length >> FREE_GROUP_SHIFT)
+        i = bisect_left(self.starts, start)
+        if i > 0:
+            prev = self.starts[i - 1]
+            if prev + self.lengths[prev] == start: # Funde com a extensão anterior
+                self._discard(prev)
+                start = prev
+        self._insert(start, end - start)
+        if self.tree is not None:
+            self.dirty.add(start >> FREE_GROUP_SHIFT)
+
+
+    def remove(self, start, length):
+        """Retira do índice os blocos [start, start+length), que devem estar livres."""
+        ext_start = self.starts[bisect_right(self.starts, start) - 1]
+        ext_end = ext_start + self._discard(ext_start)
+        if start > ext_start:
+            self._insert(ext_start, start - ext_start)
+        if start + length < ext_end:
+            self._insert(start + length, ext_end - start - length)
+            if self.tree is not None:
+                self.dirty.add(start + length >> FREE_GROUP_SHIFT)
+        if self.tree is not None:
+            self.dirty.add(ext_start >> FREE_GROUP_SHIFT)
+
+
+    def find_first(self, size, cursor=0):
+        """Início da primeira extensão (a partir de 'cursor') com pelo menos 'size' blocos, ou None."""
+        if self.tree is None or self.dirty:
+            self._sync_tree()
+        tree, leaves = self.tree, self.leaves
+        if tree[1] < size:
+            return None
+        group = cursor >> FREE_GROUP_SHIFT
+        if group >= leaves:
+            return None
+        # O grupo do cursor também tem extensões antes dele: é conferido à parte
+        if tree[leaves + group] >= size:
+            starts = self.starts
+            end = (group + 1) << FREE_GROUP_SHIFT
+            for k in range(bisect_left(starts, cursor), len(starts)):
+                start = starts[k]
+                if start >= end:
+                    break
+                if self.lengths[start] >= size:
+                    return start
+        # Próximo grupo com folha >= size: sobe enquanto for filho direito, passa para o irmão
+        # à direita ao achar um nó pequeno demais e desce pelo filho mais à esquerda que serve
+        i = leaves + group + 1
+        if i == 2 * leaves:
+            return None
+        while tree[i] < size:
+            while i & 1:
+                i >>= 1
+            if i == 0:
+                return None
+            i += 1
+        while i < leaves:
+            i = 2 * i if tree[2 * i] >= size else 2 * i + 1
+        # No grupo achado, a primeira extensão com 'size' blocos (no máximo metade do grupo são inícios)
+        starts = self.starts
+        for k in range(bisect_left(starts, (i - leaves) << FREE_GROUP_SHIFT), len(starts)):
+            start = starts[k]
+            if self.lengths[start] >= size:
+                return start
+
+
+    def find_best(self, size):
+        """Início da menor extensão com pelo menos 'size' blocos, ou None."""
+        i = bisect_left(self.by_size, (size, -1))
+        return self.by_size[i][1] if i < len(self.by_size) else None
+
+
+    def find_worst(self, size):
+        """Início da maior extensão, se tiver pelo menos 'size' blocos, ou None."""
+        if self.by_size and self.by_size[-1][0] >= size:
+            return self.by_size[-1][1]
+        return None
+
+
+    def extents_from(self, cursor=0):
+        """Percorre as extensões (inicio, tamanho) em ordem de endereço a partir de 'cursor', dando a volta."""
+        i = bisect_right(self.starts, cursor) - 1
+        split = None
+        if i >= 0 and cursor < self.starts[i] + self.lengths[self.starts[i]]:
+            split = self.starts[i] # Extensão que contém o cursor: começa no meio dela
+            yield cursor, split + self.lengths[split] - cursor
+        for j in range(i + 1, len(self.starts)):
+            yield self.starts[j], self.lengths[self.starts[j]]
+        for j in range(0, i + 1):
+            start = self.starts[j]
+            if start == split:
+                if cursor > start:
+                    yield start, cursor - start
+            else:
+                yield start, self.lengths[start]
+
+
+    def first_free_from(self, block):
+        """Primeiro bloco livre a partir de 'block' (dando a volta no disco), ou -1."""
+        if not self.starts:
+            return -1
+        i = bisect_right(self.starts, block) - 1
+        if i >= 0 and block < self.starts[i] + self.lengths[self.starts[i]]:
+            return block
+        if i + 1 < len(self.starts):
+            return self.starts[i + 1]
+        return self.starts[0] # Tenta do início
+
+
+class BuddyAllocator:
+    """
+    Alocador buddy sobre os blocos livres: listas de blocos livres de tamanho 2^k,
+    alinhados ao próprio tamanho, que se fundem com o "buddy" ao serem liberados.
+    """
+    def __init__(self, num_blocks, free_extents):
+        # self.free[k] guarda, ordenados, os inícios dos blocos livres de ordem k (2^k blocos)
+        self.free = [[] for _ in range(max(1, num_blocks.bit_length()))]
+        for start, length in free_extents.extents_from(0):
+            self.add(start, length)
+
+
+    def _free_chunk(self, start, order):
+        while order + 1 < len(self.free):
+            buddy = start ^ (1 << order)
+            bucket = self.free[order]
+            i = bisect_left(bucket, buddy)
+            if i == len(bucket) or bucket[i] != buddy:
+                break
+            del bucket[i] # Funde com o buddy livre
+            start = min(start, buddy)
+            order += 1
+        insort(self.free[order], start)
+
+
+    def add(self, start, length):
+        """Libera os blocos [start, start+length), decompondo-os em potências de 2 alinhadas."""
+        end = start + length
+        while start < end:
+            order = (end - start).bit_length() - 1
+            if start:
+                order = min(order, (start & -start).bit_length() - 1) # Respeita o alinhamento
+            self._free_chunk(start, order)
+            start += 1 << order
+
+
+    def remove(self, start, length):
+        """Reserva os blocos [start, start+length), dividindo os blocos livres que os contêm."""
+        end = start + length
+        while start < end:
+            for order, bucket in enumerate(self.free):
+                base = start & ~((1 << order) - 1)
+                i = bisect_left(bucket, base)
+                if i < len(bucket) and bucket[i] == base:
+                    break
+            else:
+                raise ValueError(f"Bloco {start} não está livre no alocador buddy.")
+            del bucket[i]
+            chunk_end = base + (1 << order)
+            if base < start:
+                self.add(base, start - base) # Sobra antes do trecho reservado
+            if end < chunk_end:
+                self.add(end, chunk_end - end) # Sobra depois do trecho reservado
+            start = chunk_end
+
+
+    def find(self, size):
+        """Início do menor bloco livre de ordem suficiente para 'size' blocos, ou None."""
+        for bucket in self.free[(size - 1).bit_length():]:
+            if bucket:
+                return bucket[0]
+        return None
+
+
+    def chunks(self):
+        """Percorre os blocos livres (inicio, tamanho), dos menores para os maiores."""
+        for order, bucket in enumerate(self.free):
+            for start in bucket:
+                yield start, 1 << order
+
+
+class BlockMap:
+    """
+    Mapa de blocos compacto, usado no lugar da lista self.blocks: um bit de ocupação
+    por bloco mais um id de dono de 4 bytes (0 = livre). Lê e grava nomes de arquivo
+    como a lista, mas sem guardar uma referência de objeto por bloco.
+    """
+    def __init__(self, num_blocks, bitmap=None, owner_ids=None):
+        # bitmap/owner_ids podem vir prontos (ex.: memoryviews de uma imagem, ver MappedFileSystem)
+        self.num_blocks = num_blocks
+        self.bitmap = bytearray((num_blocks + 7) // 8) if bitmap is None else bitmap
+        self.owner_ids = array('I', [0]) * num_blocks if owner_ids is None else owner_ids
+        self.names = [None]   # id -> nome do arquivo (id 0 = livre)
+        self.ids = {}         # nome do arquivo -> id
+        self.refs = [0]       # id -> quantos blocos usam esse id
+        self.spare_ids = []   # ids de arquivos que não ocupam mais nenhum bloco
+
+
+    def load_names(self, names, refs):
+        """Restaura a tabela de ids (names[id] = nome, refs[id] = blocos) gravada numa imagem."""
+        self.names = names
+        self.refs = refs
+        self.ids = {name: owner for owner, name in enumerate(names) if name is not None}
+        self.spare_ids = [owner for owner, name in enumerate(names) if owner and name is None]
+
+
+    def __len__(self):
+        return self.num_blocks
+
+
+    def __iter__(self):
+        names = self.names
+        for owner in self.owner_ids:
+            yield names[owner]
+
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.names[owner] for owner in self.owner_ids[i]]
+        return self.names[self.owner_ids[i]]
+
+
+    def __setitem__(self, i, file_name):
+        if isinstance(i, slice):
+            for block, name in zip(range(*i.indices(self.num_blocks)), file_name):
+                self[block] = name
+            return
+        if i < 0:
+            i += self.num_blocks
+        old = self.owner_ids[i]
+        if old:
+            self._unref(old)
+        if file_name is None:
+            self.owner_ids[i] = 0
+            self.bitmap[i >> 3] &= ~(1 << (i & 7))
+        else:
+            self.owner_ids[i] = self._ref(file_name)
+            self.bitmap[i >> 3] |= 1 << (i & 7)
+
+
+    def _ref(self, file_name, n=1):
+        owner = self.ids.get(file_name)
+        if owner is None:
+            if self.spare_ids:
+                owner = self.spare_ids.pop()
+                self.names[owner] = file_name
+            else:
+                owner = len(self.names)
+                self.names.append(file_name)
+                self.refs.append(0)
+            self.ids[file_name] = owner
+        self.refs[owner] += n
+        return owner
+
+
+    def _unref(self, owner, n=1):
+        self.refs[owner] -= n
+        if self.refs[owner] == 0: # Nenhum bloco usa mais esse id: recicla
+            del self.ids[self.names[owner]]
+            self.names[owner] = None
+            self.spare_ids.append(owner)
+
+
+    def is_free(self, i):
+        """Consulta o bitmap: o bloco 'i' está livre?"""
+        return not (self.bitmap[i >> 3] >> (i & 7)) & 1
+
+
+    def count(self, file_name):
+        """Como list.count: número de blocos de 'file_name' (None = livres)."""
+        if file_name is None:
+            return self.num_blocks - int.from_bytes(self.bitmap, 'little').bit_count()
+        owner = self.ids.get(file_name)
+        return self.refs[owner] if owner is not None else 0
+
+
+class NumpyBlockMap(BlockMap):
+    """Mapa de blocos do motor NumPy: ids de dono num array int32 (0 = livre)."""
+    def __init__(self, num_blocks):
+        self.num_blocks = num_blocks
+        self.owner_ids = np.zeros(num_blocks, dtype=np.int32)
+        self.names = [None]
+        self.ids = {}
+        self.refs = [0]
+        self.spare_ids = []
+
+
+    def __iter__(self):
+        names = self.names
+        for owner in self.owner_ids.tolist():
+            yield names[owner]
+
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.names[owner] for owner in self.owner_ids[i].tolist()]
+        return self.names[self.owner_ids[i]]
+
+
+    def __setitem__(self, i, file_name):
+        if isinstance(i, slice):
+            blocks = np.arange(self.num_blocks)[i]
+            for name in set(file_name):
+                self.assign(blocks[[n == name for n in file_name]], name)
+        else:
+            self.assign([i], file_name)
+
+
+    def assign(self, blocks, file_name):
+        """Grava 'file_name' (ou None) em todos os blocos de uma vez; retorna os que estavam ocupados."""
+        idx = np.unique(np.asarray(blocks, dtype=np.int64))
+        old = self.owner_ids[idx]
+        used = old != 0
+        if used.any():
+            owners, counts = np.unique(old[used], return_counts=True)
+            for owner, n in zip(owners.tolist(), counts.tolist()):
+                self._unref(owner, n)
+        self.owner_ids[idx] = 0 if file_name is None else self._ref(file_name, idx.size)
+        return idx[used]
+
+
+    def is_free(self, i):
+        return self.owner_ids[i] == 0
+
+
+    def count(self, file_name):
+        if file_name is None:
+            return self.num_blocks - int(np.count_nonzero(self.owner_ids))
+        return super().count(file_name)
+
+
+# Evento emitido pelo FileSystem ao fim de cada operação que muda o disco (ver FileSystem.subscribe).
+# claimed/freed: blocos ocupados/liberados; fat: blocos cuja entrada da FAT mudou; os demais
+# campos são conjuntos de blocos de índice ou de nomes de arquivo. Dentro de um lote (op='batch')
+# a mesma chave pode aparecer mais de uma vez: o estado atual do FileSystem é o que vale.
+ChangeEvent = namedtuple('ChangeEvent', 'op file_name claimed freed fat inodes_added inodes_removed '
+                                        'files_added files_removed files_changed')
+
+
+def _emits_event(op):
+    """Faz uma operação pública do FileSystem emitir um ChangeEvent com o que ela mudou."""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not self._subscribers or self._pending is not None: # Sem ouvintes, ou dentro de outra operação
+                return method(self, *args, **kwargs)
+            pending = self._pending = {
+                'claimed': [], 'freed': [], 'fat': set(), 'inodes_added': set(), 'inodes_removed': set(),
+                'files_added': set(), 'files_removed': set(), 'files_changed': set(),
+            }
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._pending = None
+                if any(pending.values()):
+                    file_name = args[0] if args and isinstance(args[0], str) else None
+                    event = ChangeEvent(op, file_name, **pending)
+                    for callback in list(self._subscribers.values()):
+                        callback(event)
+        return wrapper
+    return decorate
+
+
+class Snapshot:
+    """
+    Estado salvo do FileSystem (ver FileSystem.snapshot). Os snapshots de um FileSystem
+    formam uma árvore cujas arestas apontam para o estado atual: o estado de um snapshot
+    é o do seu 'parent' (None = estado atual do disco) desfeito pelo diário 'journal'.
+    """
+    def __init__(self, cursor):
+        self.parent = None
+        self.children = []    # Snapshots cujo 'parent' é este
+        self.journal = []
+        self.cursor = cursor  # next_fit_cursor no momento do snapshot
+        self.dropped = False  # Descartado (ver FileSystem.drop_snapshot); só fica na árvore se outros passam por ele
+
+
+class ChainIndex:
+    """
+    Índice esparso de uma cadeia da FAT: o bloco de cada posição múltipla de 'stride' e o
+    último bloco. Achar o k-ésimo bloco custa um acesso à lista mais no máximo stride - 1
+    saltos na FAT, em vez de k. Vale enquanto a cadeia não mudar (ver FileSystem.block_at).
+    """
+    def __init__(self, fat, start, stride=CHAIN_INDEX_STRIDE):
+        self.fat = fat
+        self.stride = stride
+        self.marks = []
+        self.length = 0
+        self.tail = -1
+        block = start
+        while block != -1:
+            if self.length % stride == 0:
+                self.marks.append(block)
+            self.length += 1
+            self.tail = block
+            block = int(fat[block])
+
+
+    def lookup(self, k):
+        """Bloco na posição k da cadeia."""
+        mark, hops = divmod(k, self.stride)
+        block = self.marks[mark]
+        fat = self.fat
+        for _ in range(hops):
+            block = fat[block]
+        return int(block)
+
+
+    def append(self, blocks):
+        """Acompanha blocos acrescentados ao fim da cadeia."""
+        stride = self.stride
+        first = -self.length % stride # Posição em 'blocks' do próximo marco
+        self.marks.extend(blocks[first::stride])
+        self.length += len(blocks)
+        self.tail = blocks[-1]
+
+
+    def truncate(self, length, tail):
+        """Acompanha o corte da cadeia em 'length' blocos, terminando em 'tail'."""
+        del self.marks[-(-length // self.stride):]
+        self.length = length
+        self.tail = tail
+
+
+def _journal_keys(journal, keys):
+    """Acumula em 'keys' os blocos, entradas da FAT, inodes e arquivos tocados pelo diário."""
+    for entry in journal:
+        kind = entry[0]
+        if kind == 'claim':
+            keys['blocks'].update(entry[1])
+        elif kind == 'release':
+            keys['blocks'].update(block for block, _ in entry[1])
+        else: # 'fat', 'inode' ou 'file'
+            keys[kind].add(entry[1])
+
+
+def _file_metrics(order):
+    """(fragmentos, saltos, distância de seek) de um arquivo, dados os blocos na ordem de leitura."""
+    fragments, seek = 1, 0
+    for prev, block in zip(order, order[1:]):
+        if block != prev + 1: # Começa um novo trecho contíguo
+            fragments += 1
+        seek += abs(block - prev)
+    return fragments, len(order) - 1, int(seek)
+
+
+def _runs_metrics(runs):
+    """Como _file_metrics, mas com a ordem de leitura dada em sequências (início, tamanho)."""
+    fragments = seek = blocks = 0
+    end = None # Logo depois do último bloco lido
+    for start, length in runs:
+        if start != end:
+            fragments += 1
+        if end is not None:
+            seek += abs(start - (end - 1))
+        seek += length - 1
+        blocks += length
+        end = start + length
+    return fragments, blocks - 1, seek
+
+
+def _append_metrics(metrics, last, added):
+    """Métricas de um arquivo depois de acrescentar 'added' (na ordem de leitura) após o bloco 'last'."""
+    fragments, hops, seek = _file_metrics(added)
+    jump = added[0] - last
+    return metrics[0] + fragments - (jump == 1), metrics[1] + hops + 1, int(metrics[2] + seek + abs(jump))
+
+
+def _take_blocks(extents, count):
+    """Retira 'count' blocos das extensões (inicio, tamanho), na ordem em que aparecem."""
+    picked = []
+    for start, length in extents:
+        take = min(length, count - len(picked))
+        picked.extend(range(start, start + take))
+        if len(picked) == count:
+            break
+    return picked
+
+
+def _runs(block_list):
+    """Agrupa uma lista de blocos em sequências consecutivas (inicio, tamanho)."""
+    runs = []
+    start = end = None # Sequência atual: [start, end)
+    for block in block_list:
+        if block != end:
+            if start is not None:
+                runs.append([start, end - start])
+            start = block
+        end = block + 1
+    if start is not None:
+        runs.append([start, end - start])
+    return runs
+
+
+def _as_range(blocks):
+    """Os blocos de um arquivo contíguo como range, se forem consecutivos; senão a própria lista."""
+    if len(blocks) and all(block == blocks[0] + i for i, block in enumerate(blocks)):
+        return range(blocks[0], blocks[0] + len(blocks))
+    return blocks
+
+
+def _multilevel_capacity(pointers):
+    """Maior arquivo (em blocos de dados) que um inode multinível com 'pointers' por bloco endereça."""
+    return (pointers - 3) + pointers + pointers ** 2 + pointers ** 3
+
+
+def _multilevel_meta_count(size, pointers):
+    """Blocos de índice de um inode multinível com 'size' blocos de dados (None se não couber)."""
+    if size > _multilevel_capacity(pointers):
+        return None
+    count = 1
+    left = size - (pointers - 3)
+    for level in (1, 2, 3):
+        if left <= 0:
+            break
+        n = min(left, pointers ** level)
+        count += sum(-(-n // pointers ** l) for l in range(1, level + 1))
+        left -= n
+    return count
+
+
+def _extent_meta_count(num_runs, pointers):
+    """Blocos de índice de uma árvore de extensões com 'num_runs' extensões."""
+    count, entries = 1, num_runs
+    while entries > pointers:
+        entries = -(-entries // pointers)
+        count += entries
+    return count
+
+
+def _build_multilevel(take, size, pointers, tables):
+    """
+    Monta um inode multinível: pointers - 3 ponteiros diretos e depois um indireto simples,
+    um duplo e um triplo. take('index' ou 'data') fornece o próximo bloco de cada tipo, na
+    ordem de leitura. Grava {bloco de índice -> ponteiros} em 'tables' e retorna a raiz.
+    """
+    def subtree(level, count):
+        node = take('index')
+        entries = tables[node] = []
+        per_child = pointers ** (level - 1)
+        while count > 0:
+            n = min(per_child, count)
+            entries.append(take('data') if level == 1 else subtree(level - 1, n))
+            count -= n
+        return node
+
+    root = take('index')
+    entries = tables[root] = [take('data') for _ in range(min(size, pointers - 3))]
+    left = size - len(entries)
+    for level in (1, 2, 3):
+        if left <= 0:
+            break
+        n = min(left, pointers ** level)
+        entries.append(subtree(level, n))
+        left -= n
+    return root
+
+
+def _build_extent_tree(take, runs, pointers, tables):
+    """
+    Monta uma árvore de extensões: as folhas guardam até 'pointers' extensões [início, tamanho]
+    e os nós internos até 'pointers' pares [filho, blocos de dados abaixo]. take('index')
+    fornece os blocos de índice, na ordem de leitura. Grava em 'tables' e retorna (raiz, profundidade).
+    """
+    depth, span = 0, pointers
+    while len(runs) > span:
+        depth += 1
+        span *= pointers
+
+    def subtree(first, count, level):
+        node = take('index')
+        if level == 0:
+            tables[node] = [list(run) for run in runs[first:first + count]]
+            return node
+        entries = tables[node] = []
+        span = pointers ** level
+        for i in range(first, first + count, span):
+            n = min(span, first + count - i)
+            child = subtree(i, n, level - 1)
+            entries.append([child, sum(length for _, length in runs[i:i + n])])
+        return node
+
+    return subtree(0, len(runs), depth), depth
+
+
+class FileSystem:
+    """
+    Classe que gerencia a lógica do sistema de arquivos simulado.
+    """
+    def __init__(self, num_blocks, policy='first_fit', compact=False):
+        self.num_blocks = num_blocks
+        # Cria self.blocks, self.fat, self.free_count e self.free_extents
+        self._init_block_state(compact)
+
+        # Resumo de ocupação: blocos usados por balde de 2^SUMMARY_SHIFT blocos (visões agregadas do disco)
+        self.usage_summary = array('I', [0]) * ((num_blocks >> SUMMARY_SHIFT) + 1)
+       
+        # self.index_table simula uma tabela de inodes (para alocação indexada)
+        # Mapeia: {num_bloco_indice -> [lista_blocos_de_dados]}
+        self.index_table = {}
+       
+        # self.files armazena metadados dos arquivos criados
+        self.files = {}  
+        # Ex Contíguo: {'nome': {'size': 5, 'method': 'contiguous', 'blocks': range(0, 5)}}
+        # Ex Encadeado: {'nome2': {'size': 3, 'method': 'linked', 'start': 7, 'blocks': [7, 10, 11]}}
+        # Ex Indexado: {'nome3': {'size': 3, 'method': 'indexed', 'index_block': 20, 'data_blocks': [2, 5, 8]}}
+        # Um arquivo contíguo guarda só o intervalo (início, fim) num range (vira lista só enquanto uma
+        # desfragmentação o deixa espalhado); nos motores compactos as listas de blocos são array('I')
+        # Ex Indexado em árvore (ver set_index_mode): só a raiz fica nos metadados, o resto está na tabela de inodes
+        #   {'nome4': {'size': 900, 'method': 'indexed', 'index_mode': 'extent', 'index_block': 30,
+        #              'pointers_per_block': 16, 'depth': 0}}
+
+        # Métricas de localidade, mantidas a cada _set_file (ver metrics):
+        # {nome -> (fragmentos, saltos, distância de seek)} e as somas sobre todos os arquivos
+        self.file_metrics = {}
+        self.total_fragments = 0
+        self.total_hops = 0
+        self.total_seek = 0
+
+        # Política de posicionamento (ver PLACEMENT_POLICIES) e seu estado
+        self.policy = None
+        self.next_fit_cursor = 0 # Onde a última alocação terminou (next-fit)
+        self.buddy = None        # BuddyAllocator, só enquanto a política for 'buddy'
+        self.set_policy(policy)
+
+        # Formato do índice dos próximos arquivos indexados (ver set_index_mode)
+        self.index_mode = 'direct'
+        self.pointers_per_block = POINTERS_PER_BLOCK
+
+        # Diário de desfazer: enquanto não for None, cada mutação registra como revertê-la
+        self._journal = None
+        # Snapshot mais recente (ver snapshot): seu diário recebe as mutações feitas desde então
+        self._head = None
+
+        # Ouvintes de ChangeEvent (ver subscribe) e o evento sendo montado na operação atual
+        self._subscribers = {}
+        self._next_token = 0
+        self._pending = None
+
+        # Índices das cadeias da FAT já consultadas por block_at: {nome -> ChainIndex}.
+        # Descartado a cada _set_file do arquivo (toda mudança na cadeia passa por lá)
+        self._chain_indexes = {}
+
+
+    def subscribe(self, callback):
+        """
+        Registra callback(ChangeEvent), chamado ao fim de cada operação que muda o disco.
+        Retorna um token para unsubscribe().
+        """
+        self._next_token += 1
+        self._subscribers[self._next_token] = callback
+        return self._next_token
+
+
+    def unsubscribe(self, token):
+        self._subscribers.pop(token, None)
+
+
+    def _init_block_state(self, compact):
+        # self.blocks armazena o nome do arquivo que ocupa o bloco, ou None se estiver livre
+        # (compact=True usa um BlockMap: bitmap + ids de dono, poucos bytes por bloco)
+        self.blocks = BlockMap(self.num_blocks) if compact else [None] * self.num_blocks
+        self.free_count = self.num_blocks # Mantido a cada alocação/liberação
+       
+        # self.fat simula a Tabela de Alocação de Arquivos (para alocação encadeada)
+        # O índice é o bloco atual, o valor é o próximo bloco. -1 é fim de arquivo (EOF).
+        self.fat = array('i', [0]) * self.num_blocks if compact else [0] * self.num_blocks  # 0 = livre/disponível
+
+        # self.free_extents indexa os trechos livres, evitando varrer self.blocks a cada busca
+        self.free_extents = FreeExtentIndex(self.num_blocks)
+
+
+    def set_policy(self, policy):
+        """Troca a política de posicionamento usada pelos três métodos de alocação."""
+        if policy not in PLACEMENT_POLICIES:
+            raise ValueError(f"Política desconhecida: {policy}")
+        if policy == 'buddy' and self.buddy is None:
+            self.buddy = BuddyAllocator(self.num_blocks, self.free_extents)
+        elif policy != 'buddy':
+            self.buddy = None
+        self.policy = policy
+
+
+    def set_index_mode(self, mode, pointers_per_block=None):
+        """
+        Troca o formato do índice dos próximos arquivos indexados (ver INDEX_MODES). Arquivos
+        já criados guardam o seu próprio formato. 'pointers_per_block' None = mantém o atual.
+        """
+        if mode not in INDEX_MODES:
+            raise ValueError(f"Formato de índice desconhecido: {mode}")
+        if pointers_per_block is not None:
+            if pointers_per_block < 4:
+                raise ValueError("Um bloco de índice precisa de pelo menos 4 ponteiros.")
+            self.pointers_per_block = pointers_per_block
+        self.index_mode = mode
+
+
+    def _claim_blocks(self, block_list, file_name):
+        """Marca os blocos como ocupados por 'file_name' e atualiza o índice de livres."""
+        if not len(block_list):
+            return
+        self._mark_used(block_list, file_name)
+        self.free_count -= len(block_list)
+        self._count_usage(block_list, 1)
+        self.next_fit_cursor = (int(block_list[-1]) + 1) % self.num_blocks
+        if self._journal is not None:
+            self._journal.append(('claim', list(block_list)))
+        if self._pending is not None:
+            self._pending['claimed'].extend(block_list)
+
+
+    def _release_blocks(self, block_list):
+        """Marca os blocos como livres e os devolve ao índice de livres."""
+        if self._journal is not None:
+            owners = [(block, self.blocks[block]) for block in block_list if self.blocks[block] is not None]
+        freed = self._mark_free(block_list)
+        self.free_count += len(freed)
+        self._count_usage(freed, -1)
+        if self._journal is not None and freed:
+            self._journal.append(('release', owners))
+        if self._pending is not None:
+            self._pending['freed'].extend(freed)
+
+
+    def _count_usage(self, block_list, delta):
+        summary = self.usage_summary
+        for block in block_list:
+            summary[block >> SUMMARY_SHIFT] += delta
+
+
+    def _mark_used(self, block_list, file_name):
+        for start, length in _runs(block_list):
+            self.free_extents.remove(start, length)
+            if self.buddy is not None:
+                self.buddy.remove(start, length)
+            self.blocks[start:start + length] = [file_name] * length
+
+
+    def _mark_free(self, block_list):
+        freed = [block for block in block_list if self.blocks[block] is not None] # Ignora blocos já livres
+        for start, length in _runs(freed):
+            self.blocks[start:start + length] = [None] * length
+            self.free_extents.add(start, length)
+            if self.buddy is not None:
+                self.buddy.add(start, length)
+        return freed
+
+
+    def _set_fat(self, block, value):
+        if self._journal is not None:
+            self._journal.append(('fat', block, self.fat[block]))
+        if self._pending is not None:
+            self._pending['fat'].add(block)
+        self.fat[block] = value
+
+
+    def _set_inode(self, index_block, data_blocks):
+        """Grava (ou remove, se data_blocks for None) uma entrada da tabela de inodes."""
+        if self._journal is not None:
+            self._journal.append(('inode', index_block, self.index_table.get(index_block)))
+        if self._pending is not None:
+            self._pending['inodes_removed' if data_blocks is None else 'inodes_added'].add(index_block)
+        if data_blocks is None:
+            self.index_table.pop(index_block, None)
+        else:
+            self.index_table[index_block] = data_blocks
+
+
+    def _set_file(self, file_name, info, track=True, metrics=None):
+        """
+        Grava (ou remove, se info for None) os metadados de um arquivo. Com track=False as
+        métricas do arquivo só são descartadas (ver _undo, que as recalcula no fim); 'metrics'
+        traz as métricas novas já calculadas (ver _append_metrics).
+        """
+        if self._journal is not None:
+            self._journal.append(('file', file_name, self.files.get(file_name)))
+        if self._pending is not None:
+            if info is None:
+                self._pending['files_removed'].add(file_name)
+            else:
+                self._pending['files_added' if file_name not in self.files else 'files_changed'].add(file_name)
+        self._chain_indexes.pop(file_name, None)
+        self._track_file_metrics(file_name, info if track else None, metrics)
+        if info is None:
+            self.files.pop(file_name, None)
+        else:
+            self.files[file_name] = info
+
+
+    def _track_file_metrics(self, file_name, info, metrics=None):
+        """Troca as métricas de 'file_name' pelas de 'info' (None = arquivo removido) nas somas."""
+        old = self.file_metrics.pop(file_name, None)
+        if old is not None:
+            self.total_fragments -= old[0]
+            self.total_hops -= old[1]
+            self.total_seek -= old[2]
+        if info is not None:
+            if metrics is None:
+                metrics = self._compute_metrics(info)
+            new = self.file_metrics[file_name] = metrics
+            self.total_fragments += new[0]
+            self.total_hops += new[1]
+            self.total_seek += new[2]
+
+
+    def _compute_metrics(self, info):
+        """(fragmentos, saltos, distância de seek) de um arquivo (ver _file_metrics)."""
+        if isinstance(info.get('blocks'), range): # Contíguo: um trecho só
+            return 1, info['size'] - 1, info['size'] - 1
+        if info.get('index_mode') == 'extent': # Direto das extensões, sem expandir bloco a bloco
+            table = self.index_table
+            runs = []
+
+            def visit(node, level):
+                runs.append((node, 1))
+                for first, count in table[node]:
+                    if level > 0:
+                        visit(first, level - 1)
+                    else:
+                        runs.append((first, count))
+
+            visit(info['index_block'], info['depth'])
+            return _runs_metrics(runs)
+        return _file_metrics(self._read_order(info))
+
+
+    def _undo(self, journal):
+        """Reverte, do fim para o começo, as mutações registradas no diário."""
+        # A ordem de leitura de um arquivo indexado em árvore depende da tabela de inodes, que
+        # pode ser desfeita depois dos metadados do arquivo: as métricas são recalculadas no fim
+        restored = set()
+        for entry in reversed(journal):
+            kind = entry[0]
+            if kind == 'claim':
+                self._release_blocks(entry[1])
+            elif kind == 'release':
+                by_owner = {}
+                for block, owner in entry[1]:
+                    by_owner.setdefault(owner, []).append(block)
+                for owner, blocks in by_owner.items():
+                    self._claim_blocks(blocks, owner)
+            elif kind == 'fat':
+                self._set_fat(entry[1], entry[2])
+            elif kind == 'inode':
+                self._set_inode(entry[1], entry[2])
+            elif kind == 'file':
+                self._set_file(entry[1], entry[2], track=False)
+                restored.add(entry[1])
+        for file_name in restored:
+            if file_name in self.files:
+                self._track_file_metrics(file_name, self.files[file_name])
+
+
+    def snapshot(self):
+        """
+        Salva o estado atual e retorna um Snapshot para restore() e diff(). Custa O(1): daqui
+        em diante cada mutação é registrada no diário do novo snapshot, que permite voltar.
+        """
+        if self._journal is not (self._head.journal if self._head else None):
+            raise RuntimeError("snapshot() não pode ser chamado durante um lote.")
+        node = Snapshot(self.next_fit_cursor)
+        if self._head is not None:
+            self._head.parent = node # O anterior passa a ser alcançado a partir deste
+            node.children.append(self._head)
+        self._head = node
+        self._journal = node.journal
+        return node
+
+
+    @_emits_event('restore')
+    def restore(self, snapshot):
+        """
+        Volta o disco ao estado de 'snapshot'. As mutações feitas desde o último snapshot são
+        descartadas; os demais snapshots continuam válidos. Custa proporcional às mutações
+        entre os dois estados (não ao tamanho do disco).
+        """
+        path = self._path(snapshot) # Do snapshot pedido até o mais recente
+        if self._journal is not self._head.journal:
+            raise RuntimeError("restore() não pode ser chamado durante um lote.")
+
+        # Desfaz aresta por aresta, invertendo cada uma: o diário das mutações feitas para
+        # desfazer uma aresta é justamente o que refaz o estado que ficou para trás
+        for i in range(len(path) - 1, -1, -1):
+            journal = path[i].journal
+            self._journal = []
+            self._undo(journal)
+            if i + 1 < len(path):
+                path[i + 1].parent = path[i]
+                path[i + 1].journal = self._journal
+                path[i + 1].children.remove(path[i])
+                path[i].children.append(path[i + 1])
+        snapshot.parent = None
+        snapshot.journal = self._journal = []
+        self._head = snapshot
+        self.next_fit_cursor = snapshot.cursor
+        for node in path[1:]: # Descartados que a inversão das arestas deixou sem uso
+            self._prune(node)
+
+
+    def drop_snapshot(self, snapshot):
+        """
+        Descarta 'snapshot': ele não pode mais ser passado a restore() nem a diff(). Seu diário
+        é juntado ao do único snapshot que passa por ele ou, se nenhum passa, jogado fora; sem
+        snapshots vivos, as mutações deixam de ser registradas.
+        """
+        self._path(snapshot)
+        if self._journal is not self._head.journal:
+            raise RuntimeError("drop_snapshot() não pode ser chamado durante um lote.")
+        snapshot.dropped = True
+        self._prune(snapshot)
+
+
+    def _path(self, snapshot):
+        """Snapshots de 'snapshot' até o mais recente, conferindo que ele é deste FileSystem e ainda vale."""
+        if snapshot is None or snapshot.dropped:
+            raise ValueError("Snapshot descartado.")
+        path = []
+        node = snapshot
+        while node is not None:
+            path.append(node)
+            node = node.parent
+        if path[-1] is not self._head:
+            raise ValueError("Snapshot de outro FileSystem.")
+        return path
+
+
+    def _prune(self, node):
+        """Tira da árvore o snapshot descartado 'node' (e os ancestrais que isso liberar) se no máximo um passa por ele."""
+        while node is not None and node.dropped and node.journal is not None and len(node.children) <= 1:
+            parent = node.parent
+            if node.children:
+                # O filho passa a ir direto ao pai: desfaz o próprio diário e depois o de 'node'
+                child = node.children[0]
+                child.journal.extend(node.journal)
+                child.parent = parent
+                if parent is not None:
+                    parent.children[parent.children.index(node)] = child
+                else:
+                    self._head = child
+                    self._journal = child.journal
+            elif parent is not None:
+                parent.children.remove(node)
+            else: # Era o único snapshot
+                self._head = None
+                self._journal = None
+            node.parent, node.children, node.journal = None, [], None # Fora da árvore
+            node = parent
+
+
+    def diff(self, a, b=None):
+        """
+        Compara dois snapshots ('b' None = estado atual): retorna {'blocks', 'fat', 'inode', 'file'},
+        cada um mapeando as chaves que diferem para (valor em a, valor em b). Só consulta as chaves
+        tocadas pelos diários entre os dois, lendo os valores antigos direto dos diários: o disco
+        não é alterado e nenhum snapshot é criado.
+        """
+        chain = self._path(a)
+        on_chain = {id(node): i for i, node in enumerate(chain)}
+        keys = {'blocks': set(), 'fat': set(), 'inode': set(), 'file': set()}
+        node = b
+        if b is not None:
+            self._path(b)
+        while node is not None and id(node) not in on_chain: # Sobe de b até o ancestral comum
+            _journal_keys(node.journal, keys)
+            node = node.parent
+        for node in chain[:on_chain[id(node)] if node is not None else len(chain)]:
+            _journal_keys(node.journal, keys)
+        values_a = self._values_at(a, keys)
+        values_b = self._values_at(b, keys)
+        return {
+            kind: {key: (values_a[kind][key], values_b[kind][key])
+                   for key in keys[kind] if values_a[kind][key] != values_b[kind][key]}
+            for kind in keys
+        }
+
+
+    def _values_at(self, snapshot, keys):
+        """
+        Valores das chaves 'keys' (como em diff) no estado de 'snapshot' (None = atual). Subindo de
+        'snapshot' até o estado atual, o primeiro registro de cada chave guarda o valor que ela tinha
+        no snapshot; as chaves que nenhum diário do caminho tocou estão como agora.
+        """
+        values = {'blocks': {}, 'fat': {}, 'inode': {}, 'file': {}}
+        node = snapshot
+        while node is not None:
+            for entry in node.journal:
+                kind = entry[0]
+                if kind == 'claim': # Blocos que estavam livres
+                    for block in entry[1]:
+                        if block in keys['blocks']:
+                            values['blocks'].setdefault(block, None)
+                elif kind == 'release':
+                    for block, owner in entry[1]:
+                        if block in keys['blocks']:
+                            values['blocks'].setdefault(block, owner)
+                elif entry[1] in keys[kind]:
+                    values[kind].setdefault(entry[1], int(entry[2]) if kind == 'fat' else entry[2])
+            node = node.parent
+        current = {
+            'blocks': lambda block: self.blocks[block],
+            'fat': lambda block: int(self.fat[block]),
+            'inode': self.index_table.get,
+            'file': self.files.get,
+        }
+        for kind in keys:
+            for key in keys[kind]:
+                if key not in values[kind]:
+                    values[kind][key] = current[kind](key)
+        return values
+
+
+    def find_free_blocks_contiguous(self, size):
+        """Encontra um espaço contíguo de 'size' blocos livres, segundo a política atual."""
+        if self.policy == 'best_fit':
+            start_index = self.free_extents.find_best(size)
+        elif self.policy == 'worst_fit':
+            start_index = self.free_extents.find_worst(size)
+        elif self.policy == 'next_fit':
+            start_index = self.free_extents.find_first(size, self.next_fit_cursor)
+            if start_index is None: # Dá a volta no disco
+                start_index = self.free_extents.find_first(size)
+        elif self.policy == 'buddy':
+            start_index = self.buddy.find(size)
+        else:
+            start_index = self.free_extents.find_first(size)
+        if start_index is None:
+            return None
+        return range(start_index, start_index + size)
+
+
+    @_emits_event('create')
+    def allocate_contiguous(self, file_name, file_size):
+        """Aloca um arquivo usando o método contíguo."""
+        # ... (código existente) ...
+        if file_name in self.files:
+            return False, "Nome de arquivo já existe."
+        if file_size <= 0:
+            return False, "Tamanho do arquivo deve ser positivo."
+
+
+        block_list = self.find_free_blocks_contiguous(file_size)
+       
+        if block_list:
+            self._claim_blocks(block_list, file_name)
+           
+            self._set_file(file_name, {
+                'size': file_size,
+                'method': 'contiguous',
+                'blocks': block_list
+            })
+            return True, "Arquivo alocado com sucesso."
+        else:
+            return False, OutOfSpace("Espaço contíguo insuficiente (Fragmentação Externa).")
+
+
+    def find_free_block(self, start_from=0):
+        """Encontra o próximo bloco livre no disco."""
+        if start_from >= self.num_blocks:
+            start_from = 0
+        return self.free_extents.first_free_from(start_from) # -1 = Disco cheio
+
+
+    def find_free_blocks(self, count):
+        """Escolhe 'count' blocos livres (não necessariamente contíguos), segundo a política atual."""
+        extents = self.free_extents
+        if self.policy == 'best_fit':
+            # Um único trecho se houver (o menor que sirva); senão preenche os buracos menores primeiro
+            start = extents.find_best(count)
+            chosen = [(start, count)] if start is not None else ((s, l) for l, s in extents.by_size)
+        elif self.policy == 'worst_fit':
+            chosen = ((s, l) for l, s in reversed(extents.by_size))
+        elif self.policy == 'next_fit':
+            chosen = extents.extents_from(self.next_fit_cursor)
+        elif self.policy == 'buddy':
+            chosen = self.buddy.chunks()
+        else:
+            chosen = extents.extents_from(0)
+        return _take_blocks(chosen, count)
+
+
+    def get_free_blocks_count(self):
+        """Retorna o número de blocos livres."""
+        return self.free_count
+
+
+    def used_blocks_in_range(self, start, end):
+        """Quantos blocos de [start, end) estão ocupados, usando o resumo de ocupação."""
+        bucket = 1 << SUMMARY_SHIFT
+        first = -(-start // bucket) # Primeiro balde inteiro dentro do intervalo
+        last = end // bucket
+        if first >= last: # Intervalo pequeno: conta direto
+            return sum(1 for b in range(start, end) if self.blocks[b] is not None)
+        used = sum(self.usage_summary[first:last])
+        used += sum(1 for b in range(start, first * bucket) if self.blocks[b] is not None)
+        used += sum(1 for b in range(last * bucket, end) if self.blocks[b] is not None)
+        return used
+
+
+    def largest_free_extent(self):
+        """Tamanho do maior trecho contíguo de blocos livres."""
+        by_size = self.free_extents.by_size
+        return by_size[-1][0] if by_size else 0
+
+
+    def free_extent_histogram(self):
+        """Quantas extensões livres há em cada classe de tamanho: posição c = tamanhos em [2^c, 2^(c+1))."""
+        return list(self.free_extents.classes)
+
+
+    def metrics(self):
+        """Métricas de fragmentação e localidade; todas já mantidas a cada alocação/deleção."""
+        files = len(self.file_metrics)
+        return {
+            'largest_free_extent': self.largest_free_extent(),
+            'external_fragmentation': self.external_fragmentation(),
+            'free_extent_histogram': self.free_extent_histogram(),
+            'files': files,
+            'fragments': self.total_fragments,
+            'avg_fragments': self.total_fragments / files if files else 0.0,
+            'avg_seek_distance': self.total_seek / self.total_hops if self.total_hops else 0.0,
+        }
+
+
+    def external_fragmentation(self):
+        """Fração do espaço livre fora do maior trecho livre (0 = nada fragmentado)."""
+        free = self.get_free_blocks_count()
+        return 1 - self.largest_free_extent() / free if free else 0.0
+
+
+    def fat_entries(self):
+        """Entradas ocupadas da FAT, como pares (bloco, valor)."""
+        return [(i, val) for i, val in enumerate(self.fat) if val != 0]
+
+
+    def _fat_in_use(self):
+        """Quantas entradas da FAT não são 0 (o mesmo que len(fat_entries()), sem montar a lista)."""
+        fat = self.fat
+        return len(fat) - (fat.tolist() if isinstance(fat, memoryview) else fat).count(0)
+
+
+    @_emits_event('create')
+    def allocate_linked(self, file_name, file_size):
+        """Aloca um arquivo usando o método encadeado (FAT)."""
+        # ... (código existente) ...
+        if file_name in self.files:
+            return False, "Nome de arquivo já existe."
+        if file_size <= 0:
+            return False, "Tamanho do arquivo deve ser positivo."
+
+
+        # Verifica se há blocos livres suficientes (não precisam ser contíguos)
+        if self.get_free_blocks_count() < file_size:
+            return False, OutOfSpace("Espaço insuficiente no disco.")
+
+
+        # Alocação
+        block_list = self.find_free_blocks(file_size)
+        # Não deve falhar, pois verificamos o espaço total
+        self._claim_blocks(block_list, file_name)
+        current_block = -1
+       
+        for free_block in block_list:
+            if current_block != -1:
+                self._set_fat(current_block, free_block) # Aponta o bloco anterior para este
+           
+            current_block = free_block
+
+
+        self._set_fat(current_block, -1) # Marca o fim do arquivo (EOF)
+       
+        self._set_file(file_name, {
+            'size': file_size,
+            'method': 'linked',
+            'start': block_list[0],
+            'blocks': self._block_list(block_list) # Armazena para facilitar a visualização e deleção
+        })
+        return True, "Arquivo alocado com sucesso."
+
+
+    @_emits_event('create')
+    def allocate_indexed(self, file_name, file_size):
+        """Aloca um arquivo usando o método indexado (Inode)."""
+        if file_name in self.files:
+            return False, "Nome de arquivo já existe."
+        if file_size <= 0:
+            return False, "Tamanho do arquivo deve ser positivo."
+        if self.index_mode != 'direct':
+            return self._allocate_index_tree(file_name, file_size)
+
+
+        # Precisa de 'file_size' blocos de dados + 1 bloco de índice
+        if self.get_free_blocks_count() < (file_size + 1):
+             return False, OutOfSpace("Espaço insuficiente no disco (precisa de blocos de dados + 1 bloco de índice).")
+       
+        # 1. Escolhe os blocos segundo a política; o primeiro vira o bloco de índice
+        picked = self.find_free_blocks(file_size + 1)
+        if len(picked) < file_size + 1: # Não deve acontecer
+             return False, "Erro ao alocar bloco de índice."
+       
+        index_block = picked[0]
+        self._claim_blocks([index_block], file_name) # Marca como ocupado pelo arquivo
+
+
+        # 2. Aloca os blocos de dados
+        data_blocks = self._block_list(picked[1:])
+        self._claim_blocks(data_blocks, file_name)
+       
+        # 3. Registra na tabela de inodes e nos metadados do arquivo
+        self._set_inode(index_block, data_blocks)
+       
+        self._set_file(file_name, {
+            'size': file_size,
+            'method': 'indexed',
+            'index_block': index_block,
+            'data_blocks': data_blocks
+        })
+        return True, "Arquivo alocado com sucesso."
+
+
+
+
+    def _allocate_index_tree(self, file_name, file_size):
+        """
+        Alocação indexada com índice em árvore ('multilevel' ou 'extent', ver set_index_mode).
+        Os blocos de índice ficam intercalados com os de dados na ordem de leitura, como a raiz
+        antes dos dados no modo direto.
+        """
+        mode, pointers = self.index_mode, self.pointers_per_block
+        if mode == 'multilevel':
+            meta = _multilevel_meta_count(file_size, pointers)
+            if meta is None:
+                return False, f"Arquivo grande demais para o índice multinível (máximo {_multilevel_capacity(pointers)} blocos)."
+            if self.get_free_blocks_count() < file_size + meta:
+                return False, OutOfSpace("Espaço insuficiente no disco (precisa de blocos de dados + blocos de índice).")
+            picked = self.find_free_blocks(file_size + meta)
+            if len(picked) < file_size + meta: # Não deve acontecer
+                return False, "Erro ao alocar blocos de índice."
+            self._claim_blocks(picked, file_name)
+            tables, info = self._build_index(file_name, mode, pointers, picked, [], file_size)
+        else:
+            # A raiz vem antes dos dados; os demais nós só se as extensões não couberem nela
+            if self.get_free_blocks_count() < file_size + 1:
+                return False, OutOfSpace("Espaço insuficiente no disco (precisa de blocos de dados + blocos de índice).")
+            picked = self.find_free_blocks(file_size + 1)
+            if len(picked) < file_size + 1: # Não deve acontecer
+                return False, "Erro ao alocar blocos de índice."
+            meta = _extent_meta_count(len(_runs(picked[1:])), pointers)
+            if self.get_free_blocks_count() < file_size + meta:
+                return False, OutOfSpace("Espaço insuficiente no disco (precisa de blocos de dados + blocos de índice).")
+            self._claim_blocks(picked, file_name)
+            tables, info = self._build_index(file_name, mode, pointers, picked[1:], picked[:1], file_size)
+        for index_block, entries in tables.items():
+            self._set_inode(index_block, entries)
+        self._set_file(file_name, info)
+        return True, "Arquivo alocado com sucesso."
+
+
+    def _build_index(self, file_name, mode, pointers, blocks, index_blocks, size, runs=None):
+        """
+        Monta o índice em árvore de um arquivo com 'size' blocos de dados. No modo 'multilevel',
+        'blocks' traz os blocos de dados e de índice juntos, na ordem de leitura; no 'extent',
+        só os de dados, e os de índice vêm de 'index_blocks' (na ordem de leitura). Blocos de
+        índice que faltarem são alocados e os que sobrarem, liberados ('runs' pode trazer as
+        extensões já prontas no lugar de 'blocks'). Não grava a tabela de inodes: retorna
+        ({bloco de índice -> entradas}, metadados do arquivo).
+        """
+        tables = {}
+        if mode == 'multilevel':
+            picked = iter(blocks)
+            root = _build_multilevel(lambda kind: next(picked), size, pointers, tables)
+            return tables, {'size': size, 'method': 'indexed', 'index_mode': mode,
+                            'index_block': root, 'pointers_per_block': pointers}
+        if runs is None:
+            runs = _runs(blocks)
+        needed = _extent_meta_count(len(runs), pointers)
+        index_blocks = list(index_blocks)
+        if needed > len(index_blocks):
+            extra = self.find_free_blocks(needed - len(index_blocks))
+            if len(extra) < needed - len(index_blocks):
+                raise RuntimeError("Sem blocos livres para o índice de extensões.")
+            self._claim_blocks(extra, file_name)
+            index_blocks.extend(extra)
+        elif needed < len(index_blocks):
+            self._release_blocks(index_blocks[needed:])
+            del index_blocks[needed:]
+        picked = iter(index_blocks)
+        root, depth = _build_extent_tree(lambda kind: next(picked), runs, pointers, tables)
+        return tables, {'size': size, 'method': 'indexed', 'index_mode': mode, 'index_block': root,
+                        'pointers_per_block': pointers, 'depth': depth}
+
+
+    def _walk_index(self, info):
+        """
+        Percorre o índice de um arquivo indexado na ordem de leitura, gerando (bloco, pai, é_índice):
+        'pai' é o bloco de índice que aponta para 'bloco' (None na raiz).
+        """
+        root = info['index_block']
+        yield root, None, True
+        mode = info.get('index_mode', 'direct')
+        table = self.index_table
+        if mode == 'direct':
+            for block in info['data_blocks']:
+                yield block, root, False
+            return
+        pointers = info['pointers_per_block']
+
+        if mode == 'multilevel':
+            def subtree(node, parent, level):
+                yield node, parent, True
+                for entry in table[node]:
+                    if level == 1:
+                        yield entry, node, False
+                    else:
+                        yield from subtree(entry, node, level - 1)
+
+            for i, entry in enumerate(table[root]):
+                if i < pointers - 3:
+                    yield entry, root, False
+                else:
+                    yield from subtree(entry, root, i - (pointers - 4))
+            return
+
+        def extents(node, parent, level):
+            if parent is not None:
+                yield node, parent, True
+            for first, count in table[node]:
+                if level == 0:
+                    for block in range(first, first + count):
+                        yield block, node, False
+                else:
+                    yield from extents(first, node, level - 1)
+
+        yield from extents(root, None, info['depth'])
+
+
+    def _index_layout(self, info, read_order=None):
+        """
+        (blocos de índice, blocos de dados) de um arquivo indexado, na ordem de leitura. Com uma
+        lista em 'read_order', também acrescenta nela todos os blocos, na ordem de leitura.
+        """
+        mode = info.get('index_mode', 'direct')
+        if mode == 'direct':
+            if read_order is not None:
+                read_order.append(info['index_block'])
+                read_order.extend(info['data_blocks'])
+            return [info['index_block']], list(info['data_blocks'])
+        index_blocks, data_blocks = [], []
+        if mode == 'extent':
+            # Caminho rápido: as extensões viram ranges, sem gerar bloco a bloco
+            table = self.index_table
+
+            def visit(node, level):
+                index_blocks.append(node)
+                if read_order is not None:
+                    read_order.append(node)
+                for first, count in table[node]:
+                    if level > 0:
+                        visit(first, level - 1)
+                        continue
+                    data_blocks.extend(range(first, first + count))
+                    if read_order is not None:
+                        read_order.extend(range(first, first + count))
+
+            visit(info['index_block'], info['depth'])
+            return index_blocks, data_blocks
+        for block, _, is_index in self._walk_index(info):
+            (index_blocks if is_index else data_blocks).append(block)
+            if read_order is not None:
+                read_order.append(block)
+        return index_blocks, data_blocks
+
+
+    def _read_order(self, info):
+        """Blocos que a leitura sequencial de um arquivo percorre (índices antes dos dados que apontam)."""
+        if info['method'] != 'indexed':
+            return info['blocks']
+        order = []
+        self._index_layout(info, order)
+        return order
+
+
+    def file_blocks(self, file_name):
+        """Blocos de dados de um arquivo, em ordem lógica."""
+        info = self.files[file_name]
+        if info['method'] == 'indexed':
+            return self._index_layout(info)[1]
+        return list(info['blocks'])
+
+
+    def block_at(self, file_name, k):
+        """
+        Bloco físico do k-ésimo bloco lógico de um arquivo. Na alocação encadeada consulta o
+        ChainIndex do arquivo (montado na primeira consulta), sem percorrer a cadeia desde o início.
+        """
+        info = self.files[file_name]
+        if not 0 <= k < info['size']:
+            raise IndexError(f"Bloco {k} fora do arquivo {file_name} ({info['size']} blocos).")
+        if info['method'] != 'linked':
+            return self.block_path(file_name, k)[-1]
+        return self._chain_index(file_name, info).lookup(k)
+
+
+    def _chain_index(self, file_name, info):
+        """O ChainIndex de um arquivo encadeado, montado se ainda não existir."""
+        chain = self._chain_indexes.get(file_name)
+        if chain is None:
+            chain = self._chain_indexes[file_name] = ChainIndex(self.fat, info['start'])
+        return chain
+
+
+    def _extent_tree(self, info):
+        """(blocos de índice na ordem de leitura, extensões [início, tamanho]) de um índice de extensões."""
+        table = self.index_table
+        index_blocks, runs = [], []
+
+        def visit(node, level):
+            index_blocks.append(node)
+            for first, count in table[node]:
+                if level > 0:
+                    visit(first, level - 1)
+                else:
+                    runs.append([first, count])
+
+        visit(info['index_block'], info['depth'])
+        return index_blocks, runs
+
+
+    def block_path(self, file_name, k):
+        """
+        Blocos lidos para chegar ao k-ésimo bloco de dados de um arquivo: os blocos de índice do
+        caminho e por último o próprio bloco. A FAT fica na memória: na alocação encadeada só o
+        bloco em si é lido.
+        """
+        info = self.files[file_name]
+        if not 0 <= k < info['size']:
+            raise IndexError(f"Bloco {k} fora do arquivo {file_name} ({info['size']} blocos).")
+        if info['method'] == 'contiguous':
+            return [info['blocks'][k]]
+        if info['method'] == 'linked':
+            return [self.block_at(file_name, k)]
+        mode = info.get('index_mode', 'direct')
+        root = info['index_block']
+        if mode == 'direct':
+            return [root, info['data_blocks'][k]]
+        table = self.index_table
+        pointers = info['pointers_per_block']
+        path = [root]
+
+        if mode == 'multilevel':
+            direct = pointers - 3
+            if k < direct:
+                return [root, table[root][k]]
+            k -= direct
+            level = 1
+            while k >= pointers ** level:
+                k -= pointers ** level
+                level += 1
+            node = table[root][direct + level - 1]
+            for l in range(level, 0, -1):
+                path.append(node)
+                i, k = divmod(k, pointers ** (l - 1))
+                node = table[node][i]
+            path.append(node)
+            return path
+
+        node = root
+        for _ in range(info['depth']):
+            for child, count in table[node]:
+                if k < count:
+                    break
+                k -= count
+            node = child
+            path.append(node)
+        for start, length in table[node]:
+            if k < length:
+                break
+            k -= length
+        path.append(start + k)
+        return path
+
+
+    @_emits_event('delete')
+    def delete_file(self, file_name):
+        """Deleta um arquivo do sistema."""
+        # ... (código existente) ...
+        if file_name not in self.files:
+            return False, "Arquivo não encontrado."
+
+
+        file_info = self.files[file_name]
+       
+        if file_info['method'] == 'contiguous':
+            self._release_blocks(file_info['blocks'])
+       
+        elif file_info['method'] == 'linked':
+            # Percorre a cadeia da FAT para deletar
+            current_block = file_info['start']
+            chain = []
+            while current_block != -1:
+                next_block = self.fat[current_block]
+                chain.append(current_block)
+                self._set_fat(current_block, 0) # Limpa entrada da FAT
+                current_block = next_block
+            self._release_blocks(chain)
+       
+        elif file_info['method'] == 'indexed' and file_info.get('index_mode', 'direct') != 'direct':
+            index_blocks, data_blocks = self._index_layout(file_info)
+            self._release_blocks(data_blocks + index_blocks)
+            for index_block in index_blocks:
+                self._set_inode(index_block, None)
+
+        elif file_info['method'] == 'indexed':
+            index_block = file_info['index_block']
+            data_blocks = file_info['data_blocks']
+           
+            # Libera blocos de dados
+            self._release_blocks(data_blocks)
+               
+            # Libera bloco de índice
+            self._release_blocks([index_block])
+           
+            # Remove da tabela de inodes
+            if index_block in self.index_table:
+                self._set_inode(index_block, None)
+       
+        self._set_file(file_name, None)
+        return True, "Arquivo deletado com sucesso."
+
+
+    @_emits_event('extend')
+    def extend(self, file_name, count):
+        """
+        Acrescenta 'count' blocos ao fim de um arquivo, pelo método dele. Um arquivo contíguo
+        cresce no lugar se os blocos seguintes estiverem livres; senão é realocado inteiro.
+        """
+        info = self.files.get(file_name)
+        if info is None:
+            return False, "Arquivo não encontrado."
+        if count <= 0:
+            return False, "Quantidade de blocos deve ser positiva."
+        if info['method'] == 'contiguous':
+            return self._extend_contiguous(file_name, info, count)
+        if self.get_free_blocks_count() < count:
+            return False, OutOfSpace("Espaço insuficiente no disco.")
+        if info['method'] == 'linked':
+            return self._extend_linked(file_name, info, count)
+        return self._extend_indexed(file_name, info, count)
+
+
+    def _extend_contiguous(self, file_name, info, count):
+        blocks = info['blocks']
+        end = blocks[-1] + 1
+        size = info['size'] + count
+        if end + count <= self.num_blocks and self.used_blocks_in_range(end, end + count) == 0:
+            added = list(range(end, end + count))
+            self._claim_blocks(added, file_name)
+            self._grow_file(file_name, info, count, _append_metrics(self.file_metrics[file_name], blocks[-1], added),
+                            'blocks', added)
+            return True, "Arquivo estendido no lugar."
+
+        # Realocação: primeiro fora do lugar atual; senão num trecho que inclua os blocos do próprio arquivo
+        if self.get_free_blocks_count() < count:
+            return False, OutOfSpace("Espaço insuficiente no disco.")
+        cursor = self.next_fit_cursor
+        block_list = self.find_free_blocks_contiguous(size)
+        if not block_list:
+            self._release_blocks(blocks)
+            block_list = self.find_free_blocks_contiguous(size)
+            if not block_list:
+                self._claim_blocks(blocks, file_name)
+                self.next_fit_cursor = cursor
+                return False, OutOfSpace("Espaço contíguo insuficiente para estender (Fragmentação Externa).")
+        else:
+            self._release_blocks(blocks)
+        self._claim_blocks(block_list, file_name)
+        self._set_file(file_name, dict(info, size=size, blocks=block_list))
+        return True, "Arquivo realocado para poder crescer."
+
+
+    def _block_list(self, blocks):
+        """Lista de blocos de um arquivo encadeado ou indexado direto: array('I') nos motores compactos."""
+        return array('I', blocks) if isinstance(self.blocks, BlockMap) else blocks
+
+
+    def _grow_file(self, file_name, info, count, metrics, key=None, added=()):
+        """
+        Soma 'count' ao tamanho do arquivo e acrescenta 'added' ao fim da lista info[key] (no modo
+        indexado direto, também a entrada do bloco de índice). Sem diário aberto, o dicionário e a
+        lista mudam no lugar, em O(len(added)); com diário (snapshot ou lote), que guarda os valores
+        antigos por referência, são gravadas cópias novas por _set_file/_set_inode.
+        """
+        index_block = info['index_block'] if key == 'data_blocks' else None
+        old = info[key] if key is not None else None
+        grown = range(old.start, old.stop + len(added)) if isinstance(old, range) else None # Contíguo: só o fim muda
+        if self._journal is not None:
+            info = dict(info, size=info['size'] + count)
+            if key is not None:
+                if grown is None:
+                    grown = old[:] # Mesmo tipo (list ou array)
+                    grown.extend(added)
+                info[key] = grown
+            if index_block is not None:
+                self._set_inode(index_block, info[key])
+            self._set_file(file_name, info, metrics=metrics)
+            return
+        if grown is not None:
+            info[key] = grown
+        elif key is not None:
+            info[key].extend(added)
+        if index_block is not None:
+            entries = self.index_table[index_block]
+            if entries is not info[key]: # Listas separadas (ex.: disco carregado de uma imagem)
+                entries.extend(added)
+            if self._pending is not None:
+                self._pending['inodes_added'].add(index_block)
+        info['size'] += count
+        if self._pending is not None:
+            self._pending['files_changed'].add(file_name)
+        self._track_file_metrics(file_name, info, metrics)
+
+
+    def _extend_linked(self, file_name, info, count):
+        # O último bloco é o fim da lista do arquivo: não é preciso percorrer a cadeia
+        tail = info['blocks'][-1]
+        chain = self._chain_indexes.get(file_name) # Só é atualizado se já existir (ver _chain_index)
+        added = self.find_free_blocks(count)
+        self._claim_blocks(added, file_name)
+        self._set_fat(tail, added[0])
+        for block, next_block in zip(added, added[1:]):
+            self._set_fat(block, next_block)
+        self._set_fat(added[-1], -1)
+        metrics = _append_metrics(self.file_metrics[file_name], tail, added)
+        self._grow_file(file_name, info, count, metrics, 'blocks', added)
+        if chain is not None:
+            chain.append(added)
+            self._chain_indexes[file_name] = chain # _set_file (com diário) descarta o índice; este já está em dia
+        return True, "Arquivo estendido com sucesso."
+
+
+    def _extend_indexed(self, file_name, info, count):
+        mode = info.get('index_mode', 'direct')
+        size = info['size'] + count
+        metrics = self.file_metrics[file_name]
+
+        if mode == 'direct':
+            added = self.find_free_blocks(count)
+            self._claim_blocks(added, file_name)
+            self._grow_file(file_name, info, count, _append_metrics(metrics, info['data_blocks'][-1], added),
+                            'data_blocks', added)
+            return True, "Arquivo estendido com sucesso."
+
+        pointers = info['pointers_per_block']
+        if mode == 'multilevel':
+            meta = _multilevel_meta_count(size, pointers)
+            if meta is None:
+                return False, f"Arquivo grande demais para o índice multinível (máximo {_multilevel_capacity(pointers)} blocos)."
+            extra = meta - _multilevel_meta_count(info['size'], pointers)
+            if self.get_free_blocks_count() < count + extra:
+                return False, OutOfSpace("Espaço insuficiente no disco (precisa de blocos de dados + blocos de índice).")
+            last = self.block_at(file_name, info['size'] - 1)
+            added = self.find_free_blocks(count + extra)
+            self._claim_blocks(added, file_name)
+            for index_block, entries in self._multilevel_append(info, added, count).items():
+                self._set_inode(index_block, entries)
+            self._grow_file(file_name, info, count, _append_metrics(metrics, last, added))
+            return True, "Arquivo estendido com sucesso."
+
+        # Extensões: normalmente só a folha mais à direita e o caminho até ela mudam
+        added = self.find_free_blocks(count)
+        changed, last = self._extent_append(info, _runs(added), count)
+        if changed is not None:
+            self._claim_blocks(added, file_name)
+            for index_block, entries in changed.items():
+                self._set_inode(index_block, entries)
+            self._grow_file(file_name, info, count, _append_metrics(metrics, last, added))
+            return True, "Arquivo estendido com sucesso."
+
+        # A folha encheu: a árvore é remontada sobre os mesmos blocos de índice (custo
+        # proporcional ao número de extensões)
+        index_blocks, runs = self._extent_tree(info)
+        for start, length in _runs(added):
+            if runs[-1][0] + runs[-1][1] == start:
+                runs[-1][1] += length
+            else:
+                runs.append([start, length])
+        extra = _extent_meta_count(len(runs), pointers) - len(index_blocks)
+        if self.get_free_blocks_count() < count + max(0, extra):
+            return False, OutOfSpace("Espaço insuficiente no disco (precisa de blocos de dados + blocos de índice).")
+        self._claim_blocks(added, file_name)
+        self._rewrite_extent_index(file_name, info, index_blocks, runs, size)
+        return True, "Arquivo estendido com sucesso."
+
+
+    def _multilevel_append(self, info, picked, count):
+        """
+        Acrescenta 'count' blocos de dados a um inode multinível, tirando de 'picked' (na ordem
+        de leitura) os blocos de dados e os novos blocos de índice. Retorna só as entradas da
+        tabela de inodes que mudaram, em listas novas: {bloco de índice -> entradas}.
+        """
+        table = self.index_table
+        pointers = info['pointers_per_block']
+        direct = pointers - 3
+        root = info['index_block']
+        take = iter(picked).__next__
+        changed = {}
+
+        def entries(node):
+            if node not in changed:
+                changed[node] = list(table.get(node, ()))
+            return changed[node]
+
+        for k in range(info['size'], info['size'] + count):
+            if k < direct:
+                entries(root).append(take())
+                continue
+            rest, level = k - direct, 1
+            while rest >= pointers ** level:
+                rest -= pointers ** level
+                level += 1
+            top = entries(root)
+            if rest == 0: # Primeiro bloco deste nível: cria o bloco indireto dele
+                node = take()
+                changed[node] = []
+                top.append(node)
+            node = top[direct + level - 1]
+            for l in range(level, 1, -1):
+                i, rest = divmod(rest, pointers ** (l - 1))
+                children = entries(node)
+                if i == len(children):
+                    child = take()
+                    changed[child] = []
+                    children.append(child)
+                node = children[i]
+            entries(node).append(take())
+        return changed
+
+
+    def _extent_append(self, info, added_runs, count):
+        """
+        Acrescenta extensões à folha mais à direita de um índice de extensões. Retorna
+        ({bloco de índice -> entradas novas} do caminho até ela, último bloco de dados antes
+        do acréscimo), ou (None, None) se a folha não tiver espaço.
+        """
+        table = self.index_table
+        path = [info['index_block']]
+        for _ in range(info['depth']):
+            path.append(table[path[-1]][-1][0])
+        leaf = [list(entry) for entry in table[path[-1]]]
+        last = leaf[-1][0] + leaf[-1][1] - 1
+        runs = [list(run) for run in added_runs]
+        if last + 1 == runs[0][0]: # Continua a última extensão
+            leaf[-1][1] += runs.pop(0)[1]
+        if len(leaf) + len(runs) > info['pointers_per_block']:
+            return None, None
+        leaf.extend(runs)
+        changed = {path[-1]: leaf}
+        for node in path[:-1]:
+            entries = [list(entry) for entry in table[node]]
+            entries[-1][1] += count
+            changed[node] = entries
+        return changed, last
+
+
+    def _rewrite_extent_index(self, file_name, info, index_blocks, runs, size):
+        """Regrava o índice de extensões de um arquivo com as extensões 'runs', reaproveitando 'index_blocks'."""
+        tables, new_info = self._build_index(file_name, 'extent', info['pointers_per_block'], None,
+                                             index_blocks, size, runs=runs)
+        for index_block in index_blocks:
+            if index_block not in tables: # Liberado por _build_index
+                self._set_inode(index_block, None)
+        for index_block, entries in tables.items():
+            if self.index_table.get(index_block) != entries:
+                self._set_inode(index_block, entries)
+        self._set_file(file_name, new_info)
+
+
+    @_emits_event('truncate')
+    def truncate(self, file_name, size):
+        """Reduz um arquivo aos seus primeiros 'size' blocos, liberando o resto."""
+        info = self.files.get(file_name)
+        if info is None:
+            return False, "Arquivo não encontrado."
+        if not 1 <= size <= info['size']:
+            return False, f"Novo tamanho deve estar entre 1 e {info['size']} blocos."
+        if size == info['size']:
+            return True, "Arquivo já tem esse tamanho."
+        method = info['method']
+
+        if method == 'contiguous':
+            self._release_blocks(info['blocks'][size:])
+            self._set_file(file_name, dict(info, size=size, blocks=info['blocks'][:size]))
+
+        elif method == 'linked':
+            chain = self._chain_index(file_name, info)
+            blocks = info['blocks']
+            tail = blocks[size - 1]
+            freed = blocks[size:]
+            for block in freed:
+                self._set_fat(block, 0) # Limpa entrada da FAT
+            self._set_fat(tail, -1)
+            self._release_blocks(freed)
+            self._set_file(file_name, dict(info, size=size, blocks=blocks[:size]))
+            chain.truncate(size, tail)
+            self._chain_indexes[file_name] = chain
+
+        elif info.get('index_mode', 'direct') == 'direct':
+            data_blocks = info['data_blocks']
+            self._release_blocks(data_blocks[size:])
+            self._set_inode(info['index_block'], data_blocks[:size])
+            self._set_file(file_name, dict(info, size=size, data_blocks=data_blocks[:size]))
+
+        elif info['index_mode'] == 'multilevel':
+            # Na ordem de leitura, tudo depois do size-ésimo bloco de dados sai (índices inclusive)
+            kept, freed, freed_index = [], [], []
+            data = 0
+            for block, _, is_index in self._walk_index(info):
+                if data < size:
+                    kept.append(block)
+                    data += not is_index
+                else:
+                    freed.append(block)
+                    if is_index:
+                        freed_index.append(block)
+            tables = {}
+            picked = iter(kept)
+            _build_multilevel(lambda kind: next(picked), size, info['pointers_per_block'], tables)
+            self._release_blocks(freed)
+            for index_block in freed_index:
+                self._set_inode(index_block, None)
+            for index_block, entries in tables.items():
+                if self.index_table.get(index_block) != entries:
+                    self._set_inode(index_block, entries)
+            self._set_file(file_name, dict(info, size=size))
+
+        else:
+            index_blocks, runs = self._extent_tree(info)
+            kept, freed = [], []
+            left = size
+            for start, length in runs:
+                take = min(length, max(left, 0))
+                if take:
+                    kept.append([start, take])
+                freed.extend(range(start + take, start + length))
+                left -= length
+            self._release_blocks(freed)
+            self._rewrite_extent_index(file_name, info, index_blocks, kept, size)
+        return True, "Arquivo truncado com sucesso."
+
+
+    def allocate(self, method, file_name, file_size):
+        """Aloca um arquivo pelo método dado (ver ALLOCATION_METHODS)."""
+        if method == 'contiguous':
+            return self.allocate_contiguous(file_name, file_size)
+        if method == 'linked':
+            return self.allocate_linked(file_name, file_size)
+        if method == 'indexed':
+            return self.allocate_indexed(file_name, file_size)
+        return False, f"Método de alocação desconhecido: {method}"
+
+
+    def _plan_batch(self, ops):
+        """
+        Valida o lote inteiro antes de aplicá-lo, sem tocar no disco: nomes, tamanhos e a
+        contagem de blocos livres são simulados operação a operação. Só a capacidade é
+        conferida aqui; os blocos de cada operação são escolhidos ao aplicá-la (ver apply_batch).
+        """
+        created = {} # nome -> blocos que ocupará
+        deleted = set()
+        grown = {}   # Blocos acrescentados no lote a arquivos que já existiam
+        free = self.free_count
+        for i, op in enumerate(ops):
+            if op[0] == 'create':
+                _, file_name, file_size, method = op
+                exists = file_name in created or (file_name in self.files and file_name not in deleted)
+                if exists:
+                    return False, f"Operação {i + 1} ({file_name}): Nome de arquivo já existe."
+                if method not in ALLOCATION_METHODS:
+                    return False, f"Operação {i + 1} ({file_name}): Método de alocação desconhecido: {method}"
+                if file_size <= 0:
+                    return False, f"Operação {i + 1} ({file_name}): Tamanho do arquivo deve ser positivo."
+                needed = file_size
+                if method == 'indexed':
+                    meta = self._index_overhead(file_size)
+                    if meta is None:
+                        return False, f"Operação {i + 1} ({file_name}): Arquivo grande demais para o índice multinível."
+                    needed += meta
+                if needed > free:
+                    return False, OutOfSpace(f"Operação {i + 1} ({file_name}): Espaço insuficiente no disco.")
+                free -= needed
+                created[file_name] = needed
+            elif op[0] == 'delete':
+                file_name = op[1]
+                if file_name in created:
+                    free += created.pop(file_name)
+                elif file_name in self.files and file_name not in deleted:
+                    deleted.add(file_name)
+                    info = self.files[file_name]
+                    free += info['size'] + grown.pop(file_name, 0)
+                    if info['method'] == 'indexed':
+                        free += 1 if info.get('index_mode', 'direct') == 'direct' else len(self._index_layout(info)[0])
+                else:
+                    return False, f"Operação {i + 1} ({file_name}): Arquivo não encontrado."
+            elif op[0] in ('extend', 'truncate'):
+                # Só 'extend' consome espaço; o que 'truncate' libera não é contado (estimativa conservadora)
+                _, file_name, count = op
+                if file_name not in created and (file_name not in self.files or file_name in deleted):
+                    return False, f"Operação {i + 1} ({file_name}): Arquivo não encontrado."
+                if count <= 0:
+                    return False, f"Operação {i + 1} ({file_name}): Quantidade de blocos deve ser positiva."
+                if op[0] == 'extend':
+                    if count > free:
+                        return False, OutOfSpace(f"Operação {i + 1} ({file_name}): Espaço insuficiente no disco.")
+                    free -= count
+                    if file_name in created:
+                        created[file_name] += count
+                    else:
+                        grown[file_name] = grown.get(file_name, 0) + count
+            else:
+                return False, f"Operação {i + 1}: tipo desconhecido: {op[0]}"
+        return True, ""
+
+
+    def _index_overhead(self, file_size):
+        """
+        Blocos de índice de um novo arquivo indexado no formato atual (None se não couber).
+        No modo 'extent' é o mínimo, uma raiz: o resto depende de quantas extensões sairem.
+        """
+        if self.index_mode == 'multilevel':
+            return _multilevel_meta_count(file_size, self.pointers_per_block)
+        return 1
+
+
+    @_emits_event('batch')
+    def apply_batch(self, ops):
+        """
+        Aplica um lote de operações ('create', nome, tamanho, método), ('delete', nome),
+        ('extend', nome, blocos) e ('truncate', nome, tamanho). Tudo ou nada: se alguma operação falhar, o disco volta ao estado anterior ao lote.
+
+        Não há uma passada única pelo espaço livre que reparta os blocos entre as operações,
+        de propósito: o planejamento (_plan_batch) só confere nomes e capacidade, e cada operação
+        escolhe seus blocos ao ser aplicada. Uma passada única não economizaria nada, porque não
+        há varredura a compartilhar: a busca de cada operação consulta o índice de espaço livre
+        (FreeExtentIndex), mantido incrementalmente: custa O(log n) mais as extensões que usa. E repartir os
+        blocos de antemão mudaria o resultado, porque o que uma deleção libera no meio do lote
+        ficaria de fora e a política valeria para o lote e não para cada operação. Assim o lote
+        dá o mesmo disco que as mesmas operações aplicadas uma a uma. (No motor 'numpy', que não
+        tem o índice, cada operação faz sua própria busca vetorizada.)
+        """
+        success, message = self._plan_batch(ops)
+        if not success:
+            return False, message
+
+        cursor = self.next_fit_cursor
+        outer = self._journal # Diário do snapshot mais recente, se houver
+        journal = self._journal = []
+        try:
+            for i, op in enumerate(ops):
+                if op[0] == 'create':
+                    success, message = self.allocate(op[3], op[1], op[2])
+                elif op[0] == 'delete':
+                    success, message = self.delete_file(op[1])
+                elif op[0] == 'extend':
+                    success, message = self.extend(op[1], op[2])
+                else:
+                    success, message = self.truncate(op[1], op[2])
+                if not success:
+                    break
+        except BaseException:
+            success = False
+            raise
+        finally:
+            self._journal = None
+            if not success: # Desfaz o que já foi aplicado
+                self._undo(journal)
+                self.next_fit_cursor = cursor
+            elif outer is not None:
+                outer.extend(journal)
+            self._journal = outer
+        if not success:
+            kind = OutOfSpace if isinstance(message, OutOfSpace) else str
+            return False, kind(f"Operação {i + 1} ({op[1]}): {message} Lote desfeito.")
+        return True, f"Lote de {len(ops)} operações aplicado com sucesso."
+
+
+    def check(self):
+        """
+        Verificação de consistência (fsck): confere blocks, fat, index_table e files entre si
+        numa passada linear. Retorna {'ok', 'leaks', 'cross_links', 'cycles', 'errors'}:
+        leaks = blocos ocupados que nenhum arquivo referencia; cross_links = {bloco -> arquivos}
+        dos blocos referenciados mais de uma vez; cycles = arquivos encadeados cuja cadeia na
+        FAT não termina; errors = as demais divergências, em texto.
+        """
+        n = self.num_blocks
+        fat = self.fat.tolist() if np is not None and isinstance(self.fat, np.ndarray) else self.fat
+        expected = [None] * n # Dono de cada bloco segundo os metadados dos arquivos
+        cross_links = {}
+        cycles = []
+        errors = []
+        chains = []           # Blocos das cadeias da FAT percorridas
+        links = 0             # Entradas não nulas da FAT nessas cadeias (como em fat_entries)
+        index_blocks = set()  # Blocos de índice referenciados pelos arquivos
+
+        for name, info in self.files.items():
+            method = info['method']
+            if method == 'linked':
+                blocks = []
+                block = info['start']
+                while block != -1:
+                    if not 0 <= block < n:
+                        errors.append(f"{name}: a cadeia aponta para o bloco {block}, fora do disco.")
+                        break
+                    owner = expected[block]
+                    if owner == name or len(blocks) > n: # Voltou a um bloco da própria cadeia
+                        cycles.append(name)
+                        break
+                    if owner is None:
+                        expected[block] = name
+                    else:
+                        cross_links.setdefault(block, [owner]).append(name)
+                    blocks.append(block)
+                    block = fat[block]
+                    if block:
+                        links += 1
+                else:
+                    if blocks != list(info['blocks']) or info['start'] != blocks[0]:
+                        errors.append(f"{name}: a cadeia na FAT difere dos blocos do arquivo.")
+                chains.append(blocks)
+                if len(info['blocks']) != info['size']:
+                    errors.append(f"{name}: {len(info['blocks'])} blocos para tamanho {info['size']}.")
+                continue
+
+            if method == 'contiguous':
+                blocks = info['blocks']
+                data_count = len(blocks)
+            else: # indexado
+                try:
+                    meta, data = self._index_layout(info)
+                except (KeyError, IndexError, TypeError):
+                    errors.append(f"{name}: índice {info['index_block']} ausente ou corrompido na tabela de inodes.")
+                    continue
+                if info.get('index_mode', 'direct') == 'direct':
+                    if list(self.index_table.get(info['index_block'], ())) != list(data):
+                        errors.append(f"{name}: a tabela de inodes difere dos blocos de dados do arquivo.")
+                else:
+                    pointers = info['pointers_per_block']
+                    for index_block in meta:
+                        if len(self.index_table[index_block]) > pointers:
+                            errors.append(f"{name}: bloco de índice {index_block} com mais de {pointers} entradas.")
+                index_blocks.update(meta)
+                blocks = meta + data
+                data_count = len(data)
+            if data_count != info['size']:
+                errors.append(f"{name}: {data_count} blocos de dados para tamanho {info['size']}.")
+            if blocks and (min(blocks) < 0 or max(blocks) >= n):
+                errors.append(f"{name}: blocos fora do disco.")
+                continue
+            for block in blocks:
+                owner = expected[block]
+                if owner is None:
+                    expected[block] = name
+                else:
+                    cross_links.setdefault(block, [owner]).append(name)
+
+        # Donos reais contra os esperados: a comparação das listas inteiras é rápida quando batem
+        owners = self.blocks[:]
+        leaks = []
+        if owners != expected:
+            for block, (owner, name) in enumerate(zip(owners, expected)):
+                if owner == name:
+                    continue
+                if name is None:
+                    leaks.append(block)
+                elif block not in cross_links:
+                    state = "está livre" if owner is None else f"pertence a {owner}"
+                    errors.append(f"{name}: bloco {block} {state}.")
+        free = owners.count(None)
+        if free != self.free_count or free != self.blocks.count(None):
+            errors.append(f"Contagem de livres: {self.free_count} registrados, {free} no mapa de blocos.")
+
+        if self._fat_in_use() != links: # Só então procura quais entradas sobram
+            in_chains = {block for chain in chains for block in chain}
+            stale_fat = [(block, value) for block, value in self.fat_entries() if block not in in_chains]
+            if stale_fat:
+                errors.append(f"Entradas da FAT fora de qualquer cadeia: {stale_fat[:10]}")
+        stale_inodes = set(self.index_table) - index_blocks
+        if stale_inodes:
+            errors.append(f"Entradas da tabela de inodes sem arquivo: {sorted(stale_inodes)[:10]}")
+
+        return {
+            'ok': not (leaks or cross_links or cycles or errors),
+            'leaks': leaks,
+            'cross_links': cross_links,
+            'cycles': cycles,
+            'errors': errors,
+        }
+
+
+    def defragment(self, max_moves=None, time_limit=None):
+        """
+        Compacta os arquivos no começo do disco (ver Defragmenter), até terminar ou até
+        'max_moves' movimentos / 'time_limit' segundos. Retorna o relatório (Defragmenter.report).
+        """
+        defrag = Defragmenter(self)
+        defrag.step(max_moves, time_limit)
+        return defrag.report()
+
+
+    def _file_layout(self, info):
+        """Blocos de um arquivo na ordem em que devem ficar no disco (sem repetições)."""
+        if info['method'] == 'contiguous':
+            return list(info['blocks'])
+        if info['method'] == 'linked':
+            chain = []
+            block = info['start']
+            while block != -1:
+                chain.append(block)
+                block = int(self.fat[block])
+            return chain
+        return list(dict.fromkeys(self._read_order(info)))
+
+
+    def _defrag_plan(self, order=None):
+        """
+        Gera os movimentos (origem, destino) que compactam o disco. O destino de cada bloco é
+        sua posição com os arquivos empacotados a partir do bloco 0, na ordem do primeiro bloco
+        de cada um. 'order' ({nome -> posição na fila}) guarda essa ordem: preenchido no primeiro
+        plano, mantém os seguintes na mesma fila (um arquivo pela metade não troca de lugar com
+        o vizinho, o que moveria de novo tudo o que vem depois). Só os blocos fora do lugar se movem, e cada um uma vez só; exceção: num ciclo
+        (cada bloco esperando o lugar de outro) um deles passa por um bloco livre temporário.
+        Um arquivo com índice de extensões termina numa extensão só, com a raiz logo antes dos
+        dados: os demais blocos de índice dele vão para depois de todos os arquivos e são
+        liberados quando a árvore é remontada (ver _remap_files), sem abrir buracos.
+        """
+        if self.free_count == 0: # Sem espaço livre não há o que juntar
+            return
+        if order is None:
+            order = {}
+        units = {}  # {nome -> blocos na ordem em que devem ficar}
+        spares = [] # Blocos de índice de extensões que sobram com o arquivo numa extensão só
+        for name, info in self.files.items():
+            if info.get('index_mode') == 'extent':
+                index_blocks, data_blocks = self._index_layout(info)
+                units[name] = index_blocks[:1] + data_blocks
+                spares.extend(index_blocks[1:])
+            else:
+                units[name] = self._file_layout(info)
+        used = self.num_blocks - self.free_count
+        last = len(order) # Arquivos fora da fila vêm depois dela
+        keys = [(order.get(name, last), min(unit), name) for name, unit in units.items()]
+        units = list(units.values())
+        if sum(len(unit) for unit in units) + len(spares) != used:
+            # Blocos ocupados sem arquivo que os referencie: ficam juntos, por dono, como se fossem arquivos
+            listed = {block for unit in units for block in unit}
+            listed.update(spares)
+            orphans = {}
+            for block, owner in enumerate(self.blocks):
+                if owner is not None and block not in listed:
+                    orphans.setdefault(owner, []).append(block)
+            units.extend(orphans.values())
+            keys.extend((last, min(unit), None) for unit in orphans.values())
+        ranked = sorted(range(len(units)), key=keys.__getitem__)
+        units = [units[i] for i in ranked]
+        if not order:
+            order.update((keys[i][2], rank) for rank, i in enumerate(ranked) if keys[i][2] is not None)
+        if spares:
+            units.append(spares)
+
+        target = {} # Blocos fora do lugar: {posição atual -> destino}
+        position = 0
+        for unit in units:
+            for block in unit:
+                if block != position:
+                    target[block] = position
+                position += 1
+        wanted_by = {dst: src for src, dst in target.items()}
+
+        def follow(frees):
+            # Quem esperava uma posição liberada pode se mover para ela, e assim por diante. As
+            # posições livres são preenchidas da menor para a maior: cada arquivo chega ao destino
+            # em ordem, sem ser picado em muitos pedaços no meio do caminho (o que faria crescer
+            # os índices de extensões entre um passo e outro)
+            heap = [free for free in frees if free in wanted_by]
+            heapq.heapify(heap)
+            while heap:
+                free = heapq.heappop(heap)
+                src = wanted_by.pop(free)
+                del target[src]
+                yield src, free
+                if src in wanted_by:
+                    heapq.heappush(heap, src)
+
+        # Caminhos: blocos cujo destino está livre (não é a posição de outro bloco fora do lugar)
+        yield from follow([dst for dst in target.values() if dst not in target])
+        # Ciclos: sobram só blocos dentro da área compactada; o resto do disco está livre
+        while target:
+            src, dst = next(iter(target.items()))
+            temp = self.find_free_block(used)
+            yield src, temp
+            del target[src], wanted_by[dst]
+            yield from follow([src])
+            yield temp, dst
+
+
+    @_emits_event('defragment')
+    def _apply_moves(self, moves, max_moves=None, deadline=None, tail=None):
+        """
+        Aplica movimentos de bloco (ver _defrag_plan) e depois regrava os metadados dos arquivos
+        movidos. Retorna (movimentos feitos, situação): 'done' se 'moves' acabou, 'more' se
+        parou pelo limite, 'stale' se um movimento não vale mais (o disco mudou desde o plano).
+        Um índice de extensões é remontado sobre os próprios blocos de índice; se no limite as
+        extensões de algum arquivo não couberem neles, os blocos a mais vêm de depois de 'tail'
+        (o fim da área que o plano compacta), ou os movimentos continuam até caberem.
+        """
+        n = self.num_blocks
+        if tail is None:
+            tail = n - self.free_count
+        cursor = self.next_fit_cursor
+        moved_to = {}  # {posição original -> posição atual} dos blocos movidos
+        origin = {}    # {posição atual -> posição original}
+        owners = set()
+        moved, status = 0, 'done'
+        for src, dst in moves:
+            owner = self.blocks[src]
+            if owner is None or dst < 0 or self.blocks[dst] is not None:
+                status = 'stale'
+                break
+            self._release_blocks([src])
+            self._claim_blocks([dst], owner)
+            first = origin.pop(src, src)
+            moved_to[first] = dst
+            origin[dst] = first
+            owners.add(owner)
+            moved += 1
+            if ((max_moves is not None and moved >= max_moves) or (deadline is not None and time.perf_counter() >= deadline)) \
+                    and self._extent_shortfall(owners, moved_to) <= n - tail - self.used_blocks_in_range(tail, n):
+                status = 'more'
+                break
+        self._remap_files(owners, moved_to, tail)
+        self.next_fit_cursor = cursor
+        return moved, status
+
+
+    def _extent_shortfall(self, names, moved_to):
+        """Blocos de índice que faltariam aos arquivos de 'names' com índice de extensões depois dos movimentos."""
+        missing = 0
+        for name in names:
+            info = self.files.get(name)
+            if info is None or info.get('index_mode') != 'extent':
+                continue
+            index_blocks, data_blocks = self._index_layout(info)
+            runs = _runs([moved_to.get(block, block) for block in data_blocks])
+            missing += max(0, _extent_meta_count(len(runs), info['pointers_per_block']) - len(index_blocks))
+        return missing
+
+
+    def _remap_files(self, names, moved_to, tail):
+        """
+        Regrava FAT, inodes e metadados dos arquivos 'names' depois de mover blocos (ver
+        _apply_moves). Blocos de índice de extensões a mais saem de depois de 'tail'.
+        """
+        def where(block):
+            return moved_to.get(block, block)
+
+
+        chains = []
+        stale_inodes = []  # Entradas da tabela de inodes nas posições antigas
+        new_inodes = {}    # {posição nova -> entradas}
+        trees = []         # (nome, metadados) dos arquivos com índice em árvore
+        for name in names:
+            info = self.files.get(name)
+            if info is None: # Blocos órfãos: não há metadados a regravar
+                continue
+            if info['method'] == 'contiguous':
+                self._set_file(name, dict(info, blocks=_as_range([where(b) for b in info['blocks']])))
+            elif info['method'] == 'linked':
+                chain = self._file_layout(info)
+                chains.append((chain, [where(b) for b in chain]))
+                self._set_file(name, dict(info, start=where(info['start']),
+                                          blocks=self._block_list([where(b) for b in info['blocks']])))
+            elif info.get('index_mode', 'direct') == 'direct':
+                index_block = info['index_block']
+                data_blocks = self._block_list([where(b) for b in info['data_blocks']])
+                if index_block in self.index_table:
+                    stale_inodes.append(index_block)
+                    new_inodes[where(index_block)] = data_blocks
+                self._set_file(name, dict(info, index_block=where(index_block), data_blocks=data_blocks))
+            else:
+                # Índice em árvore: remontado sobre as novas posições dos mesmos blocos de índice
+                # (as extensões podem ter mudado; os blocos de índice que sobrarem são liberados)
+                index_blocks, data_blocks = self._index_layout(info)
+                mode, pointers = info['index_mode'], info['pointers_per_block']
+                blocks = [where(b) for b in (self._read_order(info) if mode == 'multilevel' else data_blocks)]
+                new_index = [where(b) for b in index_blocks]
+                if mode == 'extent':
+                    # Os que sobram são liberados do fim da lista: primeiro os de depois de 'tail',
+                    # que nenhum movimento do plano espera
+                    new_index[1:] = sorted(new_index[1:], key=lambda b: b >= tail)
+                    for _ in range(_extent_meta_count(len(_runs(blocks)), pointers) - len(new_index)):
+                        # Só num passo interrompido: o bloco vem de depois da área compactada,
+                        # que nenhum movimento do plano tem como destino
+                        block = self.find_free_block(tail)
+                        self._claim_blocks([block], name)
+                        new_index.append(block)
+                tables, new_info = self._build_index(name, mode, pointers, blocks, new_index, info['size'])
+                stale_inodes.extend(index_blocks)
+                new_inodes.update(tables)
+                trees.append((name, new_info))
+
+        # Primeiro limpa as entradas antigas, depois grava as novas: uma posição liberada por
+        # um arquivo pode ter sido ocupada por outro
+        for chain, new_chain in chains:
+            for old, new in zip(chain, new_chain):
+                if old != new:
+                    self._set_fat(old, 0)
+        for _, new_chain in chains:
+            for block, next_block in zip(new_chain, new_chain[1:] + [-1]):
+                if self.fat[block] != next_block:
+                    self._set_fat(block, next_block)
+        for old in stale_inodes:
+            if old not in new_inodes:
+                self._set_inode(old, None)
+        for new, entries in new_inodes.items():
+            if self.index_table.get(new) != entries:
+                self._set_inode(new, entries)
+        # Metadados dos índices em árvore por último: suas métricas são lidas da tabela de inodes
+        for name, new_info in trees:
+            self._set_file(name, new_info)
+
+
+class Defragmenter:
+    """
+    Desfragmentação incremental de um FileSystem: junta os arquivos no começo do disco, cada
+    um em blocos consecutivos e na ordem em que já estão, e deixa o espaço livre num único
+    trecho no fim. Cada step() faz uma parte dos movimentos; se o disco mudar entre dois
+    passos, o plano é refeito. Entre passos os metadados estão sempre corretos, mas um arquivo
+    ainda pela metade pode estar espalhado.
+    """
+    def __init__(self, fs):
+        self.fs = fs
+        self.moves = 0
+        self.largest_before = fs.largest_free_extent()
+        self.done = False
+        self._plan = None
+        self._order = {}    # Fila dos arquivos no disco compactado (ver FileSystem._defrag_plan)
+        self._tail = 0      # Fim da área que o plano atual compacta
+        self._fresh = False # O plano atual ainda não fez nenhum movimento
+
+
+    def step(self, max_moves=None, time_limit=None):
+        """Faz até 'max_moves' movimentos ou até 'time_limit' segundos; retorna True ao terminar."""
+        deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        budget = max_moves
+        while not self.done:
+            if self._plan is None:
+                self._plan = self.fs._defrag_plan(self._order)
+                self._tail = self.fs.num_blocks - self.fs.free_count
+                self._fresh = True
+            moved, status = self.fs._apply_moves(self._plan, budget, deadline, self._tail)
+            self.moves += moved
+            if status == 'more':
+                self._fresh = self._fresh and not moved
+                return False
+            if status == 'stale' and self._fresh and not moved:
+                raise RuntimeError("Não foi possível desfragmentar: metadados inconsistentes com os blocos.")
+            if status == 'done' and self._fresh and not moved:
+                self.done = True # Um plano novo sem nada a mover: o disco está compactado
+            self._plan = None # Acabou ou ficou velho: refaz a partir do estado atual
+            if budget is not None:
+                budget -= moved
+                if budget <= 0:
+                    return self.done
+        return True
+
+
+    def report(self):
+        """Movimentos feitos e o crescimento do maior trecho livre até agora."""
+        largest = self.fs.largest_free_extent()
+        return {
+            'moves': self.moves,
+            'largest_before': self.largest_before,
+            'largest_after': largest,
+            'growth': largest - self.largest_before,
+            'done': self.done,
+        }
+
+
+class NumpyFileSystem(FileSystem):
+    """
+    Motor NumPy do FileSystem: ocupação e FAT em arrays int32, com as buscas por blocos
+    livres feitas por operações vetorizadas sobre os arrays (sem índice mantido à parte).
+    Mesma API de alocação/deleção do FileSystem.
+    """
+    def __init__(self, num_blocks, policy='first_fit'):
+        if not _load_numpy():
+            raise RuntimeError("O motor 'numpy' requer o pacote numpy instalado.")
+        super().__init__(num_blocks, policy)
+
+
+    def _init_block_state(self, compact):
+        self.blocks = NumpyBlockMap(self.num_blocks)
+        self.fat = np.zeros(self.num_blocks, dtype=np.int32)
+        self.free_count = self.num_blocks
+        self.free_extents = None # As buscas varrem os arrays diretamente
+
+
+    def set_policy(self, policy):
+        if policy == 'buddy':
+            raise ValueError("O motor 'numpy' não suporta a política buddy.")
+        super().set_policy(policy)
+
+
+    def _mark_used(self, block_list, file_name):
+        self.blocks.assign(block_list, file_name)
+
+
+    def _mark_free(self, block_list):
+        return self.blocks.assign(block_list, None).tolist()
+
+
+    def _free_runs(self):
+        """Extensões livres como arrays (inícios, tamanhos), achadas com diff sobre a máscara de livres."""
+        free = (self.blocks.owner_ids == 0).view(np.int8)
+        edges = np.diff(np.concatenate(([0], free, [0])))
+        starts = np.flatnonzero(edges == 1)
+        return starts, np.flatnonzero(edges == -1) - starts
+
+
+    def find_free_blocks_contiguous(self, size):
+        starts, lengths = self._free_runs()
+        fits = lengths >= size
+        if not fits.any():
+            return None
+        if self.policy == 'best_fit':
+            i = np.argmin(np.where(fits, lengths, self.num_blocks + 1))
+        elif self.policy == 'worst_fit':
+            i = len(lengths) - 1 - np.argmax(lengths[::-1]) # Última das maiores, como no FreeExtentIndex
+        elif self.policy == 'next_fit':
+            later = fits & (starts >= self.next_fit_cursor)
+            i = np.argmax(later) if later.any() else np.argmax(fits)
+        else:
+            i = np.argmax(fits)
+        start_index = int(starts[i])
+        return range(start_index, start_index + size)
+
+
+    def find_free_block(self, start_from=0):
+        if start_from >= self.num_blocks:
+            start_from = 0
+        free = self.blocks.owner_ids == 0
+        i = start_from + int(np.argmax(free[start_from:]))
+        if free[i]:
+            return i
+        i = int(np.argmax(free[:start_from])) if start_from else 0 # Tenta do início
+        return i if free[i] else -1
+
+
+    def find_free_blocks(self, count):
+        if self.policy in ('first_fit', 'next_fit'):
+            free = np.flatnonzero(self.blocks.owner_ids == 0)
+            if self.policy == 'next_fit':
+                k = np.searchsorted(free, self.next_fit_cursor)
+                free = np.concatenate((free[k:], free[:k]))
+            return free[:count].tolist()
+        starts, lengths = self._free_runs()
+        if self.policy == 'best_fit':
+            fits = lengths >= count
+            if fits.any():
+                start = int(starts[np.argmin(np.where(fits, lengths, self.num_blocks + 1))])
+                return list(range(start, start + count))
+            order = np.argsort(lengths, kind='stable')
+        else:
+            order = np.argsort(lengths, kind='stable')[::-1]
+        return _take_blocks(zip(starts[order].tolist(), lengths[order].tolist()), count)
+
+
+    def fat_entries(self):
+        idx = np.flatnonzero(self.fat)
+        return list(zip(idx.tolist(), self.fat[idx].tolist()))
+
+
+    def _fat_in_use(self):
+        return int(np.count_nonzero(self.fat))
+
+
+    def largest_free_extent(self):
+        lengths = self._free_runs()[1]
+        return int(lengths.max()) if lengths.size else 0
+
+
+    def free_extent_histogram(self):
+        lengths = self._free_runs()[1]
+        classes = np.frexp(lengths)[1] - 1 # bit_length - 1, exato para inteiros
+        return np.bincount(classes, minlength=max(1, self.num_blocks.bit_length())).tolist()
+
+
+class MappedFileSystem(FileSystem):
+    """
+    FileSystem compacto aberto de uma imagem gravada por save_image. O bitmap, os ids de
+    dono, a FAT e o resumo de ocupação são memoryviews sobre um mmap em cópia-na-escrita:
+    abrir é imediato e as páginas só são lidas quando usadas. Mudanças ficam na memória
+    (o arquivo não é alterado); para guardá-las, grave outra imagem.
+    """
+    def __init__(self, path, policy=None):
+        with open(path, 'rb') as f:
+            self.image = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        if len(self.image) < IMAGE_HEADER.size:
+            raise ValueError(f"{path} não é uma imagem de disco.")
+        magic, num_blocks, free_count, num_extents, num_words, meta_length = IMAGE_HEADER.unpack_from(self.image)
+        if magic != IMAGE_MAGIC:
+            raise ValueError(f"{path} não é uma imagem de disco.")
+        if sys.byteorder != 'little':
+            raise RuntimeError("Imagens de disco só podem ser abertas em máquinas little-endian.")
+        self.layout = _image_layout(num_blocks, num_extents, num_words)
+        meta_start = self.layout['meta']
+        meta = json.loads(self.image[meta_start:meta_start + meta_length])
+        self._loaded = (meta, free_count, num_extents)
+        super().__init__(num_blocks, policy or meta['policy'], compact=True)
+        del self._loaded
+
+        self.usage_summary = self._section('summary', 4 * ((num_blocks >> SUMMARY_SHIFT) + 1)).cast('I')
+        lists = self._section('lists', 4 * num_words)
+        words = lists.cast('I')
+        self.files = meta['files']
+        self.index_table = {}
+        for info in self.files.values(): # Listas de blocos: cópia direta de fatias da seção (ver save_image)
+            for key in ('blocks', 'data_blocks'):
+                if key in info:
+                    info[key] = _unpack_blocks(info[key], lists, info['method'] == 'contiguous')
+            if info['method'] == 'indexed' and info.get('index_mode', 'direct') == 'direct':
+                self.index_table[info['index_block']] = info['data_blocks'] # A mesma lista, como em allocate_indexed
+        offset, count = meta['inodes']
+        directory = words[offset:offset + 4 * count].tolist()
+        for i in range(0, len(directory), 4): # Entradas dos índices em árvore: (bloco, início, tamanho, pares?)
+            block, start, length, pairs = directory[i:i + 4]
+            entries = words[start:start + length].tolist()
+            self.index_table[block] = [entries[j:j + 2] for j in range(0, length, 2)] if pairs else entries
+        self.file_metrics = {name: tuple(values) for name, values in meta['file_metrics'].items()}
+        self.total_fragments = sum(values[0] for values in self.file_metrics.values())
+        self.total_hops = sum(values[1] for values in self.file_metrics.values())
+        self.total_seek = sum(values[2] for values in self.file_metrics.values())
+        self.next_fit_cursor = meta['next_fit_cursor']
+        self.set_index_mode(meta.get('index_mode', 'direct'), meta.get('pointers_per_block'))
+
+
+    def _section(self, name, size):
+        """Os 'size' bytes de uma seção da imagem, como memoryview (sem copiar)."""
+        start = self.layout[name]
+        return memoryview(self.image)[start:start + size]
+
+
+    def _init_block_state(self, compact):
+        meta, free_count, num_extents = self._loaded
+        num_blocks = self.num_blocks
+        self.blocks = BlockMap(num_blocks, self._section('bitmap', (num_blocks + 7) // 8),
+                               self._section('owners', 4 * num_blocks).cast('I'))
+        self.blocks.load_names(meta['names'], meta['refs'])
+        self.fat = self._section('fat', 4 * num_blocks).cast('i')
+        self.free_count = free_count
+        extents = self._section('extents', 8 * num_extents).cast('I').tolist()
+        self.free_extents = FreeExtentIndex(num_blocks, list(zip(extents[0::2], extents[1::2])))
+
+
+def _image_layout(num_blocks, num_extents, num_words):
+    """Início de cada seção da imagem: {nome -> deslocamento em bytes}, alinhados a IMAGE_ALIGN."""
+    sizes = (
+        ('bitmap', (num_blocks + 7) // 8),                     # 1 bit de ocupação por bloco
+        ('owners', 4 * num_blocks),                            # id de dono (uint32) por bloco
+        ('fat', 4 * num_blocks),                               # entrada da FAT (int32) por bloco
+        ('summary', 4 * ((num_blocks >> SUMMARY_SHIFT) + 1)),  # resumo de ocupação (uint32)
+        ('extents', 8 * num_extents),                          # pares (início, tamanho) livres (uint32)
+        ('lists', 4 * num_words),                              # listas de blocos e entradas de índices (uint32)
+        ('meta', 0),                                           # JSON: nomes, arquivos, política
+    )
+    layout = {}
+    offset = IMAGE_HEADER.size
+    for name, size in sizes:
+        offset = -(-offset // IMAGE_ALIGN) * IMAGE_ALIGN
+        layout[name] = offset
+        offset += size
+    return layout
+
+
+def _pack_blocks(blocks, lists):
+    """Registro de uma lista de blocos na imagem: {'range': [início, fim]} ou {'at': [posição, tamanho]} em 'lists'."""
+    if isinstance(blocks, range):
+        return {'range': [blocks.start, blocks.stop]}
+    lists.extend(blocks)
+    return {'at': [len(lists) - len(blocks), len(blocks)]}
+
+
+def _unpack_blocks(record, lists, contiguous):
+    """Lista de blocos de um registro gravado por _pack_blocks, copiada dos bytes da seção 'lists' (memoryview)."""
+    if 'range' in record:
+        return range(*record['range'])
+    start, length = record['at']
+    blocks = array('I')
+    blocks.frombytes(lists[4 * start:4 * (start + length)])
+    return _as_range(blocks) if contiguous else blocks
+
+
+def save_image(fs, path):
+    """
+    Grava o disco simulado inteiro (de qualquer motor) numa imagem binária, aberta por
+    load_image. Grava num arquivo temporário e depois o renomeia, para poder sobrescrever
+    a imagem de onde o próprio 'fs' foi aberto.
+    """
+    if sys.byteorder != 'little':
+        raise RuntimeError("Imagens de disco só podem ser gravadas em máquinas little-endian.")
+    blocks = fs.blocks
+    if isinstance(blocks, BlockMap):
+        names, refs, owners = blocks.names, blocks.refs, blocks.owner_ids
+    else: # Lista de nomes (motor 'python'): monta a tabela de ids
+        names, refs, ids = [None], [0], {}
+        owners = array('I', [0]) * fs.num_blocks
+        for i, file_name in enumerate(blocks):
+            if file_name is not None:
+                owner = ids.get(file_name)
+                if owner is None:
+                    owner = ids[file_name] = len(names)
+                    names.append(file_name)
+                    refs.append(0)
+                owners[i] = owner
+                refs[owner] += 1
+
+    bitmap = getattr(blocks, 'bitmap', None)
+    if bitmap is None and np is not None and isinstance(owners, np.ndarray):
+        bitmap = np.packbits(owners != 0, bitorder='little')
+    elif bitmap is None:
+        bitmap = bytearray((fs.num_blocks + 7) // 8)
+        for i, owner in enumerate(owners):
+            if owner:
+                bitmap[i >> 3] |= 1 << (i & 7)
+
+    fat = array('i', fs.fat) if isinstance(fs.fat, list) else fs.fat
+    if fs.free_extents is not None:
+        free_extents = [(start, fs.free_extents.lengths[start]) for start in fs.free_extents.starts]
+    else:
+        free_extents = list(zip(*(a.tolist() for a in fs._free_runs())))
+    extents = array('I', [value for extent in free_extents for value in extent])
+
+    # Listas de blocos e entradas dos índices em árvore vão em binário para a seção 'lists'; os
+    # metadados de cada arquivo só guardam onde está a sua (ou o intervalo, se for contíguo)
+    lists = array('I')
+    files = {}
+    direct = set()
+    for name, info in fs.files.items():
+        record = dict(info)
+        for key in ('blocks', 'data_blocks'):
+            if key in info:
+                record[key] = _pack_blocks(info[key], lists)
+        if info['method'] == 'indexed' and info.get('index_mode', 'direct') == 'direct':
+            direct.add(info['index_block']) # A entrada é a própria lista de dados do arquivo
+        files[name] = record
+    directory = array('I')
+    for block, entries in fs.index_table.items():
+        if block in direct:
+            continue
+        pairs = bool(entries) and not isinstance(entries[0], int)
+        start = len(lists)
+        lists.extend([value for entry in entries for value in entry] if pairs else entries)
+        directory.extend((block, start, len(lists) - start, pairs))
+    inodes = [len(lists), len(directory) // 4]
+    lists.extend(directory)
+
+    meta = json.dumps({
+        'names': names, 'refs': list(refs), 'files': files, 'file_metrics': fs.file_metrics, 'inodes': inodes,
+        'policy': fs.policy, 'next_fit_cursor': fs.next_fit_cursor,
+        'index_mode': fs.index_mode, 'pointers_per_block': fs.pointers_per_block,
+    }, default=int).encode('utf-8')
+
+    layout = _image_layout(fs.num_blocks, len(free_extents), len(lists))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(IMAGE_HEADER.pack(IMAGE_MAGIC, fs.num_blocks, fs.free_count, len(free_extents), len(lists), len(meta)))
+        for name, data in (('bitmap', bitmap), ('owners', owners), ('fat', fat), ('summary', fs.usage_summary),
+                           ('extents', extents), ('lists', lists), ('meta', meta)):
+            f.seek(layout[name])
+            f.write(data)
+    os.replace(tmp_path, path)
+
+
+def load_image(path, policy=None):
+    """Abre uma imagem gravada por save_image (ver MappedFileSystem); 'policy' None = a da imagem."""
+    return MappedFileSystem(path, policy)
+
+
+def create_file_system(num_blocks, engine='python', policy='first_fit'):
+    """Cria o FileSystem do motor pedido (ver ENGINES)."""
+    if engine == 'numpy':
+        return NumpyFileSystem(num_blocks, policy)
+    if engine in ('python', 'compact'):
+        return FileSystem(num_blocks, policy, compact=(engine == 'compact'))
+    raise ValueError(f"Motor desconhecido: {engine}")
+
+
+# --- Grupos de alocação ---
+
+
+class AllocationGroup:
+    """Um grupo de alocação: os blocos [base, base + FileSystem.num_blocks) do disco, com seu próprio lock."""
+    def __init__(self, number, base, fs):
+        self.number = number
+        self.base = base
+        self.fs = fs
+        self.lock = threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0 # Aquisições que encontraram o lock ocupado por outra thread
+
+
+    def acquire(self):
+        if not self.lock.acquire(blocking=False):
+            self.lock.acquire()
+            self.contended += 1
+        self.acquisitions += 1
+
+
+    def release(self):
+        self.lock.release()
+
+
+class GroupedFileSystem:
+    """
+    Disco dividido em grupos de alocação, como os block groups do ext4 e os allocation
+    groups do XFS: cada grupo é um FileSystem independente (com seu índice de espaço livre,
+    FAT e tabela de inodes) protegido pelo seu próprio lock, de modo que threads mexendo em
+    grupos diferentes não disputam nada. Só o diretório (nome -> grupo) é global, com um lock
+    que é segurado por pouquíssimo tempo. Um arquivo vai para o grupo preferido (o pedido
+    em 'group', ou um derivado do nome) e, se não couber, para os seguintes; ele nunca se
+    espalha por mais de um grupo. Os números de bloco da API são globais.
+    Todos os métodos públicos podem ser chamados de várias threads ao mesmo tempo.
+    """
+    def __init__(self, num_blocks, groups=8, engine='python', policy='first_fit'):
+        if not 1 <= groups <= num_blocks:
+            raise ValueError(f"Número de grupos inválido: {groups}")
+        self.num_blocks = num_blocks
+        self.groups = []
+        base = 0
+        for number in range(groups):
+            size = num_blocks // groups + (1 if number < num_blocks % groups else 0)
+            self.groups.append(AllocationGroup(number, base, create_file_system(size, engine, policy)))
+            base += size
+        self._directory = {} # Nome -> número do grupo (None enquanto a criação está em andamento)
+        self._directory_lock = threading.Lock()
+
+
+    def preferred_group(self, file_name):
+        """Grupo preferido de um arquivo sem grupo pedido: um hash estável do nome."""
+        return zlib.crc32(file_name.encode('utf-8')) % len(self.groups)
+
+
+    def _group_of(self, file_name):
+        with self._directory_lock:
+            number = self._directory.get(file_name)
+        return None if number is None else self.groups[number]
+
+
+    def allocate(self, method, file_name, file_size, group=None):
+        """
+        Aloca o arquivo no grupo 'group' (ou no preferido pelo nome) ou, se não couber,
+        no primeiro grupo seguinte que o comporte. Retorna (sucesso, mensagem).
+        """
+        with self._directory_lock:
+            if file_name in self._directory:
+                return False, "Nome de arquivo já existe."
+            self._directory[file_name] = None # Reserva o nome enquanto os grupos são tentados
+        start = self.preferred_group(file_name) if group is None else group % len(self.groups)
+        result = (False, OutOfSpace("Espaço insuficiente no disco."))
+        for k in range(len(self.groups)):
+            ag = self.groups[(start + k) % len(self.groups)]
+            ag.acquire()
+            try:
+                result = ag.fs.allocate(method, file_name, file_size)
+            finally:
+                ag.release()
+            if result[0]:
+                with self._directory_lock:
+                    self._directory[file_name] = ag.number
+                return result
+            if not isinstance(result[1], OutOfSpace): # Erro que outro grupo não resolve (ex.: tamanho inválido)
+                break
+        with self._directory_lock:
+            del self._directory[file_name]
+        return result
+
+
+    def delete_file(self, file_name):
+        with self._directory_lock:
+            number = self._directory.get(file_name)
+            if number is None:
+                return False, "Arquivo não encontrado."
+            del self._directory[file_name]
+        ag = self.groups[number]
+        ag.acquire()
+        try:
+            return ag.fs.delete_file(file_name)
+        finally:
+            ag.release()
+
+
+    def _in_group(self, file_name, operation, *args):
+        """Roda fs.operation(file_name, *args) no grupo do arquivo, com o lock do grupo."""
+        ag = self._group_of(file_name)
+        if ag is None:
+            return False, "Arquivo não encontrado."
+        ag.acquire()
+        try:
+            return getattr(ag.fs, operation)(file_name, *args)
+        finally:
+            ag.release()
+
+
+    def extend(self, file_name, count):
+        """Estende o arquivo dentro do seu grupo (ver FileSystem.extend)."""
+        return self._in_group(file_name, 'extend', count)
+
+
+    def truncate(self, file_name, size):
+        return self._in_group(file_name, 'truncate', size)
+
+
+    def file_group(self, file_name):
+        """Número do grupo do arquivo, ou None."""
+        ag = self._group_of(file_name)
+        return None if ag is None else ag.number
+
+
+    def file_blocks(self, file_name):
+        """Blocos do arquivo, em ordem, com números globais."""
+        ag = self._group_of(file_name)
+        if ag is None:
+            raise KeyError(file_name)
+        ag.acquire()
+        try:
+            return [ag.base + block for block in ag.fs.file_blocks(file_name)]
+        finally:
+            ag.release()
+
+
+    def file_names(self):
+        with self._directory_lock:
+            return [name for name, number in self._directory.items() if number is not None]
+
+
+    def get_free_blocks_count(self):
+        """Blocos livres somando os grupos (cada grupo é lido sob o seu lock)."""
+        return sum(self._locked(ag, ag.fs.get_free_blocks_count) for ag in self.groups)
+
+
+    def set_index_mode(self, mode, pointers_per_block=None):
+        for ag in self.groups:
+            self._locked(ag, ag.fs.set_index_mode, mode, pointers_per_block)
+
+
+    @staticmethod
+    def _locked(ag, func, *args):
+        ag.acquire()
+        try:
+            return func(*args)
+        finally:
+            ag.release()
+
+
+    def lock_stats(self):
+        """[(aquisições, aquisições disputadas)] de cada grupo."""
+        return [(ag.acquisitions, ag.contended) for ag in self.groups]
+
+
+    def check(self):
+        """
+        FileSystem.check() de cada grupo, com os blocos em números globais, mais a conferência
+        do diretório contra os arquivos dos grupos. Mesmo formato de FileSystem.check().
+        """
+        leaks, cross_links, cycles, errors = [], {}, [], []
+        with self._directory_lock:
+            directory = dict(self._directory)
+        for ag in self.groups:
+            report = self._locked(ag, ag.fs.check)
+            leaks.extend(ag.base + block for block in report['leaks'])
+            cross_links.update((ag.base + block, names) for block, names in report['cross_links'].items())
+            cycles.extend(report['cycles'])
+            errors.extend(f"Grupo {ag.number}: {error}" for error in report['errors'])
+            for name in ag.fs.files:
+                number = directory.get(name)
+                if number != ag.number:
+                    where = "nenhum grupo" if number is None else f"o grupo {number}"
+                    errors.append(f"{name}: está no grupo {ag.number}, mas o diretório aponta {where}.")
+        for name, number in directory.items():
+            if number is not None and name not in self.groups[number].fs.files:
+                errors.append(f"{name}: o diretório aponta o grupo {number}, que não tem o arquivo.")
+        return {'ok': not (leaks or cross_links or cycles or errors), 'leaks': leaks, 'cross_links': cross_links,
+                'cycles': cycles, 'errors': errors}
+
+
+# --- Modelo de custo de E/S ---
+
+
+class IOCostModel:
+    """
+    Custo simulado de ler arquivos do disco, em milissegundos. Cada bloco lido fora de
+    sequência paga um seek (fixo + proporcional à distância percorrida pela cabeça) e meia
+    rotação em média; todo bloco lido do disco paga a transferência. Com cache_blocks > 0,
+    um cache LRU de blocos evita reler do disco o que foi lido há pouco.
+    """
+    def __init__(self, seek_ms=4.0, seek_per_block_ms=0.0005, rotation_ms=4.17, transfer_ms=0.04,
+                 cache_blocks=0, block_bytes=4096):
+        self.seek_ms = seek_ms
+        self.seek_per_block_ms = seek_per_block_ms
+        self.rotation_ms = rotation_ms
+        self.transfer_ms = transfer_ms
+        self.cache_blocks = cache_blocks
+        self.block_bytes = block_bytes
+        self.reset()
+
+
+    def reset(self):
+        """Esvazia o cache e esquece a posição da cabeça de leitura."""
+        self.cache = OrderedDict()
+        self.head = None
+
+
+    def read_blocks(self, blocks):
+        """Lê os blocos na ordem dada; retorna {'ms', 'seeks', 'hits', 'blocks'}."""
+        ms = 0.0
+        seeks = hits = 0
+        cache = self.cache
+        for block in blocks:
+            if self.cache_blocks:
+                if block in cache:
+                    cache.move_to_end(block)
+                    hits += 1
+                    continue
+                cache[block] = None
+                if len(cache) > self.cache_blocks:
+                    cache.popitem(last=False)
+            if self.head is None or block != self.head + 1: # Fora de sequência: seek + rotação
+                distance = abs(block - self.head) if self.head is not None else 0
+                ms += self.seek_ms + self.seek_per_block_ms * distance + self.rotation_ms
+                seeks += 1
+            ms += self.transfer_ms
+            self.head = block
+        return {'ms': ms, 'seeks': seeks, 'hits': hits, 'blocks': len(blocks)}
+
+
+    def read_order(self, fs, info):
+        """Blocos que a leitura de um arquivo percorre: a cadeia da FAT, ou cada índice antes dos seus dados."""
+        if info['method'] == 'linked':
+            return fs._file_layout(info)
+        return list(fs._read_order(info))
+
+
+    def read_file(self, fs, file_name):
+        """Latência e vazão simuladas de ler o arquivo inteiro, em sequência."""
+        info = fs.files[file_name]
+        result = self.read_blocks(self.read_order(fs, info))
+        result.update(file=file_name, method=info['method'], size=info['size'],
+                      mb_per_sec=self._throughput(info['size'], result['ms']))
+        return result
+
+
+    def read_block(self, fs, file_name, k):
+        """
+        Latência simulada de ler só o k-ésimo bloco de um arquivo: paga cada nível de indireção
+        do índice antes do bloco em si (a FAT da alocação encadeada fica na memória).
+        """
+        path = fs.block_path(file_name, k)
+        result = self.read_blocks(path)
+        result.update(file=file_name, block=k, depth=len(path) - 1)
+        return result
+
+
+    def read_all(self, fs, names=None):
+        """
+        Lê os arquivos 'names' (None = todos, em ordem de nome), um depois do outro e com o
+        mesmo cache. Retorna {'files': resultado de cada um, 'total': soma, 'by_method': somas por método}.
+        """
+        files = [self.read_file(fs, name) for name in (sorted(fs.files) if names is None else names)]
+        groups = {'total': files}
+        for result in files:
+            groups.setdefault(result['method'], []).append(result)
+        summary = {}
+        for group, results in groups.items():
+            ms = sum(r['ms'] for r in results)
+            size = sum(r['size'] for r in results)
+            summary[group] = {
+                'files': len(results), 'size': size, 'ms': ms,
+                'seeks': sum(r['seeks'] for r in results), 'hits': sum(r['hits'] for r in results),
+                'ms_per_file': ms / len(results), 'mb_per_sec': self._throughput(size, ms),
+            }
+        return {
+            'files': files,
+            'total': summary.pop('total', None),
+            'by_method': summary,
+        }
+
+
+    def _throughput(self, size, ms):
+        return size * self.block_bytes / 1e6 / (ms / 1000) if ms else 0.0
+
+
+# --- Instrumentação dos caminhos quentes ---
+
+
+# Métodos medidos por padrão (padrões de fnmatch sobre os nomes dos métodos)
+PROFILED_FS_METHODS = ('allocate*', 'delete_file', 'extend', 'truncate', 'find_free_block*', 'file_blocks',
+                       'block_at')
+
+
+class LatencyHistogram:
+    """
+    Durações das chamadas de um método: número, soma e máximo exatos, mais um histograma de
+    baldes logarítmicos para os percentis. Cada oitava (de ~1 ns a ~2 min) tem 8 baldes, então
+    um percentil sai com erro de no máximo 12,5%. As durações novas ficam num buffer de até
+    FLUSH valores, despejado de uma vez no histograma (ordenado, com uma busca por balde): a
+    gravação custa um append e a memória não cresce com as chamadas.
+    """
+    LOW = -30     # Expoente (base 2) do começo do primeiro balde: 2^-30 s ~ 1 ns
+    HIGH = 7      # Expoente do fim do último: 2^7 s = 128 s
+    STEPS = 8     # Baldes por oitava
+    FLUSH = 4096  # Durações guardadas antes de irem para o histograma
+
+    def __init__(self):
+        # Fim de cada balde; o primeiro também recebe o que for menor, o último o que for maior
+        self.edges = [(1 + (step + 1) / self.STEPS) * 2.0 ** (exponent - 1)
+                      for exponent in range(self.LOW, self.HIGH) for step in range(self.STEPS)]
+        self.buckets = [0] * len(self.edges)
+        self.pending = array('d')
+        self._lock = threading.Lock() # A interface lê as medições enquanto o worker grava
+        self.clear()
+
+
+    def clear(self):
+        with self._lock:
+            del self.pending[:]
+            self.count = 0
+            self.total = 0.0
+            self.max = 0.0
+            self.buckets[:] = [0] * len(self.buckets)
+
+
+    def add(self, duration):
+        self.pending.append(duration)
+        if len(self.pending) >= self.FLUSH:
+            self.flush()
+
+
+    def flush(self):
+        """Despeja o buffer no histograma."""
+        with self._lock:
+            n = len(self.pending)
+            if not n:
+                return
+            values = sorted(self.pending[:n])
+            del self.pending[:n]
+            self.count += n
+            self.total += sum(values)
+            self.max = max(self.max, values[-1])
+            buckets = self.buckets
+            start = 0
+            for i, edge in enumerate(self.edges):
+                end = bisect_left(values, edge, start)
+                buckets[i] += end - start
+                start = end
+                if start == n:
+                    return
+            buckets[-1] += n - start
+
+
+    def percentile(self, q):
+        """Duração no quantil 'q' (0 a 1): o fim do balde onde ela cai, limitado ao máximo visto."""
+        self.flush()
+        if not self.count:
+            return 0.0
+        rank = min(self.count - 1, int(q * self.count))
+        seen = 0
+        for n, edge in zip(self.buckets, self.edges):
+            seen += n
+            if seen > rank:
+                return min(self.max, edge)
+        return self.max
+
+
+class Profiler:
+    """
+    Conta chamadas e mede o tempo (inclusivo: conta o das chamadas internas) de métodos
+    escolhidos de objetos observados, como o FileSystem e a App. Ligado, troca esses
+    métodos, só na instância, por versões cronometradas; desligado, remove-as, e as
+    chamadas voltam a ir direto aos métodos da classe, sem custo nenhum.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.timings = {}  # 'Classe.método' -> LatencyHistogram das chamadas
+        self._watched = [] # [(objeto, padrões, nomes trocados na instância)]
+
+
+    def watch(self, obj, patterns):
+        """Passa a medir os métodos de 'obj' cujos nomes casam com 'patterns'."""
+        entry = (obj, patterns, [])
+        self._watched.append(entry)
+        if self.enabled:
+            self._wrap(entry)
+
+
+    def unwatch(self, obj):
+        """Para de medir 'obj' (as medições já feitas continuam em timings)."""
+        for entry in [entry for entry in self._watched if entry[0] is obj]:
+            self._unwrap(entry)
+            self._watched.remove(entry)
+
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            for entry in self._watched:
+                self._wrap(entry)
+
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            for entry in self._watched:
+                self._unwrap(entry)
+
+
+    def reset(self):
+        """Zera as medições (os métodos trocados continuam gravando nos mesmos histogramas)."""
+        for timing in self.timings.values():
+            timing.clear()
+
+
+    def _wrap(self, entry):
+        obj, patterns, names = entry
+        cls = type(obj)
+        for name in dir(cls):
+            if callable(getattr(cls, name, None)) and any(fnmatch.fnmatchcase(name, p) for p in patterns):
+                label = f"{cls.__name__}.{name}"
+                setattr(obj, name, self._timed(getattr(obj, name), self.timings.setdefault(label, LatencyHistogram())))
+                names.append(name)
+
+
+    @staticmethod
+    def _unwrap(entry):
+        obj, _, names = entry
+        for name in names:
+            obj.__dict__.pop(name, None)
+        names.clear()
+
+
+    @staticmethod
+    def _timed(func, timing):
+        clock = time.perf_counter
+        pending = timing.pending
+        record = pending.append
+        flush = timing.flush
+        limit = timing.FLUSH
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            t0 = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(clock() - t0)
+                if len(pending) >= limit:
+                    flush()
+        return timed
+
+
+    def stats(self):
+        """
+        {'Classe.método': {'calls', 'total_ms', 'mean_us', 'p50_us', 'p99_us', 'max_us'}}
+        dos métodos chamados ao menos uma vez, do maior tempo total para o menor. Os percentis
+        vêm dos histogramas (ver LatencyHistogram); o custo não depende do número de chamadas.
+        """
+        rows = []
+        for label, timing in self.timings.items():
+            timing.flush()
+            if not timing.count:
+                continue
+            total = timing.total
+            rows.append((total, label, {
+                'calls': timing.count,
+                'total_ms': total * 1e3,
+                'mean_us': total / timing.count * 1e6,
+                'p50_us': timing.percentile(0.50) * 1e6,
+                'p99_us': timing.percentile(0.99) * 1e6,
+                'max_us': timing.max * 1e6,
+            }))
+        rows.sort(key=lambda row: (-row[0], row[1]))
+        return {label: row for _, label, row in rows}
+
+
+    def export_json(self, path):
+        """Grava stats() num arquivo JSON."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.stats(), f, indent=2)
+
+
+def format_profile(stats):
+    """Monta a tabela de Profiler.stats() em texto."""
+    width = max([6] + [len(label) for label in stats])
+    lines = [f"{'método':<{width}} {'chamadas':>9} {'total (ms)':>11} {'média (us)':>11} {'p50 (us)':>9} "
+             f"{'p99 (us)':>9} {'máx (us)':>10}"]
+    for label, row in stats.items():
+        lines.append(f"{label:<{width}} {row['calls']:>9} {row['total_ms']:>11.2f} {row['mean_us']:>11.2f} "
+                     f"{row['p50_us']:>9.2f} {row['p99_us']:>9.2f} {row['max_us']:>10.2f}")
+    return "\n".join(lines)
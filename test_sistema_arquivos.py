@@ -0,0 +1,187 @@
+"""
+Testes aleatórios do núcleo (rode com 'python -m pytest'): sequências de criações, deleções,
+extensões, truncamentos, lotes, snapshots e desfragmentações em cada motor e formato de
+índice, conferindo a cada passo o fsck, as métricas contra um recálculo do zero e o número
+de movimentos da desfragmentação.
+"""
+import random
+from array import array
+
+import pytest
+
+import sistema_arquivos as sa
+
+
+NUM_BLOCKS = 512
+STEPS = 300
+
+ENGINE_NAMES = ('python', 'compact', 'numpy', 'mapped')
+
+
+def make_fs(engine, tmp_path):
+    """FileSystem vazio do motor pedido; 'mapped' é um disco novo gravado e reaberto como imagem."""
+    if engine == 'numpy':
+        pytest.importorskip("numpy")
+    if engine == 'mapped':
+        path = tmp_path / "disco.img"
+        sa.save_image(sa.create_file_system(NUM_BLOCKS, 'compact'), str(path))
+        return sa.load_image(str(path))
+    return sa.create_file_system(NUM_BLOCKS, engine)
+
+
+def _plain(value):
+    if isinstance(value, (range, array)):
+        return list(value)
+    return value
+
+
+def state(fs):
+    """Estado comparável do disco (listas de blocos normalizadas: range/array viram list)."""
+    return (
+        list(fs.blocks),
+        [int(x) for x in fs.fat],
+        fs.free_count,
+        {name: {k: _plain(v) for k, v in info.items()} for name, info in fs.files.items()},
+        {block: [_plain(e) for e in entries] for block, entries in fs.index_table.items()},
+    )
+
+
+def read_order(fs, info):
+    """Blocos na ordem de leitura, recalculados bloco a bloco (sem os atalhos das métricas)."""
+    if info['method'] == 'contiguous':
+        return list(info['blocks'])
+    if info['method'] == 'linked':
+        order, block = [], info['start']
+        while block != -1:
+            order.append(block)
+            block = int(fs.fat[block])
+        return order
+    return [block for block, _, _ in fs._walk_index(info)]
+
+
+def reference_metrics(fs):
+    """As métricas de FileSystem.metrics() calculadas do zero, a partir dos blocos."""
+    free_runs, run = [], 0
+    for owner in list(fs.blocks) + ['fim']:
+        if owner is None:
+            run += 1
+        elif run:
+            free_runs.append(run)
+            run = 0
+    histogram = [0] * max(1, fs.num_blocks.bit_length())
+    for length in free_runs:
+        histogram[length.bit_length() - 1] += 1
+    free = sum(free_runs)
+    largest = max(free_runs, default=0)
+    fragments = hops = seek = 0
+    for info in fs.files.values():
+        order = read_order(fs, info)
+        fragments += 1 + sum(1 for a, b in zip(order, order[1:]) if b != a + 1)
+        hops += len(order) - 1
+        seek += sum(abs(b - a) for a, b in zip(order, order[1:]))
+    files = len(fs.files)
+    return {
+        'largest_free_extent': largest,
+        'external_fragmentation': 1 - largest / free if free else 0.0,
+        'free_extent_histogram': histogram,
+        'files': files,
+        'fragments': fragments,
+        'avg_fragments': fragments / files if files else 0.0,
+        'avg_seek_distance': seek / hops if hops else 0.0,
+    }
+
+
+def assert_consistent(fs, where):
+    report = fs.check()
+    assert report['ok'], (where, report)
+    assert fs.metrics() == pytest.approx(reference_metrics(fs)), where
+
+
+def assert_defrag_bounded(fs, max_moves, where):
+    """
+    Desfragmenta até o fim e confere que cada bloco ocupado se moveu no máximo uma vez, mais
+    um movimento por ciclo (cada ciclo tem ao menos dois blocos fora do lugar).
+    """
+    used = fs.num_blocks - fs.free_count
+    defrag = sa.Defragmenter(fs)
+    while not defrag.step(max_moves):
+        assert_consistent(fs, where)
+    assert_consistent(fs, where)
+    assert defrag.moves <= used + used // 2, (where, defrag.moves, used)
+    if fs.free_count:
+        assert fs.largest_free_extent() == fs.free_count, where
+    assert fs.defragment()['moves'] == 0, where
+
+
+def random_op(fs, r, step):
+    """Uma operação aleatória; pode falhar (sem espaço, nome repetido), o que também é testado."""
+    names = sorted(fs.files)
+    x = r.random()
+    if x < 0.45 or not names:
+        fs.allocate(r.choice(sa.ALLOCATION_METHODS), f"f{step}", r.randint(1, 24))
+    elif x < 0.65:
+        fs.delete_file(r.choice(names))
+    elif x < 0.8:
+        fs.extend(r.choice(names), r.randint(1, 12))
+    elif x < 0.9:
+        name = r.choice(names)
+        fs.truncate(name, r.randint(1, fs.files[name]['size']))
+    else:
+        ops = []
+        for j in range(r.randint(2, 5)):
+            kind = r.random()
+            if kind < 0.6 or not names:
+                ops.append(('create', f"b{step}_{j}", r.randint(1, 40), r.choice(sa.ALLOCATION_METHODS)))
+            elif kind < 0.8:
+                ops.append(('delete', names.pop(r.randrange(len(names)))))
+            else:
+                ops.append(('extend', r.choice(names), r.randint(1, 30)))
+        before = state(fs)
+        if not fs.apply_batch(ops)[0]:
+            assert state(fs) == before, ("lote desfeito pela metade", ops)
+
+
+@pytest.mark.parametrize("mode", sa.INDEX_MODES)
+@pytest.mark.parametrize("engine", ENGINE_NAMES)
+@pytest.mark.parametrize("seed", range(3))
+def test_random_operations(engine, mode, seed, tmp_path):
+    fs = make_fs(engine, tmp_path)
+    fs.set_index_mode(mode)
+    r = random.Random(seed)
+    snapshots = []
+    for step in range(STEPS):
+        x = r.random()
+        if x < 0.05:
+            snapshots.append((fs.snapshot(), state(fs)))
+        elif x < 0.08 and snapshots:
+            snapshot, expected = r.choice(snapshots)
+            fs.restore(snapshot)
+            assert state(fs) == expected, (engine, mode, step)
+        elif x < 0.1 and len(snapshots) > 1:
+            snapshot, _ = snapshots.pop(r.randrange(len(snapshots)))
+            fs.drop_snapshot(snapshot)
+        elif x < 0.12:
+            assert_defrag_bounded(fs, r.choice([None, 1, 7, 37]), (engine, mode, step))
+            continue
+        else:
+            random_op(fs, r, step)
+        assert_consistent(fs, (engine, mode, step))
+
+
+@pytest.mark.parametrize("pointers", [4, 16])
+@pytest.mark.parametrize("max_moves", [None, 37])
+@pytest.mark.parametrize("mode", sa.INDEX_MODES)
+def test_defrag_full_disk(mode, max_moves, pointers):
+    """Disco quase cheio e fragmentado: a desfragmentação move cada bloco uma vez, em qualquer formato de índice."""
+    fs = sa.create_file_system(2000)
+    fs.set_index_mode(mode, pointers)
+    r = random.Random(pointers)
+    step = 0
+    while fs.free_count > 100 or r.random() < 0.5:
+        step += 1
+        if r.random() < 0.65 or not fs.files:
+            fs.allocate(r.choice(sa.ALLOCATION_METHODS), f"f{step}", r.randint(1, 60))
+        else:
+            fs.delete_file(r.choice(sorted(fs.files)))
+    assert_consistent(fs, step)
+    assert_defrag_bounded(fs, max_moves, (mode, max_moves, pointers))